@@ -1,15 +1,21 @@
 # backend/api/llm/clients/groq_client.py
 from __future__ import annotations
 
+import asyncio
+import json
 import os
-from typing import Dict, Generator, Iterable, List, Optional
-from dataclasses import dataclass
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Callable, Dict, Generator, Iterable, List, Optional
+from dataclasses import dataclass, field
 
-try:
-    # pip install groq
-    from groq import Groq
-except ImportError as e:
-    Groq = None  # Avoid import-time crash; we check at runtime
+import httpx
+
+from core.logging import get_logger
+
+logger = get_logger()
 
 
 @dataclass
@@ -30,7 +36,10 @@ class GroqLLMClient:
         temperature: float = 0.3,
         max_tokens: int = 2048,
     ):
-        if Groq is None:
+        try:
+            # pip install groq (imported here: only the sync client uses the SDK)
+            from groq import Groq
+        except ImportError:
             raise RuntimeError(
                 "groq package is not installed. Run: pip install groq"
             )
@@ -142,4 +151,310 @@ class GroqLLMClient:
         except Exception:
             return default
         # clamp to [0, 2] typical range
-        return max(0.0, min(2.0, v))
\ No newline at end of file
+        return max(0.0, min(2.0, v))
+
+
+# ============================================
+# Async client (timeouts, retries, call stats)
+# ============================================
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RATE_LIMIT_RESETS = {  # limit -> (remaining header, reset header)
+    "requests": ("x-ratelimit-remaining-requests", "x-ratelimit-reset-requests"),
+    "tokens": ("x-ratelimit-remaining-tokens", "x-ratelimit-reset-tokens"),
+}
+
+
+class GroqAPIError(RuntimeError):
+    """Non-retryable (or retries exhausted) Groq API failure"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class CallStats:
+    """Latency and token accounting for one chat/stream call"""
+    model: str
+    streamed: bool
+    attempts: int = 0
+    latency_ms: float = 0.0
+    ttft_ms: Optional[float] = None  # streaming only: time to first delta
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    chunks: int = 0
+    error: Optional[str] = None
+    retry_waits_s: List[float] = field(default_factory=list)
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Parse Groq/OpenAI rate-limit values: "2", "7.66s", "120ms", "2m59.56s", or an HTTP date"""
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+        return sum(float(n) * scale[u] for n, u in parts)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def rate_limit_delay(headers: httpx.Headers) -> Optional[float]:
+    """Wait requested by the response: Retry-After when present, else the reset of the exhausted limit.
+
+    The x-ratelimit-reset-* headers tell when a whole window refills (minutes for the
+    daily request limit), not when the next request is accepted, so they only count
+    when Retry-After is missing: the reset of the limit whose remaining count is 0, or
+    the sooner of the two when that is not known.
+    """
+    retry_after = _parse_duration(headers.get("retry-after", ""))
+    if retry_after is not None:
+        return retry_after
+    resets = {limit: _parse_duration(headers.get(reset, "")) for limit, (_, reset) in RATE_LIMIT_RESETS.items()}
+    exhausted = [resets[limit] for limit, (remaining, _) in RATE_LIMIT_RESETS.items()
+                 if headers.get(remaining, "").strip() == "0" and resets[limit] is not None]
+    if exhausted:
+        return max(exhausted)
+    known = [d for d in resets.values() if d is not None]
+    return min(known) if known else None
+
+
+class AsyncGroqLLMClient:
+    """
+    Async Groq Chat Completions client with the same chat/stream interface as GroqLLMClient.
+
+    Talks to the OpenAI-compatible REST API over a (pooled) httpx.AsyncClient:
+    connect/read timeouts per request, an idle timeout between streamed chunks, and
+    jittered exponential backoff on connection errors, 429 and 5xx that honours
+    Retry-After / x-ratelimit-reset-* headers. A stream is only retried before its
+    first delta, so callers never see duplicated text. Every call produces a
+    CallStats that is logged and passed to `on_call`.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: str = "llama-3.3-70b-versatile",
+        temperature: float = 0.3,
+        max_tokens: int = 2048,
+        *,
+        base_url: Optional[str] = None,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        idle_timeout: float = 30.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        http_client: Optional[httpx.AsyncClient] = None,
+        on_call: Optional[Callable[[CallStats], None]] = None,
+    ):
+        self.api_key = api_key or os.getenv("GROQ_API_KEY")
+        if not self.api_key:
+            raise RuntimeError(
+                "GROQ_API_KEY is not set. Please define it in your environment."
+            )
+        self.base_url = (base_url or os.getenv("GROQ_BASE_URL") or GROQ_BASE_URL).rstrip("/")
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.idle_timeout = idle_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.on_call = on_call
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._owns_client = http_client is None
+        self.http = http_client or httpx.AsyncClient()
+
+    async def aclose(self):
+        if self._owns_client:
+            await self.http.aclose()
+
+    # ---------------------------------------------
+    # Request helpers
+    # ---------------------------------------------
+    def _payload(self, prompt, system_prompt, history, model, temperature, max_tokens, stream) -> Dict:
+        payload = {
+            "model": model or self.model,
+            "messages": GroqLLMClient._to_messages(prompt, system_prompt, history),
+            "temperature": GroqLLMClient._sanitize_temperature(temperature, default=self.temperature),
+            "max_tokens": max_tokens or self.max_tokens,
+            "stream": stream,
+        }
+        if stream:
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        """Seconds to wait before retry `attempt` (1-based); raises if the server asks for too long"""
+        if response is not None:
+            requested = rate_limit_delay(response.headers)
+            if requested is not None:
+                if requested > self.backoff_max:
+                    raise GroqAPIError(
+                        f"Groq rate limited for {requested:.1f}s (> {self.backoff_max:.0f}s budget)",
+                        status_code=response.status_code,
+                    )
+                return requested
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _error_message(response: httpx.Response, body: bytes) -> str:
+        try:
+            detail = json.loads(body).get("error", {}).get("message")
+        except Exception:
+            detail = None
+        return f"Groq API error {response.status_code}: {detail or body[:200].decode(errors='replace')}"
+
+    def _report(self, stats: CallStats, start: float):
+        stats.latency_ms = round((time.perf_counter() - start) * 1000, 1)
+        logger_msg = (
+            f"[Groq] model={stats.model} stream={stats.streamed} attempts={stats.attempts} "
+            f"latency={stats.latency_ms:.0f}ms ttft={stats.ttft_ms}ms "
+            f"tokens={stats.prompt_tokens}/{stats.completion_tokens}"
+        )
+        if stats.error:
+            logger_msg += f" error={stats.error}"
+        logger.info(logger_msg)
+        if self.on_call is not None:
+            try:
+                self.on_call(stats)
+            except Exception:
+                pass
+
+    @staticmethod
+    def _usage(stats: CallStats, data: Dict):
+        usage = data.get("usage") or (data.get("x_groq") or {}).get("usage")
+        if usage:
+            stats.prompt_tokens = usage.get("prompt_tokens")
+            stats.completion_tokens = usage.get("completion_tokens")
+
+    # ---------------------------------------------
+    # Public API
+    # ---------------------------------------------
+    async def chat(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> str:
+        """
+        Non-streaming chat; returns full text.
+        """
+        payload = self._payload(prompt, system_prompt, history, model, temperature, max_tokens, False)
+        stats = CallStats(model=payload["model"], streamed=False)
+        start = time.perf_counter()
+        try:
+            while True:
+                stats.attempts += 1
+                response = None
+                try:
+                    response = await self.http.post(
+                        f"{self.base_url}/chat/completions",
+                        json=payload,
+                        headers={"Authorization": f"Bearer {self.api_key}"},
+                        timeout=self.timeout,
+                    )
+                    if response.status_code < 400:
+                        data = response.json()
+                        self._usage(stats, data)
+                        return data["choices"][0]["message"].get("content") or ""
+                    if response.status_code not in RETRY_STATUS or stats.attempts > self.max_retries:
+                        raise GroqAPIError(self._error_message(response, response.content), response.status_code)
+                except (httpx.TransportError, httpx.TimeoutException) as e:
+                    if stats.attempts > self.max_retries:
+                        raise GroqAPIError(f"Groq request failed: {type(e).__name__}: {e}") from e
+                delay = self._backoff(stats.attempts, response)
+                stats.retry_waits_s.append(round(delay, 3))
+                await asyncio.sleep(delay)
+        except Exception as e:
+            stats.error = str(e)
+            raise
+        finally:
+            self._report(stats, start)
+
+    async def stream(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        history: Optional[List[Dict[str, str]]] = None,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Streaming async generator yielding token deltas as strings.
+        """
+        payload = self._payload(prompt, system_prompt, history, model, temperature, max_tokens, True)
+        stats = CallStats(model=payload["model"], streamed=True)
+        start = time.perf_counter()
+        try:
+            while True:
+                stats.attempts += 1
+                response = None
+                try:
+                    async with self.http.stream(
+                        "POST",
+                        f"{self.base_url}/chat/completions",
+                        json=payload,
+                        headers={"Authorization": f"Bearer {self.api_key}"},
+                        timeout=self.timeout,
+                    ) as response:
+                        if response.status_code >= 400:
+                            body = await response.aread()
+                            if response.status_code not in RETRY_STATUS or stats.attempts > self.max_retries:
+                                raise GroqAPIError(self._error_message(response, body), response.status_code)
+                        else:
+                            lines = response.aiter_lines()
+                            while True:
+                                try:
+                                    line = await asyncio.wait_for(lines.__anext__(), timeout=self.idle_timeout)
+                                except StopAsyncIteration:
+                                    return
+                                except asyncio.TimeoutError:
+                                    raise GroqAPIError(f"Groq stream idle for more than {self.idle_timeout:.0f}s")
+                                if not line.startswith("data:"):
+                                    continue
+                                data_str = line[5:].strip()
+                                if data_str == "[DONE]":
+                                    return
+                                data = json.loads(data_str)
+                                if data.get("error"):
+                                    raise GroqAPIError(f"Groq stream error: {data['error'].get('message', data['error'])}")
+                                self._usage(stats, data)
+                                choices = data.get("choices") or []
+                                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                                if delta:
+                                    if stats.ttft_ms is None:
+                                        stats.ttft_ms = round((time.perf_counter() - start) * 1000, 1)
+                                    stats.chunks += 1
+                                    yield delta
+                except (httpx.TransportError, httpx.TimeoutException) as e:
+                    # Retrying after output has started would duplicate text
+                    if stats.chunks or stats.attempts > self.max_retries:
+                        raise GroqAPIError(f"Groq stream failed: {type(e).__name__}: {e}") from e
+                    response = None
+                delay = self._backoff(stats.attempts, response)
+                stats.retry_waits_s.append(round(delay, 3))
+                await asyncio.sleep(delay)
+        except (GeneratorExit, asyncio.CancelledError):
+            stats.error = "cancelled"
+            raise
+        except Exception as e:
+            stats.error = str(e)
+            raise
+        finally:
+            self._report(stats, start)
@@ -1,31 +1,163 @@
 # Streaming chat
 
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import StreamingResponse
-from sse_starlette.sse import EventSourceResponse
-import json
 import asyncio
-from typing import AsyncGenerator
+import time
+from contextlib import aclosing
+
+from fastapi import APIRouter, HTTPException, Depends, Header
+from sse_starlette.sse import EventSourceResponse
+from starlette.background import BackgroundTask
 
 from api.schemas.requests import ChatRequest
 from api.schemas.responses import ChatResponse, Citation
-from core.config import AppConfig
+from core.admission import QueueFullError, Ticket, get_admission_controller
+from core.config import get_config
 from core.logging import get_logger
-from ingestion.embed_store import load_faiss
-from retrieval.search import as_retriever
-from rag.chain import build_rag_chain, postprocess_citations
+from core.metrics import INDEX_VECTORS, STAGE_SECONDS, TOKENS_GENERATED
+from core.singleflight import Flight, SingleFlight
+from core.streaming import coalesce_tokens, get_generation_stats, sse_frames
+from core.tracing import annotate, span
+from core.warmup import EMBEDDING, LLM, get_model_warmer
+from highlight.annotator import add_citation_rects
+from ingestion.embed_store import index_version, load_faiss
+from retrieval.search import aretrieve
+from rag.chain import build_answer_chain, format_docs, postprocess_citations
 
 router = APIRouter(prefix="/api/chat", tags=["Chat"])
 logger = get_logger()
-config = AppConfig()
+config = get_config()
+
+# Identical requests arriving while one is generating share its generation;
+# dropped streams can resume from the generation's replay buffer
+generations = SingleFlight(
+    flight_max_bytes=config.sse_replay_max_bytes_per_stream,
+    grace_s=config.sse_resume_grace_s,
+    retain_s=config.sse_replay_ttl_s,
+    retain_max_bytes=config.sse_replay_max_bytes,
+)
 
 
 def get_vectorstore():
     """Dependency to load vector store"""
     try:
-        return load_faiss(str(config.db_dir), embedding_model=config.embedding_model)
+        with span("load_vectorstore"):
+            vs = load_faiss(str(config.db_dir), embedding_model=config.embedding_model)
     except Exception as e:
         raise HTTPException(500, f"Vector store not initialized: {str(e)}")
+    INDEX_VECTORS.set(vs.index.ntotal)
+    return vs
+
+
+def _generation_key(query: str, llm_model: str, temperature: float, top_k: int) -> tuple:
+    """Identity of a generation: same key -> same citations and same answer stream"""
+    normalized = " ".join(query.split()).casefold()
+    return (
+        normalized,
+        llm_model,
+        float(temperature),
+        int(top_k),
+        config.fetch_k,
+        config.use_mmr,
+        config.mmr_lambda,
+        config.embedding_model,
+        index_version(str(config.db_dir)),
+    )
+
+
+def _join_generation(vs, key: tuple, query: str, llm_model: str, temperature: float, top_k: int) -> Flight:
+    """
+    Attach to an identical in-flight generation, or start one
+    
+    Starting a new generation takes a slot at the model's admission gate;
+    raises HTTPException(429) with Retry-After when its wait queue is full.
+    """
+    
+    async def generate(flight: Flight, ticket: Ticket):
+        """Retrieve, wait for a model slot, then stream the answer into the flight's event log
+
+        Cancelled by the flight once nobody is subscribed (see SingleFlight grace_s):
+        the upstream Ollama stream is closed and the model slot released right away.
+        """
+        tokens = 0
+        with span("generation", flight=flight.id, model=llm_model, top_k=top_k):
+            try:
+                answer_chain = build_answer_chain(llm_model=llm_model, temperature=temperature)
+                
+                # Get retrieved documents first (async embed, FAISS search runs in the executor),
+                # timed per stage: embed, search, mmr
+                with span("retrieve", k=top_k, fetch_k=config.fetch_k, mmr=config.use_mmr) as s:
+                    raw_docs = await aretrieve(
+                        vs, query, k=top_k, fetch_k=config.fetch_k, use_mmr=config.use_mmr,
+                        lambda_mult=config.mmr_lambda,
+                    )
+                    s.set(docs=len(raw_docs))
+                get_model_warmer().touch(EMBEDDING, config.embedding_model)
+                
+                # Send citations first (with highlight rectangles for client-side overlays)
+                citations = postprocess_citations(raw_docs)
+                if config.citation_rects:
+                    with span("citation_rects", citations=len(citations)):
+                        await asyncio.to_thread(add_citation_rects, citations, config.artifacts_dir)
+                await flight.publish({"event": "citations", "data": citations})
+                
+                # Wait for a generation slot on this model, reporting queue position
+                with span("queue", model=llm_model):
+                    async for position in ticket.wait():
+                        await flight.publish({"event": "queued", "data": {"position": position, "model": llm_model}})
+                if ticket.queued_ms >= 1:
+                    logger.info(f"Generation {flight.id} queued {ticket.queued_ms:.0f}ms for {llm_model}")
+                
+                # Stream answer tokens from the async LLM client; the event loop
+                # stays free for other streams between tokens
+                chain_input = {"context": format_docs(raw_docs), "question": query}
+                with span("llm.stream", model=llm_model, provider="ollama") as s:
+                    started = time.perf_counter()
+                    async with aclosing(answer_chain.astream(chain_input)) as stream:
+                        async for token in stream:
+                            if token:
+                                if not tokens:
+                                    ttft = time.perf_counter() - started
+                                    STAGE_SECONDS.observe(ttft, stage="ttft")
+                                    s.set(ttft_ms=round(ttft * 1000, 1))
+                                tokens += 1
+                                await flight.publish({"event": "token", "data": {"token": token}})
+                    STAGE_SECONDS.observe(time.perf_counter() - started, stage="generation")
+                    s.set(tokens=tokens)
+                
+                get_model_warmer().touch(LLM, llm_model)
+                get_generation_stats().record_completed(llm_model, tokens)
+                
+                # Send completion event
+                await flight.publish({
+                    "event": "done",
+                    "data": {"model": llm_model, "queue_ms": round(ticket.queued_ms, 1)}
+                })
+            except asyncio.CancelledError:
+                saved = get_generation_stats().record_cancelled(llm_model, tokens)
+                logger.info(
+                    f"Generation {flight.id} cancelled, no subscribers left: "
+                    f"{tokens} token(s) generated, ~{saved} saved"
+                )
+                raise
+            finally:
+                TOKENS_GENERATED.inc(tokens, model=llm_model, route="chat")
+                ticket.release()
+    
+    flight = generations.attach(key)
+    if flight is not None:
+        logger.info(f"Attached to in-flight generation {flight.id}")
+        annotate(generation=flight.id, generation_mode="attached")
+        return flight
+    
+    try:
+        ticket = get_admission_controller().enqueue(llm_model)
+    except QueueFullError as e:
+        logger.warning(f"Rejected generation: {e}")
+        raise HTTPException(429, str(e), headers=e.headers())
+    
+    flight, _ = generations.join(key, lambda f: generate(f, ticket))
+    annotate(generation=flight.id, generation_mode="started")
+    return flight
 
 
 @router.get("/stream")
@@ -34,12 +166,23 @@ async def stream_chat(
     llm_model: str = None,
     temperature: float = None,
     top_k: int = None,
+    coalesce_ms: int = None,
+    coalesce_chars: int = None,
+    last_event_id: str = None,
+    last_event_id_header: str = Header(None, alias="Last-Event-ID"),
     vs = Depends(get_vectorstore)
 ):
     """
     Streaming chat endpoint using Server-Sent Events (SSE)
     
-    Streams tokens in real-time as they're generated by the LLM
+    Streams tokens in real-time as they're generated by the LLM. After the first
+    token, deltas are merged into one frame every `coalesce_ms` milliseconds or
+    `coalesce_chars` characters (defaults from config; coalesce_ms=0 disables).
+    
+    Every frame has an id. Reconnecting with the `Last-Event-ID` header (sent
+    automatically by EventSource) or `last_event_id` query param resumes the
+    same generation after that frame - live or recently finished - instead of
+    running retrieval and generation again.
     """
     
     # Use request-level overrides or fall back to config
@@ -51,58 +194,26 @@ async def stream_chat(
     if not config.validate_llm_model(llm_model):
         raise HTTPException(400, f"Invalid model: {llm_model}")
     
-    logger.info(f"Streaming query with model={llm_model}, temp={temperature}, top_k={top_k}")
-    
-    # Build retriever and chain
-    retriever = as_retriever(vs, k=top_k, fetch_k=config.fetch_k, use_mmr=config.use_mmr)
-    rag_chain = build_rag_chain(retriever, llm_model=llm_model, temperature=temperature)
-    
-    async def event_generator() -> AsyncGenerator[str, None]:
-        """Generate SSE events..."""
-        try:
-            # Get retrieved documents first
-            raw_docs = retriever.invoke(query)
-            citations = postprocess_citations(raw_docs)
-            
-            # Send citations first
-            yield {
-                "event": "citations",
-                "data": json.dumps([c.__dict__ if hasattr(c, '__dict__') else c for c in citations])
-            }
-            
-            # Stream answer tokens
-            full_answer = ""
-            for chunk in rag_chain.stream({"input": query}):
-                if isinstance(chunk, dict) and "answer" in chunk:
-                    token = chunk["answer"]
-                elif isinstance(chunk, str):
-                    token = chunk
-                else:
-                    continue
-                
-                full_answer += token
-                yield {
-                    "event": "token",
-                    "data": json.dumps({"token": token})
-                }
-                
-                # Small delay to prevent overwhelming client
-                await asyncio.sleep(0.01)
-            
-            # Send completion event
-            yield {
-                "event": "done",
-                "data": json.dumps({"model": llm_model})
-            }
-            
-        except Exception as e:
-            logger.error(f"Streaming error: {e}")
-            yield {
-                "event": "error",
-                "data": json.dumps({"error": str(e)})
-            }
-    
-    return EventSourceResponse(event_generator())
+    key = _generation_key(query, llm_model, temperature, top_k)
+    resumed = generations.resume(last_event_id_header or last_event_id, key)
+    if resumed is not None:
+        flight, start = resumed
+        logger.info(f"Resuming generation {flight.id} from event {start}")
+        annotate(generation=flight.id, generation_mode="resumed", resume_from=start)
+    else:
+        logger.info(f"Streaming query with model={llm_model}, temp={temperature}, top_k={top_k}")
+        flight, start = _join_generation(vs, key, query, llm_model, temperature, top_k), 0
+    
+    events = coalesce_tokens(
+        flight.subscribe(start),
+        window_ms=max(0, coalesce_ms if coalesce_ms is not None else config.sse_coalesce_ms),
+        max_chars=max(1, coalesce_chars or config.sse_coalesce_chars),
+    )
+    # The response closes the frame stream once the client is gone, which drops this
+    # subscription at once (rather than at garbage collection) and lets the flight
+    # cancel its producer
+    frames = sse_frames(events)
+    return EventSourceResponse(frames, background=BackgroundTask(frames.aclose))
 
 
 @router.post("/", response_model=ChatResponse)
@@ -120,29 +231,24 @@ async def chat(request: ChatRequest, vs = Depends(get_vectorstore)):
     if not config.validate_llm_model(llm_model):
         raise HTTPException(400, f"Invalid model: {llm_model}")
     
+    key = _generation_key(request.query, llm_model, temperature, top_k)
+    flight = _join_generation(vs, key, request.query, llm_model, temperature, top_k)
+    
     try:
-        # Build chain
-        retriever = as_retriever(vs, k=top_k, fetch_k=config.fetch_k, use_mmr=config.use_mmr)
-        rag_chain = build_rag_chain(retriever, llm_model=llm_model, temperature=temperature)
-        
-        # Get raw documents for citations
-        raw_docs = retriever.invoke(request.query)
-        
-        # Invoke chain
-        result = rag_chain.invoke({"input": request.query})
-        
-        # Extract answer (handle different response formats)
-        if isinstance(result, dict):
-            answer = result.get("answer", str(result))
-        else:
-            answer = str(result)
+        # Collect the (possibly shared) generation into a single response
+        citations, tokens = [], []
+        async for event in flight.subscribe():
+            if event["event"] == "citations":
+                citations = event["data"]
+            elif event["event"] == "token":
+                tokens.append(event["data"]["token"])
+            elif event["event"] == "error":
+                raise RuntimeError(event["data"]["error"])
         
-        # Process citations
-        citations = postprocess_citations(raw_docs)
         citations_list = [Citation(**c) for c in citations]
         
         return ChatResponse(
-            answer=answer,
+            answer="".join(tokens),
             citations=citations_list,
             model_used=llm_model,
             query=request.query
@@ -0,0 +1,86 @@
+# Debug endpoints: recent request traces, stored request profiles
+
+import json
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from core.config import get_config
+from core.profiling import get_profile_store
+from core.tracing import get_tracer, to_otlp
+
+router = APIRouter(prefix="/api/debug", tags=["Debug"])
+config = get_config()
+
+
+def require_debug_token(x_debug_token: Optional[str] = Header(None)):
+    """Debug endpoints need DEBUG_TOKEN in X-Debug-Token; without a configured token they are off"""
+    if not config.debug_token:
+        raise HTTPException(403, "Debug endpoints are disabled: set DEBUG_TOKEN to enable them")
+    if not secrets.compare_digest(x_debug_token or "", config.debug_token):
+        raise HTTPException(403, "Invalid or missing X-Debug-Token")
+
+
+@router.get("/traces", dependencies=[Depends(require_debug_token)])
+async def list_traces(
+    limit: int = Query(50, ge=1, le=1000),
+    min_ms: float = Query(0.0, ge=0, description="Only requests slower than this"),
+    path: Optional[str] = Query(None, description="Route template or exact path"),
+    format: str = Query("summary", pattern="^(summary|tree|otlp)$"),
+):
+    """
+    Most recent request traces of this worker, newest first
+
+    format=summary lists one line per request, tree includes the span trees,
+    otlp returns an OTLP/JSON export (importable by Jaeger, Tempo, the OTel collector).
+    """
+    tracer = get_tracer()
+    traces = tracer.buffer.recent(limit=limit, min_ms=min_ms, path=path)
+    if format == "otlp":
+        return to_otlp(traces)
+    return {
+        "enabled": tracer.enabled,
+        "traces": [t.tree() if format == "tree" else t.summary() for t in traces],
+    }
+
+
+@router.get("/traces/{trace_id}", dependencies=[Depends(require_debug_token)])
+async def get_trace(trace_id: str, format: str = Query("tree", pattern="^(tree|otlp)$")):
+    """Span tree of one request, by request id (X-Request-ID) or trace id"""
+    trace = get_tracer().buffer.find(trace_id)
+    if trace is None:
+        raise HTTPException(404, f"Trace not found (may have left the buffer): {trace_id}")
+    return to_otlp([trace]) if format == "otlp" else trace.tree()
+
+
+@router.get("/profiles", dependencies=[Depends(require_debug_token)])
+async def list_profiles():
+    """Stored request profiles, newest first (see core.profiling for how to take one)"""
+    return {"enabled": config.profiling_enabled, "profiles": get_profile_store().list()}
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_debug_token)])
+async def get_profile(profile_id: str, format: str = Query("json", pattern="^(json|text|pstats|html)$")):
+    """
+    One profile: format=json (wall/CPU time, top functions, call tree), text (profiler's
+    own report), pstats (cProfile dump for snakeviz / pstats) or html (pyinstrument)
+    """
+    store = get_profile_store()
+    if format in ("pstats", "html"):
+        suffix = ".prof" if format == "pstats" else ".html"
+        path = store.path(profile_id, suffix)
+        if path is None:
+            raise HTTPException(404, f"No {format} output for profile {profile_id}")
+        media_type = "application/octet-stream" if format == "pstats" else "text/html"
+        return FileResponse(str(path), media_type=media_type, filename=path.name)
+
+    path = store.path(profile_id)
+    if path is None:
+        raise HTTPException(404, f"Profile not found: {profile_id}")
+    report = json.loads(path.read_text(encoding="utf-8"))
+    if format == "text":
+        return PlainTextResponse(report.get("text", ""))
+    report.pop("text", None)
+    return report
@@ -1,26 +1,33 @@
 # PDF upload/indexing endpoints
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from fastapi.responses import FileResponse
-from typing import List, Optional
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from typing import Dict, Iterator, List, Optional, Tuple
+import asyncio
+import hashlib
+import io
 import json
+import zipfile
 from pathlib import Path
-import tempfile
 import os
 
-from api.schemas.requests import IndexRequest
+from api.routes.debug import require_debug_token
+from api.schemas.requests import HighlightBatchRequest, IndexRequest
 from api.schemas.responses import DocumentInfo, IndexStatus
-from core.config import AppConfig
+from core.config import get_config
 from core.logging import get_logger
+from core.tracing import span
+from ingestion.artifact_gc import get_artifact_gc
+from ingestion.page_images import find_page_image, render_pages
 from ingestion.pdf_loader import load_pdf_build_page_index
 from ingestion.chunker import make_page_chunks
-from ingestion.embed_store import build_faiss, load_faiss
-from highlight.annotator import annotate_pdf
+from ingestion.catalog import get_catalog
+from ingestion.embed_store import build_faiss, index_version, load_faiss
+from highlight.cache import cited_page_png, cited_pages_pdf, highlighted_pdf
 
 router = APIRouter(prefix="/api/documents", tags=["Documents"])
 logger = get_logger()
-config = AppConfig()
-config.ensure_dirs()
+config = get_config()
 
 
 @router.post("/upload")
@@ -92,20 +99,34 @@ async def index_documents(request: IndexRequest):
         
         # Step 1: Parse PDFs
         manifests = []
-        for pdf_path in pdf_files:
-            manifest = load_pdf_build_page_index(str(pdf_path), config.artifacts_dir)
-            manifests.append(manifest)
+        with span("parse", documents=len(pdf_files)):
+            for pdf_path in pdf_files:
+                manifest = load_pdf_build_page_index(
+                    str(pdf_path), config.artifacts_dir, render_pages=config.page_images_enabled
+                )
+                manifests.append(manifest)
         
         # Step 2: Chunk all documents
         all_chunks = []
-        for manifest in manifests:
-            chunks = make_page_chunks(manifest, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-            all_chunks.extend(chunks)
+        with span("chunk", chunk_size=chunk_size, chunk_overlap=chunk_overlap) as s:
+            for manifest in manifests:
+                chunks = make_page_chunks(manifest, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+                all_chunks.extend(chunks)
+            s.set(chunks=len(all_chunks))
         
         logger.info(f"Generated {len(all_chunks)} chunks")
         
         # Step 3: Build FAISS index
-        vs = build_faiss(all_chunks, str(config.db_dir), embedding_model=embedding_model)
+        with span("embed_index", model=embedding_model, chunks=len(all_chunks)):
+            vs = build_faiss(all_chunks, str(config.db_dir), embedding_model=embedding_model)
+        
+        # Record chunk counts + index version in the document catalog
+        chunk_counts = {m['doc_id']: 0 for m in manifests}
+        for chunk in all_chunks:
+            chunk_counts[chunk.metadata['doc_id']] += 1
+        await asyncio.to_thread(
+            get_catalog(config.artifacts_dir).record_index, chunk_counts, index_version(str(config.db_dir))
+        )
         
         # Update config
         config.embedding_model = embedding_model
@@ -126,26 +147,19 @@ async def index_documents(request: IndexRequest):
 
 @router.get("/", response_model=List[DocumentInfo])
 async def list_documents():
-    """List all indexed documents"""
-    
-    documents = []
-    
-    # Read manifests from artifacts
-    if config.artifacts_dir.exists():
-        for doc_dir in config.artifacts_dir.iterdir():
-            if doc_dir.is_dir():
-                manifest_path = doc_dir / 'manifest.json'
-                if manifest_path.exists():
-                    with open(manifest_path, 'r') as f:
-                        manifest = json.load(f)
-                        documents.append(DocumentInfo(
-                            doc_id=manifest['doc_id'],
-                            name=manifest['name'],
-                            num_pages=manifest['num_pages'],
-                            source_path=manifest['source_path']
-                        ))
-    
-    return documents
+    """List all indexed documents (from the document catalog, newest first)"""
+    rows = await asyncio.to_thread(get_catalog(config.artifacts_dir).list)
+    return [
+        DocumentInfo(
+            doc_id=row['doc_id'],
+            name=row['name'],
+            num_pages=row['num_pages'],
+            source_path=row['source_path'],
+            indexed_at=row['indexed_at'],
+            chunk_count=row['chunk_count'],
+        )
+        for row in rows
+    ]
 
 
 @router.delete("/{doc_id}")
@@ -154,12 +168,17 @@ async def delete_document(doc_id: str):
     
     # Find and delete document directory
     doc_dir = config.artifacts_dir / doc_id
+    catalog = get_catalog(config.artifacts_dir)
     
-    if not doc_dir.exists():
+    if not doc_id.replace('_', '').isalnum() or (
+        not doc_dir.exists() and await asyncio.to_thread(catalog.get, doc_id) is None
+    ):
         raise HTTPException(404, f"Document not found: {doc_id}")
     
+    # Catalog first: once the row is gone nothing resolves the doc_id to these files
+    await asyncio.to_thread(catalog.delete, doc_id)
     import shutil
-    shutil.rmtree(doc_dir)
+    await asyncio.to_thread(shutil.rmtree, doc_dir, ignore_errors=True)
     
     logger.info(f"Deleted document: {doc_id}")
     
@@ -192,57 +211,247 @@ async def index_status():
         }
 
 
+@router.get("/gc", dependencies=[Depends(require_debug_token)])
+async def artifact_gc_report():
+    """Artifacts not referenced by the live index (what POST /gc would delete), and past runs"""
+    gc = get_artifact_gc()
+    report = await asyncio.to_thread(gc.plan)
+    return {**report, "stats": gc.stats()}
+
+
+@router.post("/gc", dependencies=[Depends(require_debug_token)])
+async def run_artifact_gc(dry_run: bool = Query(False, description="Only report what would be deleted")):
+    """Delete artifacts not referenced by the live index; safe while requests are served"""
+    report = await asyncio.to_thread(get_artifact_gc().collect, not dry_run)
+    if "skipped" in report:
+        raise HTTPException(409, report["skipped"])
+    return report
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _cached_file_response(
+    request: Request, path: Path, key: str, media_type: str, filename: str, hit: bool
+) -> Response:
+    """Serve a content-addressed cache entry: ETag is the key, 304 on If-None-Match, Range via FileResponse"""
+    etag = f'"{key}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, max-age=86400",  # same URL + params may map to a new key once the PDF changes
+        "X-Cache": "hit" if hit else "miss",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        path=str(path),
+        media_type=media_type,
+        filename=filename,
+        headers=headers,
+        content_disposition_type="inline",
+    )
+
+
+async def _load_manifest(doc_id: str) -> Dict:
+    """Catalog entry of a document (doc_id, name, num_pages, source_path, page_index_path, ...)"""
+    manifest = await asyncio.to_thread(get_catalog(config.artifacts_dir).get, doc_id)
+    if manifest is None:
+        raise HTTPException(404, f"Document not found: {doc_id}")
+    if not Path(manifest['source_path']).exists():
+        raise HTTPException(404, f"Source PDF not found: {manifest['source_path']}")
+    return manifest
+
+
 @router.post("/highlight")
 async def generate_highlighted_pdf(
+    request: Request,
     doc_id: str = Form(...),
     page: int = Form(...),
     span_start: int = Form(...),
     span_end: int = Form(...)
 ):
-    """Generate a highlighted PDF for a specific citation"""
-    
+    """
+    Generate a highlighted PDF for a specific citation
+
+    Outputs are cached by (source PDF content, highlight), so repeat views are served
+    from disk; responses carry an ETag (send If-None-Match for a 304) and honour Range.
+    """
+    manifest = await _load_manifest(doc_id)
+    highlights = [{
+        'page': page,
+        'span_start': span_start,
+        'span_end': span_end
+    }]
+
     try:
-        # Find document manifest
-        doc_dir = config.artifacts_dir / doc_id
-        if not doc_dir.exists():
-            raise HTTPException(404, f"Document not found: {doc_id}")
-        
-        manifest_path = doc_dir / 'manifest.json'
-        with open(manifest_path, 'r') as f:
-            manifest = json.load(f)
-        
-        source_path = manifest['source_path']
-        page_index_path = manifest['page_index_path']
-        
-        if not Path(source_path).exists():
-            raise HTTPException(404, f"Source PDF not found: {source_path}")
-        
-        # Create highlight specification
-        highlights = [{
-            'page': page,
-            'span_start': span_start,
-            'span_end': span_end
-        }]
-        
-        # Generate highlighted PDF in temp directory
-        temp_dir = Path(tempfile.gettempdir()) / 'rag_highlights'
-        temp_dir.mkdir(exist_ok=True)
-        
-        output_filename = f"{doc_id}_p{page}_highlighted.pdf"
-        output_path = temp_dir / output_filename
-        
-        # Annotate PDF
-        annotate_pdf(source_path, page_index_path, highlights, str(output_path))
-        
-        logger.info(f"Generated highlighted PDF: {output_path}")
-        
-        # Return the file
-        return FileResponse(
-            path=str(output_path),
-            media_type='application/pdf',
-            filename=output_filename
+        # Hashing the source / annotating are blocking: keep them off the event loop
+        path, key, hit = await asyncio.to_thread(
+            highlighted_pdf, manifest['source_path'], manifest['page_index_path'], highlights
         )
-        
     except Exception as e:
         logger.error(f"Failed to generate highlighted PDF: {e}")
         raise HTTPException(500, f"Failed to generate highlighted PDF: {str(e)}")
+
+    if not hit:
+        logger.info(f"Generated highlighted PDF: {path}")
+    return _cached_file_response(request, path, key, 'application/pdf', f"{doc_id}_p{page}_highlighted.pdf", hit)
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, unseekable sink: zipfile writes into it, the response drains it"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _zip_stream(files: List[Tuple[str, Path]]) -> Iterator[bytes]:
+    """Stream a zip of `files` as it is written (PDFs are already compressed: stored, not deflated)"""
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for arcname, path in files:
+            with open(path, 'rb') as src, zf.open(arcname, 'w') as dst:
+                while chunk := src.read(1 << 16):
+                    dst.write(chunk)
+                    yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
+
+@router.post("/highlight/batch")
+async def generate_highlighted_batch(request: Request, batch: HighlightBatchRequest):
+    """
+    Highlight all citations of an answer in one request
+
+    Citations are grouped per document and each document is annotated in a single
+    open/save (cached like /highlight). One document: the PDF itself, with ETag and
+    Range support. Several: a streamed zip with one PDF per document.
+    pages_only=true keeps only the cited pages of each document.
+    """
+    by_doc: Dict[str, List[Dict]] = {}
+    for c in batch.citations:
+        by_doc.setdefault(c.doc_id, []).append({'page': c.page, 'span_start': c.span_start, 'span_end': c.span_end})
+    manifests = {doc_id: await _load_manifest(doc_id) for doc_id in by_doc}  # 404 before doing any work
+
+    build = cited_pages_pdf if batch.pages_only else highlighted_pdf
+    try:
+        with span("highlight_batch", documents=len(by_doc), citations=len(batch.citations)):
+            results = await asyncio.gather(*(
+                asyncio.to_thread(build, manifests[doc_id]['source_path'], manifests[doc_id]['page_index_path'], hs)
+                for doc_id, hs in by_doc.items()
+            ))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except Exception as e:
+        logger.error(f"Failed to generate highlighted PDFs: {e}")
+        raise HTTPException(500, f"Failed to generate highlighted PDFs: {str(e)}")
+
+    suffix = "cited" if batch.pages_only else "highlighted"
+    names = {doc_id: f"{Path(m.get('name') or doc_id).stem}_{doc_id}_{suffix}.pdf" for doc_id, m in manifests.items()}
+    if len(results) == 1:
+        (doc_id,), (path, key, hit) = list(by_doc), results[0]
+        return _cached_file_response(request, path, key, 'application/pdf', names[doc_id], hit)
+
+    etag = '"' + hashlib.sha256(",".join(key for _, key, _ in results).encode()).hexdigest()[:32] + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=86400"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    files = [(names[doc_id], path) for doc_id, (path, _, _) in zip(by_doc, results)]
+    headers["Content-Disposition"] = f'attachment; filename="highlights_{len(files)}_documents.zip"'
+    return StreamingResponse(_zip_stream(files), media_type='application/zip', headers=headers)
+
+
+@router.get("/{doc_id}/pages/{page}/image")
+async def page_image(
+    request: Request,
+    doc_id: str,
+    page: int,
+    size: str = Query("thumb", pattern="^(thumb|medium)$"),
+):
+    """
+    Page preview image: size=thumb (small, for lists) or medium (readable page view)
+
+    Rendered at ingest (see ingestion.page_images), so this is a file read; a page
+    without a stored image is rendered now and kept. Images of a doc_id never change:
+    the ETag is fixed and clients may cache them.
+    """
+    manifest = await _load_manifest(doc_id)
+    if not 1 <= page <= manifest['num_pages']:
+        raise HTTPException(404, f"Page {page} not in document ({manifest['num_pages']} pages)")
+    doc_dir = config.artifacts_dir / doc_id
+
+    path = find_page_image(doc_dir, page, size)
+    prerendered = path is not None
+    if path is None:
+        with span("render_page_images", page=page):
+            await asyncio.to_thread(render_pages, manifest['source_path'], str(doc_dir), [page])
+        path = find_page_image(doc_dir, page, size)
+    media_type = 'image/png' if path.suffix == '.png' else 'image/jpeg'
+    return _cached_file_response(
+        request, path, f"{doc_id}-p{page}-{size}", media_type, f"{doc_id}_p{page}_{size}{path.suffix}", prerendered
+    )
+
+
+def _parse_highlights(hl: List[str]) -> List[Dict]:
+    highlights = []
+    for item in hl:
+        parts = item.split(':')
+        if len(parts) != 3 or not all(p.strip().isdigit() for p in parts):
+            raise HTTPException(400, f"Invalid highlight {item!r}, expected page:span_start:span_end")
+        page, span_start, span_end = (int(p) for p in parts)
+        highlights.append({'page': page, 'span_start': span_start, 'span_end': span_end})
+    return highlights
+
+
+@router.get("/{doc_id}/citation")
+async def cited_pages(
+    request: Request,
+    doc_id: str,
+    hl: List[str] = Query(..., description="Highlight as page:span_start:span_end (repeatable)"),
+    format: str = Query("pdf", pattern="^(pdf|png)$"),
+    page: Optional[int] = Query(None, ge=1, description="png: page to render (default: first cited page)"),
+    dpi: int = Query(110, ge=36, le=300, description="png: resolution"),
+):
+    """
+    Just the cited page(s) of a document, with highlights
+
+    format=pdf returns a PDF of only the highlighted pages; format=png renders one page
+    at `dpi`. Outputs are cached like /highlight (ETag, If-None-Match, Range), so a
+    citation preview is a few KB instead of the whole document.
+    """
+    manifest = await _load_manifest(doc_id)
+    highlights = _parse_highlights(hl)
+    source_path, page_index_path = manifest['source_path'], manifest['page_index_path']
+
+    try:
+        if format == 'png':
+            page = page or min(h['page'] for h in highlights)
+            path, key, hit = await asyncio.to_thread(
+                cited_page_png, source_path, page_index_path, highlights, page, dpi
+            )
+            filename, media_type = f"{doc_id}_p{page}_{dpi}dpi.png", 'image/png'
+        else:
+            path, key, hit = await asyncio.to_thread(cited_pages_pdf, source_path, page_index_path, highlights)
+            pages = sorted({h['page'] for h in highlights})
+            filename, media_type = f"{doc_id}_p{'-'.join(map(str, pages))}_cited.pdf", 'application/pdf'
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except Exception as e:
+        logger.error(f"Failed to render cited pages: {e}")
+        raise HTTPException(500, f"Failed to render cited pages: {str(e)}")
+
+    return _cached_file_response(request, path, key, media_type, filename, hit)
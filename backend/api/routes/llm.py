@@ -2,27 +2,34 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import time
+from contextlib import aclosing
 from typing import AsyncGenerator, Optional, List, Dict
 
 from fastapi import APIRouter, HTTPException, Depends, Query
 from sse_starlette.sse import EventSourceResponse
+from starlette.background import BackgroundTask
 
 from api.schemas.requests import ChatRequest
 from api.schemas.responses import ChatResponse
-from core.config import AppConfig
+from core.admission import QueueFullError, Ticket, get_admission_controller
+from core.clients import get_client_registry
+from core.config import get_config
 from core.logging import get_logger
+from core.metrics import STAGE_SECONDS, TOKENS_GENERATED
+from core.streaming import coalesce_tokens, get_generation_stats, sse_frames
+from core.tracing import NOOP_SPAN, span, start_span
 
-from api.llm.clients.groq_clients import GroqLLMClient
+from api.llm.clients.groq_clients import AsyncGroqLLMClient
 
 router = APIRouter(prefix="/api/llm", tags=["LLM"])
 logger = get_logger()
-config = AppConfig()
+config = get_config()
 
 
-def get_llm_client() -> GroqLLMClient:
+def get_llm_client() -> AsyncGroqLLMClient:
     """
-    Dependency returning an initialized Groq client based on AppConfig.
+    Dependency returning the shared Groq client for the AppConfig defaults.
     Falls back to environment variables if not present in config.
     """
     try:
@@ -34,7 +41,7 @@ def get_llm_client() -> GroqLLMClient:
         # If AppConfig provides a groq_api_key, prefer it; otherwise env will be used
         groq_key = getattr(config, "groq_api_key", None)
 
-        return GroqLLMClient(
+        return get_client_registry().groq_async(
             api_key=groq_key,
             model=default_model,
             temperature=default_temp,
@@ -45,6 +52,15 @@ def get_llm_client() -> GroqLLMClient:
         raise HTTPException(status_code=500, detail=f"LLM client init failed: {str(e)}")
 
 
+def _admit(model: str) -> Ticket:
+    """Take a slot (or a queue place) at the model's admission gate; 429 when the queue is full"""
+    try:
+        return get_admission_controller().enqueue(model)
+    except QueueFullError as e:
+        logger.warning(f"[LLM] rejected: {e}")
+        raise HTTPException(status_code=429, detail=str(e), headers=e.headers())
+
+
 @router.get("/stream")
 async def llm_stream(
     query: str = Query(..., description="User prompt"),
@@ -52,53 +68,110 @@ async def llm_stream(
     llm_model: Optional[str] = Query(None, description="Override default model"),
     temperature: Optional[float] = Query(None, description="Override default temperature"),
     max_tokens: Optional[int] = Query(None, description="Override default max tokens"),
-    client: GroqLLMClient = Depends(get_llm_client),
+    coalesce_ms: Optional[int] = Query(None, ge=0, le=1000, description="Token frame window (0 = one frame per delta)"),
+    coalesce_chars: Optional[int] = Query(None, ge=1, le=65536, description="Flush a token frame at this many characters"),
+    client: AsyncGroqLLMClient = Depends(get_llm_client),
 ):
     """
     Streaming chat endpoint (LLM-only, no retrieval).
     Emits SSE events:
+      - event: queued  data: {"position": <n>, "model": "<model>"}
       - event: token   data: {"token": "<delta>"}
-      - event: done    data: {"model": "<model>"}
+      - event: done    data: {"model": "<model>", "queue_ms": <ms>}
       - event: error   data: {"error": "<message>"}
+    After the first token, deltas are merged into one token frame every
+    `coalesce_ms` or `coalesce_chars`, whichever comes first.
     """
     logger.info(f"[LLM stream] model={llm_model or client.model} temp={temperature or client.temperature}")
+    ticket = _admit(llm_model or client.model)
+
+    model = llm_model or client.model
 
     async def event_gen() -> AsyncGenerator[dict, None]:
+        deltas = 0
+        # A generator can't keep a span current across yields, so these spans are
+        # started/finished explicitly (children of the request's root span)
+        queue_span, llm_span = start_span("queue", model=model), NOOP_SPAN
         try:
-            # Iterate over Groq streaming generator
-            for delta in client.stream(
+            async for position in ticket.wait():
+                yield {
+                    "event": "queued",
+                    "data": {"position": position, "model": model},
+                }
+
+            queue_span.finish()
+
+            # Iterate over the async Groq stream (timeouts/retries handled by the client);
+            # aclosing() closes the upstream request as soon as this generator is closed
+            stream = client.stream(
                 prompt=query,
                 system_prompt=system_prompt,
                 history=None,  # extend to pass history if needed
                 model=llm_model,
                 temperature=temperature,
                 max_tokens=max_tokens,
-            ):
-                yield {
-                    "event": "token",
-                    "data": json.dumps({"token": delta}),
-                }
-                # Tiny await to keep event loop responsive
-                await asyncio.sleep(0)
+            )
+            llm_span = start_span("llm.stream", model=model, provider="groq")
+            started = time.perf_counter()
+            async with aclosing(stream):
+                async for delta in stream:
+                    if not deltas:
+                        ttft = time.perf_counter() - started
+                        STAGE_SECONDS.observe(ttft, stage="ttft")
+                        llm_span.set(ttft_ms=round(ttft * 1000, 1))
+                    deltas += 1
+                    yield {
+                        "event": "token",
+                        "data": {"token": delta},
+                    }
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="generation")
+            get_generation_stats().record_completed(model, deltas)
 
             yield {
                 "event": "done",
-                "data": json.dumps({"model": llm_model or client.model}),
+                "data": {"model": model, "queue_ms": round(ticket.queued_ms, 1)},
             }
+        except (GeneratorExit, asyncio.CancelledError):
+            # Client went away: the Groq request is already closed and the slot is released below
+            llm_span.set(cancelled=True)
+            saved = get_generation_stats().record_cancelled(model, deltas, max_tokens or client.max_tokens)
+            logger.info(f"[LLM stream] client disconnected: {deltas} delta(s) streamed, ~{saved} token(s) saved")
+            raise
         except Exception as e:
             logger.error(f"[LLM stream] error: {e}")
+            llm_span.fail(e)
             yield {
                 "event": "error",
-                "data": json.dumps({"error": str(e)}),
+                "data": {"error": str(e)},
             }
-
-    return EventSourceResponse(event_gen())
+        finally:
+            queue_span.finish()
+            llm_span.set(tokens=deltas)
+            llm_span.finish()
+            TOKENS_GENERATED.inc(deltas, model=model, route="llm")
+            ticket.release()
+
+    events = coalesce_tokens(
+        event_gen(),
+        window_ms=coalesce_ms if coalesce_ms is not None else config.sse_coalesce_ms,
+        max_chars=coalesce_chars or config.sse_coalesce_chars,
+    )
+    frames = sse_frames(events)
+
+    async def on_close():
+        # Runs once the response ends or the client disconnects: closing the frame
+        # stream closes every stage down to the Groq request. release() is
+        # idempotent and covers streams that never started.
+        await frames.aclose()
+        ticket.release()
+
+    return EventSourceResponse(frames, background=BackgroundTask(on_close))
 
 
 @router.post("/", response_model=ChatResponse)
 async def llm_chat(
     request: ChatRequest,
-    client: GroqLLMClient = Depends(get_llm_client),
+    client: AsyncGroqLLMClient = Depends(get_llm_client),
 ):
     """
     Non-streaming LLM-only chat.
@@ -109,16 +182,21 @@ async def llm_chat(
     temperature = request.temperature if request.temperature is not None else client.temperature
     # keep your request.query as the user prompt
     prompt = request.query
+    ticket = _admit(llm_model)
 
     try:
-        answer = client.chat(
-            prompt=prompt,
-            system_prompt=None,
-            history=None,
-            model=llm_model,
-            temperature=temperature,
-            max_tokens=getattr(request, "max_tokens", None),
-        )
+        with span("queue", model=llm_model):
+            async for _ in ticket.wait():
+                pass
+        with span("llm.chat", model=llm_model, provider="groq"):
+            answer = await client.chat(
+                prompt=prompt,
+                system_prompt=None,
+                history=None,
+                model=llm_model,
+                temperature=temperature,
+                max_tokens=getattr(request, "max_tokens", None),
+            )
         # Citations are empty for pure LLM chat
         return ChatResponse(
             answer=answer,
@@ -129,3 +207,5 @@ async def llm_chat(
     except Exception as e:
         logger.error(f"[LLM chat] error: {e}")
         raise HTTPException(status_code=500, detail=f"LLM chat failed: {str(e)}")
+    finally:
+        ticket.release()
@@ -3,10 +3,11 @@
 from fastapi import APIRouter, HTTPException
 from api.schemas.requests import SettingsUpdateRequest
 from api.schemas.responses import SettingsResponse, ModelsResponse, ModelInfo
-from core.config import AppConfig
+from core.config import get_config
+from core.warmup import get_model_warmer
 
 router = APIRouter(prefix="/api/settings", tags=["Settings"])
-config = AppConfig()
+config = get_config()
 
 
 @router.get("/", response_model=SettingsResponse)
@@ -35,10 +36,21 @@ async def update_settings(request: SettingsUpdateRequest):
     if request.embedding_model and not config.validate_embedding_model(request.embedding_model):
         raise HTTPException(400, f"Invalid embedding model: {request.embedding_model}")
     
+    # Models that are about to become the default get pre-loaded in the background
+    switched_llm = request.llm_model if request.llm_model and request.llm_model != config.llm_model else None
+    switched_emb = (
+        request.embedding_model
+        if request.embedding_model and request.embedding_model != config.embedding_model
+        else None
+    )
+    
     # Update settings
     update_data = request.model_dump(exclude_none=True)
     config.update_settings(**update_data)
     
+    if switched_llm or switched_emb:
+        get_model_warmer().schedule_warm(llm_model=switched_llm, embedding_model=switched_emb)
+    
     return SettingsResponse(
         llm_model=config.llm_model,
         embedding_model=config.embedding_model,
@@ -71,6 +83,5 @@ async def get_available_models():
 @router.get("/reset")
 async def reset_settings():
     """Reset settings to defaults"""
-    global config
-    config = AppConfig()
+    config.reset()
     return {"message": "Settings reset to defaults"}
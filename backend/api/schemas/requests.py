@@ -2,7 +2,7 @@
 
 # api/schemas/requests.py
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 
 
 class ChatRequest(BaseModel):
@@ -22,6 +22,20 @@ class IndexRequest(BaseModel):
     force_reindex: bool = Field(default=False, description="Force rebuild even if index exists")
 
 
+class HighlightSpan(BaseModel):
+    """One citation to highlight"""
+    doc_id: str
+    page: int = Field(..., ge=1)
+    span_start: int = Field(..., ge=0)
+    span_end: int = Field(..., ge=0)
+
+
+class HighlightBatchRequest(BaseModel):
+    """All citations of an answer, possibly across several documents"""
+    citations: List[HighlightSpan] = Field(..., min_length=1, max_length=500)
+    pages_only: bool = Field(default=False, description="Keep only the cited pages of each document")
+
+
 class SettingsUpdateRequest(BaseModel):
     """Request to update global settings"""
     llm_model: Optional[str] = None
@@ -15,6 +15,9 @@ class Citation(BaseModel):
     span_end: int
     chunk_preview: str
     source_path: Optional[str] = None
+    # Per-line rectangles of the span, [x0, y0, x1, y1] in PDF points with the origin at
+    # the page's top-left; None when not computed (CITATION_RECTS=false, no page index)
+    rects: Optional[List[List[float]]] = None
 
 
 class ChatResponse(BaseModel):
@@ -32,6 +35,7 @@ class DocumentInfo(BaseModel):
     num_pages: int
     source_path: str
     indexed_at: Optional[str] = None
+    chunk_count: Optional[int] = None
 
 
 class IndexStatus(BaseModel):
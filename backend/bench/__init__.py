@@ -0,0 +1 @@
+# offline benchmarking tools: stand-in model servers, corpus generators, benchmark runners
@@ -0,0 +1,127 @@
+# helpers shared by the benchmark runners: run metadata, RSS sampling, percentiles, JSON output
+
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, timeout=5,
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_meta(**extra) -> Dict:
+    """Where and when a benchmark ran, so result files can be compared across commits"""
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "argv": sys.argv[1:],
+        **extra,
+    }
+
+
+def _current_rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _max_rss_bytes() -> int:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class RssSampler:
+    """Peak resident memory while the block runs (samples /proc; falls back to ru_maxrss)
+
+    with RssSampler() as rss:
+        work()
+    rss.peak_mb
+    """
+
+    def __init__(self, interval_s: float = 0.01):
+        self.interval_s = interval_s
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval_s):
+            rss = _current_rss_bytes()
+            if rss is not None:
+                self.peak = max(self.peak, rss)
+
+    def __enter__(self) -> "RssSampler":
+        start = _current_rss_bytes()
+        if start is not None:
+            self.peak = start
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            rss = _current_rss_bytes()
+            self.peak = max(self.peak, rss or 0)
+        else:
+            self.peak = _max_rss_bytes()
+
+    @property
+    def peak_mb(self) -> float:
+        return round(self.peak / 2**20, 1)
+
+
+def percentiles(values: Sequence[float], ps: Sequence[float] = (50, 95, 99)) -> Dict[str, Optional[float]]:
+    """Nearest-rank percentiles as {"p50": ..., "p95": ..., "p99": ...} (None when empty)"""
+    ordered: List[float] = sorted(values)
+    out: Dict[str, Optional[float]] = {}
+    for p in ps:
+        if not ordered:
+            out[f"p{p:g}"] = None
+            continue
+        rank = max(1, -(-len(ordered) * p // 100))  # ceil without floats
+        out[f"p{p:g}"] = round(ordered[int(rank) - 1], 3)
+    return out
+
+
+def write_json(path: Optional[str], payload: Dict):
+    """Write results to `path` (stdout when None or "-")"""
+    text = json.dumps(payload, indent=2)
+    if not path or path == "-":
+        print(text)
+        return
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(text + "\n", encoding="utf-8")
+    print(f"wrote {path}")
+
+
+def print_table(rows: List[Dict], columns: Sequence[str]):
+    """Plain-text table of `rows` restricted to `columns`"""
+    cells = [[("" if r.get(c) is None else str(r.get(c))) for c in columns] for r in rows]
+    widths = [max([len(c)] + [len(row[i]) for row in cells]) for i, c in enumerate(columns)]
+    print("  ".join(c.rjust(w) for c, w in zip(columns, widths)))
+    for row in cells:
+        print("  ".join(v.rjust(w) for v, w in zip(row, widths)))
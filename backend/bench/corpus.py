@@ -0,0 +1,136 @@
+# synthetic PDF corpus generator
+#
+# Writes PDFs with a controlled number of pages, words per page, paragraphs per
+# page and text columns, filled with deterministic pseudo-text (same seed -> same
+# bytes of text), so ingestion runs are comparable across commits.
+#
+# from bench.corpus import make_corpus
+# paths = make_corpus("/tmp/corpus", docs=3, pages=20, words_per_page=400)
+
+import random
+from pathlib import Path
+from typing import Dict, List
+
+try:
+    import pymupdf as fitz   # PyMuPDF ≥ 1.24.3 preferred import name
+except ImportError:
+    import fitz
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 50
+COLUMN_GAP = 20
+FONT = "helv"
+MAX_FONT_SIZE = 11.0
+MIN_FONT_SIZE = 3.0
+LINE_SPACING = 1.25
+
+# Word list with a realistic spread of lengths; a few rare words per page make
+# chunks distinguishable for retrieval benchmarks
+_COMMON = (
+    "the of and to in a is that for it as with was on be by this are from or an which "
+    "at but not have has were their its can all more one been also other into these "
+    "system data model results analysis method performance table section value report "
+    "process information document figure approach measurement evaluation quality "
+    "revenue quarter growth customer product service market research development"
+).split()
+_SYLLABLES = "ka lo mi ra ne tu so vi pe da zo ri la mo te nu ga be xi ho".split()
+
+
+def _rare_word(rng: random.Random) -> str:
+    return "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(3, 5)))
+
+
+def make_words(rng: random.Random, n: int, rare_ratio: float = 0.05) -> List[str]:
+    return [_rare_word(rng) if rng.random() < rare_ratio else rng.choice(_COMMON) for _ in range(n)]
+
+
+def _wrap(words: List[str], width: float, font_size: float) -> List[str]:
+    """Greedy line wrapping by rendered text width"""
+    lines, line = [], ""
+    space = fitz.get_text_length(" ", fontname=FONT, fontsize=font_size)
+    line_w = 0.0
+    for w in words:
+        ww = fitz.get_text_length(w, fontname=FONT, fontsize=font_size)
+        if line and line_w + space + ww > width:
+            lines.append(line)
+            line, line_w = w, ww
+        else:
+            line = f"{line} {w}" if line else w
+            line_w += (space if line_w else 0) + ww
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _layout_page(paragraphs: List[List[str]], columns: int):
+    """Largest font size at which all paragraphs fit; returns (font_size, lines per column, column width)"""
+    col_width = (PAGE_WIDTH - 2 * MARGIN - (columns - 1) * COLUMN_GAP) / columns
+    usable = PAGE_HEIGHT - 2 * MARGIN
+    font_size = MAX_FONT_SIZE
+    while True:
+        lines: List[str] = []
+        for i, para in enumerate(paragraphs):
+            if i:
+                lines.append("")  # blank line between paragraphs
+            lines.extend(_wrap(para, col_width, font_size))
+        per_column = int(usable // (font_size * LINE_SPACING))
+        if len(lines) <= per_column * columns or font_size <= MIN_FONT_SIZE:
+            cols = [lines[c * per_column:(c + 1) * per_column] for c in range(columns)]
+            return font_size, cols, col_width
+        font_size = max(MIN_FONT_SIZE, font_size - 0.5)
+
+
+def make_pdf(
+    path: str,
+    *,
+    pages: int = 10,
+    words_per_page: int = 400,
+    paragraphs_per_page: int = 4,
+    columns: int = 1,
+    seed: int = 0,
+) -> Dict:
+    """Write one synthetic PDF; returns its layout parameters, word count and size"""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    total_words = 0
+    for _ in range(pages):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        words = make_words(rng, words_per_page)
+        total_words += len(words)
+
+        # Split the page's words into paragraphs of random (but seeded) length
+        n_para = max(1, min(paragraphs_per_page, len(words)))
+        cuts = sorted(rng.sample(range(1, len(words)), n_para - 1)) if n_para > 1 else []
+        bounds = [0] + cuts + [len(words)]
+        paragraphs = [words[a:b] for a, b in zip(bounds, bounds[1:])]
+
+        font_size, cols, col_width = _layout_page(paragraphs, columns)
+        for c, lines in enumerate(cols):
+            x = MARGIN + c * (col_width + COLUMN_GAP)
+            y = MARGIN + font_size
+            for line in lines:
+                if line:
+                    page.insert_text((x, y), line, fontname=FONT, fontsize=font_size)
+                y += font_size * LINE_SPACING
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return {
+        "path": str(path),
+        "pages": pages,
+        "words_per_page": words_per_page,
+        "paragraphs_per_page": paragraphs_per_page,
+        "columns": columns,
+        "words": total_words,
+        "bytes": path.stat().st_size,
+    }
+
+
+def make_corpus(out_dir: str, *, docs: int = 1, seed: int = 0, **layout) -> List[Dict]:
+    """Write `docs` PDFs (doc_000.pdf, ...) with the same layout and different text"""
+    return [
+        make_pdf(str(Path(out_dir) / f"doc_{i:03d}.pdf"), seed=seed * 1000 + i, **layout)
+        for i in range(docs)
+    ]
@@ -0,0 +1,217 @@
+# end-to-end ingestion benchmark
+#
+# For every corpus layout in the sweep: generate synthetic PDFs (bench.corpus),
+# then time the real ingestion path - load_pdf_build_page_index, make_page_chunks,
+# build_faiss - against a stand-in embedder, recording throughput, peak RSS and
+# artifact sizes. Each case runs in a fresh process so peak RSS is per case.
+#
+#   python -m bench.ingest_bench --pages 10 50 --words-per-page 300 800 --out bench/results/ingest.json
+#   python -m bench.ingest_bench --pages 50 --compare bench/results/ingest.json   # diff vs an earlier run
+#
+# By default embeddings come from an in-process HashEmbeddings (no HTTP);
+# --embed-url points OllamaEmbeddings at a stand-in server (bench.standin) or a real Ollama.
+
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from bench.common import RssSampler, print_table, run_meta, write_json
+from core.logging import get_logger
+
+STAGES = ("parse", "chunk", "embed_index")
+COMPARED = ("pages_per_s", "chunks_per_s", "embed_chunks_per_s", "peak_rss_mb")
+
+
+def _dir_bytes(path: Path, pattern: str) -> int:
+    return sum(p.stat().st_size for p in path.rglob(pattern) if p.is_file())
+
+
+def _embedder(embedding_model: str, embed_url: Optional[str]):
+    if embed_url:
+        from langchain_ollama import OllamaEmbeddings
+
+        return OllamaEmbeddings(model=embedding_model, base_url=embed_url)
+    from bench.standin import HashEmbeddings
+
+    return HashEmbeddings(embedding_model)
+
+
+def run_once(case: Dict, work_dir: Path) -> Dict:
+    """Generate the corpus for `case` and ingest it once; returns timings, RSS and sizes"""
+    from bench.corpus import make_corpus
+    from ingestion.chunker import make_page_chunks
+    from ingestion.embed_store import build_faiss
+    from ingestion.pdf_loader import load_pdf_build_page_index
+
+    get_logger().setLevel(logging.WARNING)  # per-document INFO lines would dominate the output
+    corpus_dir, artifacts_dir, db_dir = work_dir / "pdfs", work_dir / "artifacts", work_dir / "vectordb"
+    start = time.perf_counter()
+    pdfs = make_corpus(
+        str(corpus_dir),
+        docs=case["docs"],
+        pages=case["pages"],
+        words_per_page=case["words_per_page"],
+        paragraphs_per_page=case["paragraphs_per_page"],
+        columns=case["columns"],
+        seed=case["seed"],
+    )
+    generate_s = time.perf_counter() - start
+    embeddings = _embedder(case["embedding_model"], case.get("embed_url"))
+
+    seconds, rss = {}, {}
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        manifests = [load_pdf_build_page_index(p["path"], artifacts_dir) for p in pdfs]
+        seconds["parse"] = time.perf_counter() - start
+    rss["parse"] = sampler.peak_mb
+
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        chunks = []
+        for m in manifests:
+            chunks.extend(make_page_chunks(m, chunk_size=case["chunk_size"], chunk_overlap=case["chunk_overlap"]))
+        seconds["chunk"] = time.perf_counter() - start
+    rss["chunk"] = sampler.peak_mb
+
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        build_faiss(chunks, str(db_dir), embedding_model=case["embedding_model"], embeddings=embeddings)
+        seconds["embed_index"] = time.perf_counter() - start
+    rss["embed_index"] = sampler.peak_mb
+
+    pages = sum(m["num_pages"] for m in manifests)
+    return {
+        "pages": pages,
+        "words": sum(p["words"] for p in pdfs),
+        "chunks": len(chunks),
+        "generate_s": round(generate_s, 3),
+        "seconds": {k: round(v, 4) for k, v in seconds.items()},
+        "peak_rss_mb": rss,
+        "artifacts_bytes": {
+            "pdf": sum(p["bytes"] for p in pdfs),
+            "page_index": _dir_bytes(artifacts_dir, "page_index.json"),
+            "manifest": _dir_bytes(artifacts_dir, "manifest.json"),
+            "faiss_index": _dir_bytes(db_dir, "*.faiss"),
+            "faiss_docstore": _dir_bytes(db_dir, "*.pkl"),
+        },
+    }
+
+
+def run_case(case: Dict) -> Dict:
+    """Run a case `repeat` times (fresh directories each time); throughput from the median run"""
+    runs = []
+    for _ in range(case["repeat"]):
+        work_dir = Path(tempfile.mkdtemp(prefix="ingest_bench_"))
+        try:
+            runs.append(run_once(case, work_dir))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    first = runs[0]
+    seconds = {s: statistics.median(r["seconds"][s] for r in runs) for s in STAGES}
+    total = sum(seconds.values())
+    return {
+        "case": case,
+        "pages": first["pages"],
+        "words": first["words"],
+        "chunks": first["chunks"],
+        "seconds": {s: round(v, 4) for s, v in seconds.items()},
+        "pages_per_s": round(first["pages"] / seconds["parse"], 1) if seconds["parse"] else None,
+        "chunks_per_s": round(first["chunks"] / seconds["chunk"], 1) if seconds["chunk"] else None,
+        "embed_chunks_per_s": round(first["chunks"] / seconds["embed_index"], 1) if seconds["embed_index"] else None,
+        "end_to_end_pages_per_s": round(first["pages"] / total, 1) if total else None,
+        "peak_rss_mb": max(max(r["peak_rss_mb"].values()) for r in runs),
+        "stage_peak_rss_mb": first["peak_rss_mb"],
+        "artifacts_bytes": first["artifacts_bytes"],
+        "runs": len(runs),
+    }
+
+
+def _run_isolated(case: Dict) -> Dict:
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        return pool.apply(run_case, (case,))
+
+
+def case_key(case: Dict) -> str:
+    return "p{pages}-w{words_per_page}-para{paragraphs_per_page}-c{columns}-d{docs}".format(**case)
+
+
+def compare(results: List[Dict], baseline_path: str):
+    """Print per-case % change against an earlier result file (matched by corpus layout)"""
+    baseline = {case_key(r["case"]): r for r in json.loads(Path(baseline_path).read_text())["results"]}
+    rows = []
+    for r in results:
+        old = baseline.get(case_key(r["case"]))
+        if old is None:
+            continue
+        row = {"case": case_key(r["case"])}
+        for metric in COMPARED:
+            a, b = old.get(metric), r.get(metric)
+            row[metric] = f"{(b - a) / a * 100:+.1f}%" if a and b is not None else None
+        rows.append(row)
+    print(f"\nvs {baseline_path}")
+    print_table(rows, ["case", *COMPARED])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion benchmark over a synthetic PDF corpus")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50], help="pages per document")
+    parser.add_argument("--words-per-page", type=int, nargs="+", default=[400])
+    parser.add_argument("--paragraphs-per-page", type=int, nargs="+", default=[4])
+    parser.add_argument("--columns", type=int, nargs="+", default=[1])
+    parser.add_argument("--docs", type=int, default=2, help="documents per case")
+    parser.add_argument("--chunk-size", type=int, default=800)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--embedding-model", default="mxbai-embed-large", help="sets the embedding dimension")
+    parser.add_argument("--embed-url", default=None, help="Ollama-compatible server to embed with (e.g. bench.standin)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-isolate", action="store_true", help="run cases in this process (peak RSS accumulates)")
+    parser.add_argument("--out", default=None, help="JSON output path (default: stdout)")
+    parser.add_argument("--compare", default=None, help="earlier JSON result to diff against")
+    args = parser.parse_args()
+
+    cases = [
+        {
+            "pages": pages,
+            "words_per_page": words,
+            "paragraphs_per_page": paras,
+            "columns": columns,
+            "docs": args.docs,
+            "chunk_size": args.chunk_size,
+            "chunk_overlap": args.chunk_overlap,
+            "embedding_model": args.embedding_model,
+            "embed_url": args.embed_url,
+            "repeat": max(1, args.repeat),
+            "seed": args.seed,
+        }
+        for pages, words, paras, columns in itertools.product(
+            args.pages, args.words_per_page, args.paragraphs_per_page, args.columns
+        )
+    ]
+
+    results = []
+    for case in cases:
+        result = run_case(case) if args.no_isolate else _run_isolated(case)
+        results.append(result)
+        print(
+            f"{case_key(case)}: {result['pages_per_s']} pages/s parse, {result['chunks_per_s']} chunks/s chunk, "
+            f"{result['embed_chunks_per_s']} chunks/s embed+index, peak {result['peak_rss_mb']} MB"
+        )
+
+    write_json(args.out, {"meta": run_meta(benchmark="ingest"), "results": results})
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
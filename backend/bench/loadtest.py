@@ -0,0 +1,386 @@
+# concurrent load test for the chat API
+#
+# Starts the stand-in model server (bench.standin) and the API under uvicorn with
+# N workers against a synthetic index, then drives /api/chat/stream and
+# /api/chat/ either closed-loop (--concurrency users issuing back-to-back
+# requests) or open-loop (--rate Poisson arrivals per second). Measures
+# time-to-first-token, tokens/s per stream, end-to-end latency percentiles,
+# error rate, and event-loop lag on both sides (the server's from /api/health,
+# the load generator's own so a saturated client is visible). Repeating the run
+# for several worker counts gives a scaling curve.
+#
+#   python -m bench.loadtest --workers 1 2 4 --concurrency 32 --duration 30 --out bench/results/load.json
+#   python -m bench.loadtest --rate 20 --duration 60 --tokens-per-s 30 --server-env MODEL_MAX_CONCURRENCY=16
+#   python -m bench.loadtest --url http://127.0.0.1:8000 --concurrency 8     # an already running API
+#
+# Tokens are counted as whitespace-separated words of the streamed text (the
+# stand-in emits one word per token), so counts are unaffected by SSE coalescing.
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from bench.common import BACKEND_DIR, percentiles, print_table, run_meta, write_json
+from core.logging import get_logger
+from core.looplag import LoopLagMonitor
+
+SCALING_COLUMNS = (
+    "workers", "requests", "rps", "error_rate", "p50_ms", "p95_ms", "p99_ms",
+    "ttft_p50_ms", "ttft_p95_ms", "tok_s_p50", "server_lag_p99_ms", "server_lag_max_ms", "client_lag_p99_ms",
+)
+
+
+@dataclass
+class RequestResult:
+    kind: str  # "stream" | "post"
+    ok: bool
+    status: Optional[int]
+    start_s: float  # offset from the start of the run
+    latency_ms: float
+    ttft_ms: Optional[float] = None
+    tokens: int = 0
+    error: Optional[str] = None
+
+
+# ---------------------------------------------
+# Requests
+# ---------------------------------------------
+async def stream_request(client: httpx.AsyncClient, query: str, t0: float) -> RequestResult:
+    start = time.perf_counter()
+    ttft, tokens, event, status, error, done = None, 0, None, None, None, False
+    try:
+        async with client.stream("GET", "/api/chat/stream", params={"query": query}) as r:
+            status = r.status_code
+            if r.status_code != 200:
+                await r.aread()
+                error = f"HTTP {r.status_code}"
+            else:
+                async for line in r.aiter_lines():
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:") and event == "token":
+                        if ttft is None:
+                            ttft = (time.perf_counter() - start) * 1000
+                        tokens += len(json.loads(line[5:])["token"].split())
+                    elif line.startswith("data:") and event == "error":
+                        error = json.loads(line[5:]).get("error", "error event")
+                    elif line.startswith("data:") and event == "done":
+                        done = True
+                if not done and error is None:
+                    error = "stream ended without done"
+    except httpx.HTTPError as e:
+        error = f"{type(e).__name__}: {e}"
+    return RequestResult(
+        kind="stream", ok=error is None, status=status, start_s=start - t0,
+        latency_ms=(time.perf_counter() - start) * 1000, ttft_ms=ttft, tokens=tokens, error=error,
+    )
+
+
+async def post_request(client: httpx.AsyncClient, query: str, t0: float) -> RequestResult:
+    start = time.perf_counter()
+    status, error, tokens = None, None, 0
+    try:
+        r = await client.post("/api/chat/", json={"query": query})
+        status = r.status_code
+        if r.status_code == 200:
+            tokens = len(r.json()["answer"].split())
+        else:
+            error = f"HTTP {r.status_code}"
+    except httpx.HTTPError as e:
+        error = f"{type(e).__name__}: {e}"
+    return RequestResult(
+        kind="post", ok=error is None, status=status, start_s=start - t0,
+        latency_ms=(time.perf_counter() - start) * 1000, tokens=tokens, error=error,
+    )
+
+
+async def run_load(
+    base_url: str,
+    queries: List[str],
+    *,
+    concurrency: int,
+    rate: Optional[float],
+    duration_s: float,
+    max_requests: Optional[int],
+    stream_ratio: float,
+    seed: int,
+) -> Dict:
+    """Drive the API; returns per-request results, wall time and the client's own loop lag"""
+    rng = random.Random(seed)
+    results: List[RequestResult] = []
+    counter = {"issued": 0}
+    lag = LoopLagMonitor(interval_s=0.02, window=100_000)
+    lag.start()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=max(concurrency, 10))
+    timeout = httpx.Timeout(300.0, connect=10.0)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        t0 = time.perf_counter()
+        deadline = t0 + duration_s
+
+        def next_request():
+            if time.perf_counter() >= deadline or (max_requests and counter["issued"] >= max_requests):
+                return None
+            query = queries[counter["issued"] % len(queries)]
+            counter["issued"] += 1
+            call = stream_request if rng.random() < stream_ratio else post_request
+            return call(client, query, t0)
+
+        if rate:
+            # Open loop: arrivals do not wait for earlier requests to finish
+            tasks = []
+            while True:
+                request = next_request()
+                if request is None:
+                    break
+                tasks.append(asyncio.create_task(request))
+                await asyncio.sleep(rng.expovariate(rate))
+            results.extend(await asyncio.gather(*tasks))
+        else:
+            async def user():
+                while True:
+                    request = next_request()
+                    if request is None:
+                        return
+                    results.append(await request)
+
+            await asyncio.gather(*(user() for _ in range(concurrency)))
+        wall_s = time.perf_counter() - t0
+
+    await lag.stop()
+    return {"results": results, "wall_s": wall_s, "client_loop_lag": lag.stats()}
+
+
+# ---------------------------------------------
+# Summaries
+# ---------------------------------------------
+def summarize(results: List[RequestResult], wall_s: float) -> Dict:
+    ok = [r for r in results if r.ok]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if not r.ok:
+            key = f"HTTP {r.status}" if r.status and r.status != 200 else (r.error or "error")[:80]
+            errors[key] = errors.get(key, 0) + 1
+
+    streams = [r for r in ok if r.kind == "stream"]
+    tok_rates = [
+        r.tokens / ((r.latency_ms - r.ttft_ms) / 1000)
+        for r in streams
+        if r.ttft_ms is not None and r.tokens > 1 and r.latency_ms > r.ttft_ms
+    ]
+    latency = percentiles([r.latency_ms for r in ok])
+    ttft = percentiles([r.ttft_ms for r in streams if r.ttft_ms is not None])
+    tok = percentiles(tok_rates, (50, 5))  # p5 = the slowest streams
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "error_rate": round(1 - len(ok) / len(results), 4) if results else None,
+        "errors": errors,
+        "rps": round(len(ok) / wall_s, 2) if wall_s else None,
+        "p50_ms": latency["p50"],
+        "p95_ms": latency["p95"],
+        "p99_ms": latency["p99"],
+        "ttft_p50_ms": ttft["p50"],
+        "ttft_p95_ms": ttft["p95"],
+        "ttft_p99_ms": ttft["p99"],
+        "tok_s_p50": round(tok["p50"], 1) if tok["p50"] is not None else None,
+        "tok_s_p5": round(tok["p5"], 1) if tok["p5"] is not None else None,
+        "tokens_per_s_total": round(sum(r.tokens for r in ok) / wall_s, 1) if wall_s else None,
+        "by_kind": {
+            kind: {"requests": n, "p50_ms": percentiles([r.latency_ms for r in ok if r.kind == kind])["p50"]}
+            for kind, n in ((k, sum(1 for r in results if r.kind == k)) for k in ("stream", "post"))
+            if n
+        },
+    }
+
+
+def server_loop_lag(base_url: str, polls: int) -> Dict:
+    """Event-loop lag per worker process (each /api/health poll lands on some worker)"""
+    by_pid: Dict[int, Dict] = {}
+    with httpx.Client(base_url=base_url, timeout=10) as client:
+        for _ in range(polls):
+            try:
+                stats = client.get("/api/health").json().get("event_loop")
+            except (httpx.HTTPError, ValueError):
+                continue
+            if stats:
+                by_pid[stats["pid"]] = stats
+    p99s = [s["p99_ms"] for s in by_pid.values() if s.get("p99_ms") is not None]
+    maxes = [s["window_max_ms"] for s in by_pid.values() if s.get("window_max_ms") is not None]
+    return {
+        "workers_seen": len(by_pid),
+        "p99_ms": max(p99s) if p99s else None,
+        "max_ms": max(maxes) if maxes else None,
+        "per_worker": list(by_pid.values()),
+    }
+
+
+# ---------------------------------------------
+# Processes under test
+# ---------------------------------------------
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Process:
+    """A subprocess that is ready once `ready_url` answers; stopped on exit"""
+
+    def __init__(self, name: str, cmd: List[str], env: Dict[str, str], ready_url: str, log_dir: Path):
+        self.name, self.cmd, self.env, self.ready_url = name, cmd, env, ready_url
+        self.log_path = log_dir / f"{name}.log"
+        self.proc: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "Process":
+        log = open(self.log_path, "w")
+        self.proc = subprocess.Popen(self.cmd, cwd=BACKEND_DIR, env=self.env, stdout=log, stderr=subprocess.STDOUT)
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"{self.name} exited early; see {self.log_path}")
+            try:
+                if httpx.get(self.ready_url, timeout=2).status_code < 500:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError(f"{self.name} did not become ready; see {self.log_path}")
+
+    def __exit__(self, *exc):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=20)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+def prepare_index(work_dir: Path, embedding_model: str, docs: int, pages: int, num_queries: int, seed: int) -> List[str]:
+    """Synthetic index the API will serve (stand-in embeddings) plus queries sampled from it"""
+    from bench.retrieval_bench import build_synthetic_index, sample_queries
+    from bench.standin import HashEmbeddings
+
+    vs = build_synthetic_index(work_dir, docs=docs, pages=pages, embeddings=HashEmbeddings(embedding_model), seed=seed)
+    # Distinct queries, so single-flight coalescing does not merge concurrent requests
+    return [f"{q} ({i})" for i, q in enumerate(sample_queries(vs, num_queries, seed))]
+
+
+def _parse_env(pairs: List[str]) -> Dict[str, str]:
+    env = {}
+    for pair in pairs:
+        key, sep, value = pair.partition("=")
+        if not sep:
+            raise SystemExit(f"--server-env expects KEY=VALUE, got {pair!r}")
+        env[key] = value
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/chat against stand-in model backends")
+    parser.add_argument("--url", default=None, help="test an already running API instead of starting one")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="uvicorn worker counts to sweep")
+    parser.add_argument("--concurrency", type=int, default=16, help="closed-loop virtual users")
+    parser.add_argument("--rate", type=float, default=None, help="open-loop arrivals per second (overrides --concurrency)")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per run")
+    parser.add_argument("--requests", type=int, default=None, help="stop after this many requests")
+    parser.add_argument("--stream-ratio", type=float, default=1.0, help="share of requests on /api/chat/stream")
+    parser.add_argument("--tokens-per-s", type=float, default=40, help="stand-in generation speed")
+    parser.add_argument("--first-token-ms", type=float, default=150)
+    parser.add_argument("--answer-tokens", type=int, default=64)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="stand-in injected error rate")
+    parser.add_argument("--embedding-model", default="mxbai-embed-large")
+    parser.add_argument("--docs", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--num-queries", type=int, default=500)
+    parser.add_argument("--server-env", nargs="*", default=[], help="extra KEY=VALUE settings for the API")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="JSON output path")
+    args = parser.parse_args()
+
+    get_logger().setLevel(logging.WARNING)
+    work_dir = Path(tempfile.mkdtemp(prefix="loadtest_"))
+    runs = []
+    try:
+        queries = prepare_index(work_dir, args.embedding_model, args.docs, args.pages, args.num_queries, args.seed)
+        load = dict(
+            concurrency=args.concurrency, rate=args.rate, duration_s=args.duration,
+            max_requests=args.requests, stream_ratio=args.stream_ratio, seed=args.seed,
+        )
+
+        def measure(label, base_url, workers):
+            out = asyncio.run(run_load(base_url, queries, **load))
+            summary = summarize(out["results"], out["wall_s"])
+            lag = server_loop_lag(base_url, polls=max(4, 4 * (workers or 1)))
+            summary.update(
+                workers=label,
+                server_lag_p99_ms=lag["p99_ms"],
+                server_lag_max_ms=lag["max_ms"],
+                client_lag_p99_ms=out["client_loop_lag"]["p99_ms"],
+                server_event_loop=lag,
+                client_event_loop=out["client_loop_lag"],
+                wall_s=round(out["wall_s"], 2),
+            )
+            runs.append(summary)
+            print_table([summary], SCALING_COLUMNS)
+            if summary["errors"]:
+                print(f"  errors: {summary['errors']}")
+
+        if args.url:
+            measure("external", args.url.rstrip("/"), None)
+        else:
+            standin_port = free_port()
+            standin_url = f"http://127.0.0.1:{standin_port}"
+            standin_cmd = [
+                sys.executable, "-m", "bench.standin", "--port", str(standin_port),
+                "--tokens-per-s", str(args.tokens_per_s), "--first-token-ms", str(args.first_token_ms),
+                "--answer-tokens", str(args.answer_tokens), "--error-rate", str(args.error_rate),
+                "--seed", str(args.seed),
+            ]
+            env = {
+                **os.environ,
+                "OLLAMA_BASE_URL": standin_url,
+                "GROQ_BASE_URL": f"{standin_url}/openai/v1",
+                "GROQ_API_KEY": os.environ.get("GROQ_API_KEY", "standin"),
+                "EMBEDDING_MODEL": args.embedding_model,
+                "VECTORDB_DIR": str(work_dir / "vectordb"),
+                "ARTIFACTS_DIR": str(work_dir / "artifacts"),
+                "DATA_DIR": str(work_dir / "data"),
+                **_parse_env(args.server_env),
+            }
+            with Process("standin", standin_cmd, env, f"{standin_url}/api/version", work_dir):
+                for workers in args.workers:
+                    port = free_port()
+                    api_cmd = [
+                        sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+                        "--workers", str(workers), "--log-level", "warning",
+                    ]
+                    with Process(f"api-{workers}w", api_cmd, env, f"http://127.0.0.1:{port}/api/health", work_dir):
+                        measure(workers, f"http://127.0.0.1:{port}", workers)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\nscaling curve")
+    print_table(runs, SCALING_COLUMNS)
+    if args.out:
+        settings = {k: v for k, v in vars(args).items() if k not in ("out",)}
+        write_json(args.out, {"meta": run_meta(benchmark="load", settings=settings), "runs": runs})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+# retrieval recall vs latency benchmark
+#
+# Runs a query set against a FAISS index for every configuration in a sweep -
+# index type (any faiss.index_factory string), nprobe / efSearch, search type
+# (similarity or MMR), top_k, fetch_k and lambda_mult - through the same
+# search calls the API uses (retrieval.search), and reports recall@k against
+# exact flat search plus p50/p95/p99 latency and QPS.
+#
+#   python -m bench.retrieval_bench                                   # synthetic corpus, hash embeddings
+#   python -m bench.retrieval_bench --index Flat HNSW32 IVF64,Flat --nprobe 1 8 --ef-search 16 64 \
+#       --top-k 4 8 --fetch-k 20 50 --lambda-mult 0.5 0.8 1.0 --out bench/results/retrieval.json
+#   python -m bench.retrieval_bench --db-dir vectordb --embed-url http://127.0.0.1:11434 --queries q.txt
+#
+# Latency is per search call with the query already embedded (embedding cost is
+# the same for every configuration); --include-embed times the full text query.
+# MMR trades recall@k for diversity by design, so its recall is expected to drop
+# as lambda_mult goes down.
+
+import argparse
+import itertools
+import logging
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from bench.common import percentiles, print_table, run_meta, write_json
+from core.logging import get_logger
+from retrieval.search import search_by_vector
+
+TABLE_COLUMNS = (
+    "index", "param", "search", "top_k", "fetch_k", "lambda_mult",
+    "recall", "p50_ms", "p95_ms", "p99_ms", "qps",
+)
+
+
+# ---------------------------------------------
+# Index and query set
+# ---------------------------------------------
+def build_synthetic_index(work_dir: Path, *, docs: int, pages: int, embeddings, seed: int) -> FAISS:
+    """Synthetic corpus through the real ingestion path (see bench.ingest_bench)"""
+    from bench.corpus import make_corpus
+    from ingestion.chunker import make_page_chunks
+    from ingestion.embed_store import build_faiss
+    from ingestion.pdf_loader import load_pdf_build_page_index
+
+    pdfs = make_corpus(str(work_dir / "pdfs"), docs=docs, pages=pages, words_per_page=400, seed=seed)
+    chunks = []
+    for p in pdfs:
+        manifest = load_pdf_build_page_index(p["path"], work_dir / "artifacts")
+        chunks.extend(make_page_chunks(manifest, chunk_size=800, chunk_overlap=100))
+    return build_faiss(chunks, str(work_dir / "vectordb"), embedding_model="", embeddings=embeddings)
+
+
+def sample_queries(vs: FAISS, n: int, seed: int, words: int = 8) -> List[str]:
+    """Word windows cut from random chunks: each query has a known relevant neighbourhood"""
+    rng = random.Random(seed)
+    texts = [vs.docstore.search(doc_id).page_content for doc_id in vs.index_to_docstore_id.values()]
+    queries = []
+    for _ in range(n):
+        tokens = rng.choice(texts).split()
+        start = rng.randrange(max(1, len(tokens) - words))
+        queries.append(" ".join(tokens[start:start + words]))
+    return queries
+
+
+def with_index(vs: FAISS, spec: str, vectors: np.ndarray) -> Tuple[FAISS, float]:
+    """Copy of `vs` whose vectors live in a faiss.index_factory(`spec`) index; returns (store, build seconds)"""
+    start = time.perf_counter()
+    index = faiss.index_factory(vectors.shape[1], spec, faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    ivf = faiss.try_extract_index_ivf(index) if "IVF" in spec else None
+    if ivf is not None:
+        ivf.make_direct_map()  # MMR reconstructs the fetched vectors
+    build_s = time.perf_counter() - start
+    clone = FAISS(
+        embedding_function=vs.embedding_function,
+        index=index,
+        docstore=vs.docstore,
+        index_to_docstore_id=vs.index_to_docstore_id,
+    )
+    return clone, build_s
+
+
+def set_search_param(index, spec: str, param: Optional[int]) -> Optional[str]:
+    """Apply nprobe (IVF) or efSearch (HNSW); returns a label for the table"""
+    if param is None:
+        return None
+    if "IVF" in spec:
+        faiss.extract_index_ivf(index).nprobe = param
+        return f"nprobe={param}"
+    if "HNSW" in spec:
+        faiss.downcast_index(index).hnsw.efSearch = param
+        return f"efSearch={param}"
+    return None
+
+
+# ---------------------------------------------
+# Measurement
+# ---------------------------------------------
+def ground_truth(vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> List[set]:
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, ids = exact.search(query_vectors, k)
+    return [set(int(i) for i in row if i >= 0) for row in ids]
+
+
+def run_config(
+    vs: FAISS,
+    queries: List[str],
+    query_vectors: np.ndarray,
+    truth: List[set],
+    doc_positions: Dict[str, int],
+    *,
+    top_k: int,
+    fetch_k: int,
+    use_mmr: bool,
+    lambda_mult: float,
+    include_embed: bool,
+) -> Dict:
+    latencies, hits = [], 0
+    for query, vector, relevant in zip(queries, query_vectors, truth):
+        start = time.perf_counter()
+        if include_embed:
+            vector = vs.embedding_function.embed_query(query)
+        docs = search_by_vector(
+            vs, list(map(float, vector)), k=top_k, fetch_k=fetch_k, use_mmr=use_mmr, lambda_mult=lambda_mult
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = {doc_positions[d.id] for d in docs if d.id in doc_positions}
+        hits += len(found & relevant)
+    total_s = sum(latencies) / 1000
+    pct = percentiles(latencies)
+    return {
+        "recall": round(hits / (top_k * len(queries)), 4) if queries else None,
+        "p50_ms": pct["p50"],
+        "p95_ms": pct["p95"],
+        "p99_ms": pct["p99"],
+        "qps": round(len(queries) / total_s, 1) if total_s else None,
+    }
+
+
+def sweep(args, vs: FAISS, queries: List[str]) -> List[Dict]:
+    vectors = vs.index.reconstruct_n(0, vs.index.ntotal)
+    query_vectors = np.asarray(vs.embedding_function.embed_documents(queries), dtype=np.float32)
+    position_of = {doc_id: pos for pos, doc_id in vs.index_to_docstore_id.items()}
+    truths = {k: ground_truth(vectors, query_vectors, k) for k in args.top_k}
+
+    searches = [("similarity", None)] if "similarity" in args.search else []
+    if "mmr" in args.search:
+        searches += [("mmr", lam) for lam in args.lambda_mult]
+
+    rows = []
+    for spec in args.index:
+        store, build_s = with_index(vs, spec, vectors)
+        params = args.nprobe if "IVF" in spec else args.ef_search if "HNSW" in spec else [None]
+        for param in params or [None]:
+            label = set_search_param(store.index, spec, param)
+            for (search, lam), top_k in itertools.product(searches, args.top_k):
+                fetch_ks = [f for f in args.fetch_k if f >= top_k] if search == "mmr" else [None]
+                for fetch_k in fetch_ks:
+                    # Warm-up pass so first-call allocation does not land in the percentiles
+                    search_by_vector(store, list(map(float, query_vectors[0])), k=top_k,
+                                     fetch_k=fetch_k or top_k, use_mmr=search == "mmr", lambda_mult=lam or 1.0)
+                    result = run_config(
+                        store, queries, query_vectors, truths[top_k], position_of,
+                        top_k=top_k, fetch_k=fetch_k or top_k, use_mmr=search == "mmr",
+                        lambda_mult=lam if lam is not None else 1.0, include_embed=args.include_embed,
+                    )
+                    rows.append({
+                        "index": spec, "param": label, "search": search, "top_k": top_k,
+                        "fetch_k": fetch_k, "lambda_mult": lam, "build_s": round(build_s, 3), **result,
+                    })
+                    if args.verbose:
+                        print_table([rows[-1]], TABLE_COLUMNS)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval recall@k vs latency over a configuration sweep")
+    parser.add_argument("--db-dir", default=None, help="existing FAISS index (default: build a synthetic one)")
+    parser.add_argument("--embedding-model", default="mxbai-embed-large")
+    parser.add_argument("--embed-url", default=None, help="Ollama-compatible server for embeddings")
+    parser.add_argument("--docs", type=int, default=20, help="synthetic corpus documents")
+    parser.add_argument("--pages", type=int, default=20, help="synthetic corpus pages per document")
+    parser.add_argument("--queries", default=None, help="file with one query per line (default: sampled)")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--index", nargs="+", default=["Flat", "HNSW32", "IVF64,Flat"], help="faiss.index_factory strings")
+    parser.add_argument("--nprobe", type=int, nargs="*", default=[1, 4, 16])
+    parser.add_argument("--ef-search", type=int, nargs="*", default=[16, 64])
+    parser.add_argument("--search", nargs="+", choices=["similarity", "mmr"], default=["similarity", "mmr"])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[4, 8])
+    parser.add_argument("--fetch-k", type=int, nargs="+", default=[30])
+    parser.add_argument("--lambda-mult", type=float, nargs="+", default=[0.5, 0.8])
+    parser.add_argument("--include-embed", action="store_true", help="time query embedding too")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="JSON output path (default: table only)")
+    parser.add_argument("--verbose", action="store_true", help="print each row as it finishes")
+    args = parser.parse_args()
+
+    get_logger().setLevel(logging.WARNING)
+    if args.embed_url:
+        from langchain_ollama import OllamaEmbeddings
+        embeddings = OllamaEmbeddings(model=args.embedding_model, base_url=args.embed_url)
+    else:
+        from bench.standin import HashEmbeddings
+        embeddings = HashEmbeddings(args.embedding_model)
+
+    work_dir = None
+    try:
+        if args.db_dir:
+            from ingestion.embed_store import load_faiss
+            vs = load_faiss(args.db_dir, embedding_model=args.embedding_model, embeddings=embeddings)
+        else:
+            work_dir = Path(tempfile.mkdtemp(prefix="retrieval_bench_"))
+            vs = build_synthetic_index(work_dir, docs=args.docs, pages=args.pages, embeddings=embeddings, seed=args.seed)
+
+        if args.queries:
+            queries = [q.strip() for q in Path(args.queries).read_text(encoding="utf-8").splitlines() if q.strip()]
+        else:
+            queries = sample_queries(vs, args.num_queries, args.seed)
+
+        print(f"{vs.index.ntotal} vectors (dim {vs.index.d}), {len(queries)} queries")
+        rows = sweep(args, vs, queries)
+    finally:
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print()
+    print_table(rows, TABLE_COLUMNS)
+    if args.out:
+        meta = run_meta(benchmark="retrieval", vectors=int(vs.index.ntotal), dim=int(vs.index.d), queries=len(queries))
+        write_json(args.out, {"meta": meta, "results": rows})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+# local stand-in for the Ollama and Groq HTTP APIs
+#
+# Implements the endpoints our clients call - OllamaEmbeddings (/api/embed),
+# ChatOllama (/api/chat, streamed NDJSON), the warm-up calls (/api/generate),
+# and the OpenAI-compatible Groq chat completions (streamed SSE) - with
+# deterministic output, so benchmarks and load tests run offline and repeatably.
+#
+# Embeddings are hashed bag-of-words vectors with the dimension of the requested
+# embedding model (AppConfig.AVAILABLE_EMBEDDING_MODELS): identical text gives an
+# identical vector and texts sharing words are close, so retrieval still behaves
+# like retrieval. Answers are pseudo-words seeded by the prompt, emitted at a
+# configurable token rate after a configurable first-token delay, with optional
+# error injection.
+#
+# run it (then point the backend at it):
+#
+#   python -m bench.standin --port 11500 --tokens-per-s 40 --first-token-ms 150
+#   OLLAMA_BASE_URL=http://127.0.0.1:11500 GROQ_BASE_URL=http://127.0.0.1:11500/openai/v1 \
+#       GROQ_API_KEY=standin python main.py
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+import uuid
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from langchain_core.embeddings import Embeddings
+
+from core.config import AppConfig
+
+DEFAULT_DIM = 768
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Vocabulary for generated answers (deterministic per prompt)
+_VOCAB = (
+    "the document states that this section describes results method data page table figure "
+    "value model system analysis shows important key process report summary based according "
+    "information provided context answer question shown above below first second also however"
+).split()
+
+
+@dataclass
+class StandinSettings:
+    """Behaviour of the stand-in server; every field can be set from STANDIN_<NAME> env vars"""
+    tokens_per_s: float = 50.0          # generation speed (0 = as fast as possible)
+    first_token_ms: float = 200.0       # prompt processing time before the first token
+    answer_tokens: int = 128            # tokens per answer unless num_predict / max_tokens is lower
+    embed_ms: float = 5.0               # latency per embed request
+    embed_ms_per_input: float = 0.5     # extra latency per input text
+    dim: int = 0                        # embedding dimension (0 = from the model name)
+    error_rate: float = 0.0             # fraction of requests failed up front with error_status
+    error_status: int = 503
+    stream_error_rate: float = 0.0      # fraction of streams cut off half way with an error
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls) -> "StandinSettings":
+        values = {}
+        for f in fields(cls):
+            raw = os.getenv(f"STANDIN_{f.name.upper()}")
+            if raw is not None:
+                values[f.name] = type(f.default)(raw)
+        return cls(**values)
+
+
+def embedding_dim(model: str, default: int = DEFAULT_DIM) -> int:
+    """Dimension of a configured embedding model ("name" or "name:tag"); `default` if unknown"""
+    name = (model or "").split(":")[0]
+    for m in AppConfig.AVAILABLE_EMBEDDING_MODELS:
+        if m.id == model or m.id == name:
+            return m.dimensions
+    return default
+
+
+def hash_embedding(text: str, dim: int) -> List[float]:
+    """Deterministic unit vector: signed feature hashing of the lower-cased words of `text`"""
+    vec = np.zeros(dim, dtype=np.float32)
+    for word in _WORD_RE.findall(text.lower()):
+        h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if (h >> 63) & 1 else -1.0
+    norm = float(np.linalg.norm(vec))
+    if norm == 0.0:
+        vec[0], norm = 1.0, 1.0
+    return (vec / norm).tolist()
+
+
+class HashEmbeddings(Embeddings):
+    """In-process stand-in embedder: the server's vectors without the HTTP round trip"""
+
+    def __init__(self, model: Optional[str] = None, dim: int = 0):
+        self.dim = dim or embedding_dim(model or "")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [hash_embedding(t, self.dim) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return hash_embedding(text, self.dim)
+
+
+def answer_tokens(prompt: str, n: int) -> Iterator[str]:
+    """`n` pseudo-word tokens seeded by the prompt (same prompt -> same answer)"""
+    rng = random.Random(hashlib.blake2b(prompt.encode(), digest_size=8).digest())
+    for i in range(n):
+        word = rng.choice(_VOCAB)
+        yield word if i == 0 else " " + word
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _last_user_message(messages: List[Dict]) -> str:
+    for m in reversed(messages or []):
+        if m.get("role") == "user":
+            content = m.get("content")
+            return content if isinstance(content, str) else json.dumps(content)
+    return ""
+
+
+class Standin:
+    """Request handling and counters shared by the Ollama and Groq routes"""
+
+    def __init__(self, settings: StandinSettings):
+        self.settings = settings
+        self.rng = random.Random(settings.seed)
+        self.counts: Dict[str, int] = {}
+        self.active_streams = 0
+        self.tokens_sent = 0
+
+    def count(self, what: str):
+        self.counts[what] = self.counts.get(what, 0) + 1
+
+    def maybe_fail(self, what: str, groq: bool = False):
+        """Inject an up-front error for a fraction of requests"""
+        if self.settings.error_rate > 0 and self.rng.random() < self.settings.error_rate:
+            self.count(f"{what}_injected_error")
+            status = self.settings.error_status
+            message = f"stand-in injected error ({status})"
+            headers = {"retry-after": "0"} if status == 429 else None
+            body = {"error": {"message": message, "type": "standin"}} if groq else {"error": message}
+            raise HTTPException(status, detail=body, headers=headers)
+
+    def n_tokens(self, limit: Optional[int]) -> int:
+        n = self.settings.answer_tokens
+        if limit is not None and limit > 0:
+            n = min(n, limit)
+        return n
+
+    async def tokens(self, prompt: str, n: int):
+        """Yield (token, last) at the configured pace; raises midway when a stream error is injected"""
+        s = self.settings
+        cut_at = None
+        if s.stream_error_rate > 0 and self.rng.random() < s.stream_error_rate:
+            cut_at = n // 2
+        self.active_streams += 1
+        try:
+            await asyncio.sleep(s.first_token_ms / 1000)
+            interval = 1 / s.tokens_per_s if s.tokens_per_s > 0 else 0
+            for i, token in enumerate(answer_tokens(prompt, n)):
+                if cut_at is not None and i == cut_at:
+                    raise RuntimeError("stand-in injected stream error")
+                if i and interval:
+                    await asyncio.sleep(interval)
+                self.tokens_sent += 1
+                yield token, i == n - 1
+        finally:
+            self.active_streams -= 1
+
+    async def embed(self, model: str, inputs: List[str]) -> List[List[float]]:
+        s = self.settings
+        await asyncio.sleep((s.embed_ms + s.embed_ms_per_input * len(inputs)) / 1000)
+        dim = s.dim or embedding_dim(model)
+        return [hash_embedding(text, dim) for text in inputs]
+
+
+def create_app(settings: Optional[StandinSettings] = None) -> FastAPI:
+    standin = Standin(settings or StandinSettings.from_env())
+    app = FastAPI(title="Ollama/Groq stand-in")
+    app.state.standin = standin
+
+    @app.exception_handler(HTTPException)
+    async def error_body(request: Request, exc: HTTPException):
+        # Ollama and Groq put the error object at the top level, not under "detail"
+        return JSONResponse(exc.detail, status_code=exc.status_code, headers=exc.headers)
+
+    # ---------------------------------------------
+    # Ollama API
+    # ---------------------------------------------
+    @app.get("/", response_class=PlainTextResponse)
+    async def root():
+        return "Ollama is running"
+
+    @app.get("/api/version")
+    async def version():
+        return {"version": "0.0.0-standin"}
+
+    @app.get("/api/tags")
+    async def tags():
+        config = AppConfig()
+        names = [m.id for m in config.AVAILABLE_LLM_MODELS + config.AVAILABLE_EMBEDDING_MODELS]
+        return {"models": [{"name": n, "model": n, "modified_at": _now(), "size": 0, "digest": ""} for n in names]}
+
+    @app.post("/api/embed")
+    async def embed(body: Dict):
+        standin.count("ollama_embed")
+        standin.maybe_fail("ollama_embed")
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        start = time.perf_counter()
+        vectors = await standin.embed(body.get("model", ""), inputs)
+        return {
+            "model": body.get("model"),
+            "embeddings": vectors,
+            "total_duration": int((time.perf_counter() - start) * 1e9),
+            "prompt_eval_count": sum(len(_WORD_RE.findall(t)) for t in inputs),
+        }
+
+    @app.post("/api/embeddings")
+    async def embeddings_legacy(body: Dict):
+        standin.count("ollama_embeddings")
+        standin.maybe_fail("ollama_embeddings")
+        vectors = await standin.embed(body.get("model", ""), [body.get("prompt", "")])
+        return {"embedding": vectors[0]}
+
+    async def ollama_stream(model: str, prompt: str, n: int, chat: bool):
+        def chunk(text: str, done: bool) -> str:
+            out = {"model": model, "created_at": _now(), "done": done}
+            if chat:
+                out["message"] = {"role": "assistant", "content": text}
+            else:
+                out["response"] = text
+            if done:
+                out.update(done_reason="stop", eval_count=n, prompt_eval_count=len(_WORD_RE.findall(prompt)))
+            return json.dumps(out) + "\n"
+
+        try:
+            async for token, _ in standin.tokens(prompt, n):
+                yield chunk(token, False)
+        except RuntimeError as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+            return
+        yield chunk("", True)
+
+    async def ollama_generate(body: Dict, chat: bool):
+        what = "ollama_chat" if chat else "ollama_generate"
+        standin.count(what)
+        standin.maybe_fail(what)
+        model = body.get("model", "")
+        prompt = _last_user_message(body.get("messages")) if chat else body.get("prompt") or ""
+        n = standin.n_tokens((body.get("options") or {}).get("num_predict"))
+        if not chat and not prompt:
+            n = 0  # an empty generate only loads the model (warm-up)
+        stream = ollama_stream(model, prompt, n, chat)
+        if body.get("stream", True):
+            return StreamingResponse(stream, media_type="application/x-ndjson")
+        # Non-streaming: same pacing, one merged response
+        text, final = [], {}
+        async for line in stream:
+            data = json.loads(line)
+            if "error" in data:
+                raise HTTPException(500, detail=data)
+            text.append(data["message"]["content"] if chat else data["response"])
+            final = data
+        if chat:
+            final["message"] = {"role": "assistant", "content": "".join(text)}
+        else:
+            final["response"] = "".join(text)
+        return final
+
+    @app.post("/api/chat")
+    async def ollama_chat(body: Dict):
+        return await ollama_generate(body, chat=True)
+
+    @app.post("/api/generate")
+    async def ollama_generate_route(body: Dict):
+        return await ollama_generate(body, chat=False)
+
+    # ---------------------------------------------
+    # Groq (OpenAI-compatible) API
+    # ---------------------------------------------
+    @app.get("/openai/v1/models")
+    async def groq_models():
+        return {"object": "list", "data": [{"id": m, "object": "model"} for m in ("llama-3.3-70b-versatile",)]}
+
+    @app.post("/openai/v1/chat/completions")
+    async def groq_chat(body: Dict):
+        standin.count("groq_chat")
+        standin.maybe_fail("groq_chat", groq=True)
+        model = body.get("model", "")
+        prompt = _last_user_message(body.get("messages"))
+        n = standin.n_tokens(body.get("max_tokens") or body.get("max_completion_tokens"))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        usage = {
+            "prompt_tokens": len(_WORD_RE.findall(json.dumps(body.get("messages", [])))),
+            "completion_tokens": n,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + n
+
+        def chunk(delta: Dict, finish: Optional[str] = None, **extra) -> str:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                **extra,
+            }
+            return f"data: {json.dumps(data)}\n\n"
+
+        if body.get("stream"):
+            async def sse():
+                yield chunk({"role": "assistant", "content": ""})
+                try:
+                    async for token, _ in standin.tokens(prompt, n):
+                        yield chunk({"content": token})
+                except RuntimeError as e:
+                    yield f"data: {json.dumps({'error': {'message': str(e), 'type': 'standin'}})}\n\n"
+                    return
+                yield chunk({}, "stop", x_groq={"id": completion_id, "usage": usage})
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(sse(), media_type="text/event-stream")
+
+        text = []
+        try:
+            async for token, _ in standin.tokens(prompt, n):
+                text.append(token)
+        except RuntimeError as e:
+            raise HTTPException(500, detail={"error": {"message": str(e), "type": "standin"}})
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(text)},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        }
+
+    # ---------------------------------------------
+    # Stand-in control
+    # ---------------------------------------------
+    @app.get("/standin/stats")
+    async def stats():
+        return {
+            "requests": standin.counts,
+            "active_streams": standin.active_streams,
+            "tokens_sent": standin.tokens_sent,
+            "settings": asdict(standin.settings),
+        }
+
+    @app.patch("/standin/settings")
+    async def update_settings(body: Dict):
+        """Change behaviour between benchmark phases without restarting"""
+        known = {f.name: type(f.default) for f in fields(StandinSettings)}
+        for name, value in body.items():
+            if name not in known:
+                raise HTTPException(400, detail={"error": f"unknown setting: {name}"})
+            setattr(standin.settings, name, known[name](value))
+        standin.rng.seed(standin.settings.seed)
+        return asdict(standin.settings)
+
+    return app
+
+
+def main():
+    defaults = StandinSettings.from_env()
+    parser = argparse.ArgumentParser(description="Stand-in Ollama/Groq server for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    for f in fields(StandinSettings):
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=type(f.default), default=getattr(defaults, f.name))
+    args = parser.parse_args()
+
+    import uvicorn
+
+    settings = StandinSettings(**{f.name: getattr(args, f.name) for f in fields(StandinSettings)})
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
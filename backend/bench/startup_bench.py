@@ -0,0 +1,132 @@
+# API cold-start benchmark: time-to-ready, baseline RSS, import-time breakdown
+#
+# Starts the API with uvicorn `--runs` times and measures the time from spawning
+# the process until /api/health answers, the worker's RSS at that moment, and its
+# RSS once background warm-up has settled. Then runs `python -X importtime -c
+# "import main"` and aggregates self import time per top-level package.
+#
+#   python -m bench.startup_bench
+#   python -m bench.startup_bench --runs 5 --settle-s 5 --out bench/results/startup.json
+#
+# Model warm-up is turned off (no Ollama needed); WARMUP_IMPORTS is left as
+# configured unless --no-warmup-imports is passed.
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from bench.common import BACKEND_DIR, print_table, run_meta, write_json
+from bench.loadtest import free_port
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError):
+        return None
+
+
+def start_once(env: Dict[str, str], settle_s: float, timeout_s: float = 60.0) -> Dict:
+    """Spawn the API, poll /api/health until it answers; returns ready time and RSS"""
+    port = free_port()
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"]
+    url = f"http://127.0.0.1:{port}/api/health"
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        with httpx.Client(timeout=2) as client:
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"API exited early: {proc.stderr.read().decode()[-2000:]}")
+                if time.perf_counter() - start > timeout_s:
+                    raise RuntimeError("API did not become ready")
+                try:
+                    r = client.get(url)
+                    if r.status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.005)
+            ready_s = time.perf_counter() - start
+            ready_rss = _rss_mb(proc.pid)
+            time.sleep(settle_s)
+            health = client.get(url).json()
+        return {
+            "ready_ms": round(ready_s * 1000, 1),
+            "rss_ready_mb": ready_rss,
+            "rss_settled_mb": _rss_mb(proc.pid),
+            "startup": health.get("startup"),
+        }
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=20)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def import_breakdown(env: Dict[str, str], top: int) -> List[Dict]:
+    """Self import time of `import main` summed per top-level package (python -X importtime)"""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    per_package, modules = defaultdict(int), defaultdict(int)
+    for line in out.stderr.splitlines():
+        m = IMPORT_LINE.match(line)
+        if m:
+            per_package[m.group(4).split(".")[0]] += int(m.group(1))
+            modules[m.group(4).split(".")[0]] += 1
+    total = sum(per_package.values()) or 1
+    rows = sorted(per_package.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return [
+        {"package": name, "modules": modules[name], "self_ms": round(us / 1000, 1), "share": f"{us / total:.0%}"}
+        for name, us in rows
+    ] + [{"package": "(total)", "modules": sum(modules.values()), "self_ms": round(total / 1000, 1), "share": "100%"}]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API time-to-ready, RSS and import-time breakdown")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--settle-s", type=float, default=3.0, help="wait after ready before the second RSS sample")
+    parser.add_argument("--top", type=int, default=15, help="packages in the import breakdown")
+    parser.add_argument("--no-warmup-imports", action="store_true", help="set WARMUP_IMPORTS=false")
+    parser.add_argument("--out", default=None, help="JSON output path (default: table only)")
+    args = parser.parse_args()
+
+    env = {**os.environ, "WARMUP_ON_STARTUP": "false", "PYTHONDONTWRITEBYTECODE": "1"}
+    if args.no_warmup_imports:
+        env["WARMUP_IMPORTS"] = "false"
+
+    runs = [start_once(env, args.settle_s) for _ in range(max(1, args.runs))]
+    summary = {
+        "ready_ms_median": statistics.median(r["ready_ms"] for r in runs),
+        "ready_ms_min": min(r["ready_ms"] for r in runs),
+        "rss_ready_mb_median": statistics.median(r["rss_ready_mb"] or 0 for r in runs),
+        "rss_settled_mb_median": statistics.median(r["rss_settled_mb"] or 0 for r in runs),
+    }
+    print_table(runs, ["ready_ms", "rss_ready_mb", "rss_settled_mb"])
+    print()
+    print_table([summary], list(summary))
+    print()
+    breakdown = import_breakdown(env, args.top)
+    print_table(breakdown, ["package", "modules", "self_ms", "share"])
+
+    if args.out:
+        write_json(args.out, {"meta": run_meta(benchmark="startup"), "summary": summary, "runs": runs,
+                              "imports": breakdown})
+
+
+if __name__ == "__main__":
+    main()
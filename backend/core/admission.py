@@ -0,0 +1,188 @@
+# per-model admission control for LLM generations
+#
+# Each model gets a gate with a concurrency limit and a bounded FIFO wait queue.
+# A request takes a ticket before generating: it is admitted at once when a slot
+# is free, waits in line (reporting its position) when the model is busy, and is
+# rejected with a Retry-After estimate when the queue is already full.
+#
+# example:
+#   ticket = get_admission_controller().enqueue("mistral:7b")   # may raise QueueFullError
+#   try:
+#       async for position in ticket.wait():
+#           ...  # tell the client it is queued
+#       ...      # generate
+#   finally:
+#       ticket.release()
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from core.config import AppConfig, get_config
+
+
+class QueueFullError(Exception):
+    """Raised when a model's wait queue is full"""
+
+    def __init__(self, model: str, retry_after: int):
+        super().__init__(f"Model {model} is at capacity, retry in {retry_after}s")
+        self.model = model
+        self.retry_after = retry_after
+
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(self.retry_after)}
+
+
+class Ticket:
+    """A request's place at a model gate"""
+
+    def __init__(self, gate: "ModelGate", granted: asyncio.Future):
+        self.gate = gate
+        self._granted = granted
+        self._released = False
+        self.enqueued_at = time.perf_counter()
+        self.admitted_at: Optional[float] = time.perf_counter() if granted.done() else None
+
+    @property
+    def position(self) -> int:
+        """1-based position in the wait queue (0 once admitted)"""
+        try:
+            return self.gate._waiters.index(self) + 1
+        except ValueError:
+            return 0
+
+    @property
+    def queued_ms(self) -> float:
+        end = self.admitted_at if self.admitted_at is not None else time.perf_counter()
+        return (end - self.enqueued_at) * 1000
+
+    async def wait(self) -> AsyncIterator[int]:
+        """Yield the queue position each time it changes, until a slot is granted"""
+        last = None
+        while not self._granted.done():
+            position = self.position
+            if position != last:
+                last = position
+                yield position
+            await asyncio.wait({self._granted, self.gate._moved}, return_when=asyncio.FIRST_COMPLETED)
+
+    def release(self):
+        """Give the slot back (or leave the queue); safe to call more than once"""
+        if self._released:
+            return
+        self._released = True
+        self.gate._release(self)
+
+
+class ModelGate:
+    """Concurrency limit plus bounded wait queue for one model"""
+
+    def __init__(self, model: str, limit: int, max_queue: int):
+        self.model = model
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.active = 0
+        self._waiters: Deque[Ticket] = deque()
+        self._moved = asyncio.get_running_loop().create_future()
+        # stats
+        self.admitted = 0
+        self.rejected = 0
+        self.total_queue_ms = 0.0
+        self.max_queue_ms = 0.0
+        self._avg_service_s = 5.0  # EWMA of slot hold time, seeds Retry-After
+
+    def enqueue(self) -> Ticket:
+        granted = asyncio.get_running_loop().create_future()
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            granted.set_result(True)
+            ticket = Ticket(self, granted)
+            self._record_admit(ticket)
+            return ticket
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(self.model, self.retry_after())
+
+        ticket = Ticket(self, granted)
+        self._waiters.append(ticket)
+        return ticket
+
+    def retry_after(self) -> int:
+        """Seconds until a new request would likely get a slot"""
+        return max(1, math.ceil(self._avg_service_s * (len(self._waiters) + 1) / self.limit))
+
+    def _record_admit(self, ticket: Ticket):
+        ticket.admitted_at = time.perf_counter()
+        self.admitted += 1
+        self.total_queue_ms += ticket.queued_ms
+        self.max_queue_ms = max(self.max_queue_ms, ticket.queued_ms)
+
+    def _notify_moved(self):
+        self._moved.set_result(True)
+        self._moved = asyncio.get_running_loop().create_future()
+
+    def _release(self, ticket: Ticket):
+        if ticket._granted.done():
+            held_s = time.perf_counter() - (ticket.admitted_at or ticket.enqueued_at)
+            self._avg_service_s = 0.8 * self._avg_service_s + 0.2 * held_s
+            self.active -= 1
+            while self._waiters and self.active < self.limit:
+                nxt = self._waiters.popleft()
+                self.active += 1
+                self._record_admit(nxt)
+                nxt._granted.set_result(True)
+        else:
+            # Left the queue before being admitted (cancelled / disconnected)
+            try:
+                self._waiters.remove(ticket)
+            except ValueError:
+                pass
+            ticket._granted.cancel()
+        self._notify_moved()
+
+    def stats(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_queue_ms": round(self.total_queue_ms / self.admitted, 1) if self.admitted else 0.0,
+            "max_queue_ms": round(self.max_queue_ms, 1),
+        }
+
+
+class AdmissionController:
+    """Model gates created on first use from AppConfig limits"""
+
+    def __init__(self, config: Optional[AppConfig] = None):
+        self.config = config or get_config()
+        self._gates: Dict[str, ModelGate] = {}
+
+    def gate(self, model: str) -> ModelGate:
+        gate = self._gates.get(model)
+        if gate is None:
+            limit = self.config.model_concurrency_limits.get(model, self.config.model_max_concurrency)
+            gate = ModelGate(model, limit, self.config.model_max_queue)
+            self._gates[model] = gate
+        return gate
+
+    def enqueue(self, model: str) -> Ticket:
+        return self.gate(model).enqueue()
+
+    def stats(self) -> Dict[str, Dict]:
+        return {model: gate.stats() for model, gate in self._gates.items()}
+
+
+_controller: Optional[AdmissionController] = None  # one controller per process
+
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
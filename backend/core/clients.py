@@ -0,0 +1,250 @@
+# process-wide registry of long-lived LLM / embedding clients
+#
+# Building a ChatOllama, OllamaEmbeddings or Groq client per request means a new
+# HTTP client (and a new TCP/TLS connection) per query. The registry keeps one
+# client per (provider, model, params) for the life of the process, each backed
+# by a keep-alive connection pool sized from AppConfig.
+#
+# use it anywhere using:
+#
+# from core.clients import get_client_registry
+# llm = get_client_registry().chat_ollama("gemma2:2b", temperature=0.3)
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from core.config import AppConfig, get_config
+from core.logging import get_logger
+
+logger = get_logger()
+
+Key = Tuple[Any, ...]
+
+DEFAULT_NUM_CTX = 4096  # context window for chat models (changing it makes Ollama reload the model)
+
+
+class _Entry:
+    """A registered client plus the HTTP clients it owns (for stats and shutdown)"""
+
+    def __init__(self, key: Key, client: Any, http_clients: List[Any], params: Dict):
+        self.key = key
+        self.client = client
+        self.http_clients = http_clients
+        self.params = params
+        self.created_at = time.time()
+        self.hits = 0
+
+
+def _http_clients(*owners: Any) -> List[Any]:
+    """httpx clients wrapped by SDK clients (owner._client), skipping any whose layout differs"""
+    found = []
+    for owner in owners:
+        http_client = getattr(owner, "_client", None)
+        if isinstance(http_client, (httpx.Client, httpx.AsyncClient)):
+            found.append(http_client)
+    return found
+
+
+def _pool_stats(http_client: Any) -> Dict[str, int]:
+    """Best-effort connection pool usage for an httpx.Client / httpx.AsyncClient ({} when unavailable)"""
+    pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+    if pool is None:
+        return {}
+    try:
+        connections = list(getattr(pool, "_connections", []))
+        idle = sum(1 for c in connections if getattr(c, "is_idle", lambda: False)())
+    except Exception:  # private httpcore layout changed
+        return {}
+    return {
+        "connections": len(connections),
+        "active": len(connections) - idle,
+        "idle": idle,
+        "queued_requests": len(getattr(pool, "_requests", [])),
+        "max_connections": getattr(pool, "_max_connections", 0) or 0,
+    }
+
+
+class ClientRegistry:
+    """Long-lived clients keyed by provider, model and parameters"""
+
+    def __init__(self, config: Optional[AppConfig] = None):
+        self.config = config or get_config()
+        self._entries: "OrderedDict[Key, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ---------------------------------------------
+    # HTTP pool settings
+    # ---------------------------------------------
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.config.http_pool_max_connections,
+            max_keepalive_connections=self.config.http_pool_max_keepalive,
+            keepalive_expiry=self.config.http_keepalive_expiry,
+        )
+
+    def _get_or_create(self, key: Key, params: Dict, factory: Callable[[], Tuple[Any, List[Any]]]) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.hits += 1
+                self.hits += 1
+                return entry.client
+
+            client, http_clients = factory()
+            self._entries[key] = _Entry(key, client, http_clients, params)
+            self.misses += 1
+            logger.info(f"Client registry: created {key[0]} client for {key[1]}")
+
+            while len(self._entries) > self.config.client_registry_max_entries:
+                # Evicted clients may still be serving a request, so they are not
+                # closed here; their pools are released once the last user drops them.
+                old_key, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+                logger.info(f"Client registry: evicted {old_key[0]} client for {old_key[1]}")
+            return client
+
+    # ---------------------------------------------
+    # Client factories
+    # ---------------------------------------------
+    def _ollama_kwargs(self) -> Dict:
+        kwargs: Dict[str, Any] = {
+            "client_kwargs": {"limits": self._limits()},
+            "keep_alive": self.config.ollama_keep_alive_s,
+        }
+        if self.config.ollama_base_url:
+            kwargs["base_url"] = self.config.ollama_base_url
+        return kwargs
+
+    def chat_ollama(self, model: str, *, temperature: float = 0.3, num_ctx: int = DEFAULT_NUM_CTX):
+        """Shared ChatOllama for (model, temperature, num_ctx)"""
+        from langchain_ollama import ChatOllama
+
+        params = {"temperature": temperature, "num_ctx": num_ctx}
+        key: Key = ("ollama-chat", model, temperature, num_ctx)
+
+        def factory():
+            llm = ChatOllama(model=model, temperature=temperature, num_ctx=num_ctx, **self._ollama_kwargs())
+            return llm, _http_clients(getattr(llm, "_client", None), getattr(llm, "_async_client", None))
+
+        return self._get_or_create(key, params, factory)
+
+    def ollama_embeddings(self, model: str):
+        """Shared OllamaEmbeddings for an embedding model"""
+        from langchain_ollama import OllamaEmbeddings
+
+        key: Key = ("ollama-embeddings", model)
+
+        def factory():
+            emb = OllamaEmbeddings(model=model, **self._ollama_kwargs())
+            return emb, _http_clients(getattr(emb, "_client", None), getattr(emb, "_async_client", None))
+
+        return self._get_or_create(key, {}, factory)
+
+    def ollama_admin(self):
+        """Shared raw ollama.AsyncClient for model management calls (warm-up, ps)"""
+        from ollama import AsyncClient
+
+        key: Key = ("ollama-admin", self.config.ollama_base_url or "default")
+
+        def factory():
+            client = AsyncClient(host=self.config.ollama_base_url, limits=self._limits())
+            return client, _http_clients(client)
+
+        return self._get_or_create(key, {}, factory)
+
+    def groq_async(
+        self,
+        *,
+        model: str,
+        temperature: float = 0.3,
+        max_tokens: int = 2048,
+        api_key: Optional[str] = None,
+    ):
+        """Shared AsyncGroqLLMClient (timeouts/retries from AppConfig) on a pooled httpx.AsyncClient"""
+        from api.llm.clients.groq_clients import AsyncGroqLLMClient
+
+        params = {"temperature": temperature, "max_tokens": max_tokens}
+        key: Key = ("groq-async", model, temperature, max_tokens, api_key)
+
+        def factory():
+            http_client = httpx.AsyncClient(limits=self._limits())
+            client = AsyncGroqLLMClient(
+                api_key=api_key,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                base_url=self.config.groq_base_url,
+                connect_timeout=self.config.groq_connect_timeout_s,
+                read_timeout=self.config.groq_read_timeout_s,
+                idle_timeout=self.config.groq_stream_idle_timeout_s,
+                max_retries=self.config.groq_max_retries,
+                backoff_max=self.config.groq_backoff_max_s,
+                http_client=http_client,
+            )
+            return client, [http_client]
+
+        return self._get_or_create(key, params, factory)
+
+    # ---------------------------------------------
+    # Observability / lifecycle
+    # ---------------------------------------------
+    def stats(self) -> Dict:
+        """Registry hit counts and per-client connection pool usage"""
+        with self._lock:
+            entries = list(self._entries.values())
+        clients = []
+        for e in entries:
+            pools = [_pool_stats(h) for h in e.http_clients]
+            pools = [p for p in pools if p]
+            clients.append({
+                "provider": e.key[0],
+                "model": e.key[1],
+                "params": e.params,
+                "hits": e.hits,
+                "age_s": round(time.time() - e.created_at, 1),
+                "pool": {
+                    k: sum(p.get(k, 0) for p in pools)
+                    for k in ("connections", "active", "idle", "queued_requests", "max_connections")
+                },
+            })
+        return {
+            "size": len(entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "clients": clients,
+        }
+
+    async def aclose(self):
+        """Close every pooled HTTP client (called at app shutdown)"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for e in entries:
+            for h in e.http_clients:
+                try:
+                    if isinstance(h, httpx.AsyncClient):
+                        await h.aclose()
+                    else:
+                        h.close()
+                except Exception as ex:
+                    logger.warning(f"Client registry: close failed for {e.key[0]}: {ex}")
+        logger.info(f"Client registry: closed {len(entries)} client(s)")
+
+
+_registry: Optional[ClientRegistry] = None  # one registry per process
+
+
+def get_client_registry() -> ClientRegistry:
+    global _registry
+    if _registry is None:
+        _registry = ClientRegistry()
+    return _registry
@@ -1,7 +1,7 @@
 # core/config.py - Enhanced with model management
 import os
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 from pydantic import BaseModel
 
 
@@ -91,9 +91,9 @@ class AppConfig:
     def __init__(self):
         # Directories
         self.base_dir = Path(__file__).parent.parent
-        self.data_dir = self.base_dir / "data"
-        self.artifacts_dir = self.base_dir / "artifacts"
-        self.db_dir = self.base_dir / "vectordb"
+        self.data_dir = Path(os.getenv("DATA_DIR") or self.base_dir / "data")
+        self.artifacts_dir = Path(os.getenv("ARTIFACTS_DIR") or self.base_dir / "artifacts")
+        self.db_dir = Path(os.getenv("VECTORDB_DIR") or self.base_dir / "vectordb")
         
         # Model settings (defaults)
         self.llm_model = os.getenv("LLM_MODEL", "gemma2:2b")
@@ -106,15 +106,114 @@ class AppConfig:
         self.fetch_k = int(os.getenv("FETCH_K", "30"))
         self.temperature = float(os.getenv("TEMPERATURE", "0.3"))
         self.use_mmr = os.getenv("USE_MMR", "true").lower() == "true"
+        self.mmr_lambda = float(os.getenv("MMR_LAMBDA", "0.8"))  # 1.0 = pure relevance, 0.0 = max diversity
         
         # System settings
         self.max_file_size_mb = 50
         self.allowed_extensions = {".pdf"}
+
+        # SSE token coalescing (per-request overridable): merge deltas into one frame
+        # every SSE_COALESCE_MS or SSE_COALESCE_CHARS, whichever comes first (0 ms = off)
+        self.sse_coalesce_ms = int(os.getenv("SSE_COALESCE_MS", "20"))
+        self.sse_coalesce_chars = int(os.getenv("SSE_COALESCE_CHARS", "256"))
+
+        # Resumable chat streams: replay buffer per generation, finished generations
+        # kept for SSE_REPLAY_TTL_S, and how long an abandoned generation keeps
+        # running waiting for its client to reconnect with Last-Event-ID
+        self.sse_replay_max_bytes_per_stream = int(os.getenv("SSE_REPLAY_MAX_BYTES_PER_STREAM", str(1 << 20)))
+        self.sse_replay_max_bytes = int(os.getenv("SSE_REPLAY_MAX_BYTES", str(32 << 20)))
+        self.sse_replay_ttl_s = float(os.getenv("SSE_REPLAY_TTL_S", "60"))
+        self.sse_resume_grace_s = float(os.getenv("SSE_RESUME_GRACE_S", "5"))
+
+        # Model backends / HTTP connection pools (shared by all requests)
+        self.ollama_base_url = os.getenv("OLLAMA_BASE_URL") or None  # None -> OLLAMA_HOST or localhost
+        self.http_pool_max_connections = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "32"))
+        self.http_pool_max_keepalive = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "16"))
+        self.http_keepalive_expiry = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+        self.client_registry_max_entries = int(os.getenv("CLIENT_REGISTRY_MAX_ENTRIES", "32"))
+
+        # Groq (async client): endpoint, timeouts and retry budget
+        self.groq_base_url = os.getenv("GROQ_BASE_URL") or None  # None -> https://api.groq.com/openai/v1
+        self.groq_connect_timeout_s = float(os.getenv("GROQ_CONNECT_TIMEOUT_S", "5"))
+        self.groq_read_timeout_s = float(os.getenv("GROQ_READ_TIMEOUT_S", "60"))
+        self.groq_stream_idle_timeout_s = float(os.getenv("GROQ_STREAM_IDLE_TIMEOUT_S", "30"))
+        self.groq_max_retries = int(os.getenv("GROQ_MAX_RETRIES", "3"))
+        self.groq_backoff_max_s = float(os.getenv("GROQ_BACKOFF_MAX_S", "20"))
+
+        # Model warm-up: pre-load default models at startup / on model switch and
+        # ask Ollama to keep them resident for OLLAMA_KEEP_ALIVE_S after each use
+        self.warmup_on_startup = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+        self.warmup_timeout_s = float(os.getenv("WARMUP_TIMEOUT_S", "120"))
+        self.ollama_keep_alive_s = int(os.getenv("OLLAMA_KEEP_ALIVE_S", "1800"))
+
+        # Event-loop lag sampling (reported in /api/health)
+        self.loop_lag_interval_ms = float(os.getenv("LOOP_LAG_INTERVAL_MS", "100"))
+
+        # Import LangChain / FAISS / PyMuPDF / Groq in the background once the server
+        # is up, instead of on the first request that needs them
+        self.warmup_imports = os.getenv("WARMUP_IMPORTS", "true").lower() == "true"
+
+        # Request tracing: spans per request, the last TRACE_BUFFER_SIZE traces kept for
+        # /api/debug/traces, optional OTLP/HTTP JSON export (e.g. http://collector:4318/v1/traces)
+        self.tracing_enabled = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+        self.trace_buffer_size = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+        self.trace_max_spans = int(os.getenv("TRACE_MAX_SPANS", "500"))
+        self.otlp_traces_endpoint = os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT") or None
+
+        # Debug endpoints (/api/debug/*, /api/documents/gc) are off until DEBUG_TOKEN is set;
+        # callers then send it in the X-Debug-Token header
+        self.debug_token = os.getenv("DEBUG_TOKEN") or None
+
+        # On-demand request profiling (X-Profile: 1 on /api/chat/, /api/documents/index,
+        # /api/documents/highlight); the last PROFILES_MAX profiles are kept in PROFILES_DIR
+        self.profiling_enabled = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+        self.profiles_dir = Path(os.getenv("PROFILES_DIR") or self.base_dir / "profiles")
+        self.profiles_max = int(os.getenv("PROFILES_MAX", "50"))
+
+        # Highlighted PDFs / page renders, cached by (source PDF content, highlight set)
+        # and evicted least-recently-used first above HIGHLIGHT_CACHE_MAX_MB
+        self.highlight_cache_dir = Path(os.getenv("HIGHLIGHT_CACHE_DIR") or self.base_dir / "cache" / "highlights")
+        self.highlight_cache_max_mb = int(os.getenv("HIGHLIGHT_CACHE_MAX_MB", "256"))
+
+        # Citations carry per-line highlight rectangles (for client-side overlays), looked
+        # up in page indexes kept parsed in memory up to PAGE_INDEX_CACHE_MB
+        self.citation_rects = os.getenv("CITATION_RECTS", "true").lower() == "true"
+        self.page_index_cache_mb = int(os.getenv("PAGE_INDEX_CACHE_MB", "64"))
+
+        # Optional ingest stage (opt-in): page thumbnails / medium page images rendered by
+        # PAGE_IMAGE_WORKERS processes. When off, the image route renders pages on request.
+        self.page_images_enabled = os.getenv("PAGE_IMAGES_ENABLED", "false").lower() == "true"
+        self.page_image_workers = int(os.getenv("PAGE_IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+        # Artifact GC: every GC_INTERVAL_S (opt-in, 0 = off) delete artifacts of documents no
+        # longer in the index, once they are GC_MIN_AGE_S old (python -m ingestion.artifact_gc)
+        self.gc_interval_s = float(os.getenv("GC_INTERVAL_S", "0"))
+        self.gc_min_age_s = float(os.getenv("GC_MIN_AGE_S", "3600"))
+
+        # Admission control: concurrent generations per model + bounded wait queue
+        # MODEL_CONCURRENCY_LIMITS overrides per model, e.g. "mistral:7b=1,qwen2.5:7b=1"
+        self.model_max_concurrency = int(os.getenv("MODEL_MAX_CONCURRENCY", "4"))
+        self.model_max_queue = int(os.getenv("MODEL_MAX_QUEUE", "32"))
+        self.model_concurrency_limits = self._parse_model_limits(os.getenv("MODEL_CONCURRENCY_LIMITS", ""))
+
+    @staticmethod
+    def _parse_model_limits(spec: str) -> Dict[str, int]:
+        """Parse "model=limit,model=limit" (model ids may contain ':')"""
+        limits = {}
+        for item in spec.split(","):
+            model, sep, value = item.strip().rpartition("=")
+            if sep and model and value.strip().isdigit():
+                limits[model.strip()] = int(value)
+        return limits
     
     def ensure_dirs(self):
         """Create necessary directories"""
         for d in [self.data_dir, self.artifacts_dir, self.db_dir]:
             d.mkdir(parents=True, exist_ok=True)
+
+    def reset(self):
+        """Restore defaults (environment + built-ins) in place, for every holder of this config"""
+        self.__init__()
     
     def get_available_llm_models(self) -> List[Dict]:
         """Return list of available LLM models as dicts"""
@@ -137,3 +236,14 @@ class AppConfig:
         for key, value in kwargs.items():
             if hasattr(self, key):
                 setattr(self, key, value)
+
+
+_config: Optional[AppConfig] = None  # one per process, shared by routers and components
+
+
+def get_config() -> AppConfig:
+    """The process-wide AppConfig (settings updated through the API are seen everywhere)"""
+    global _config
+    if _config is None:
+        _config = AppConfig()
+    return _config
@@ -6,11 +6,24 @@
 
 
 import logging
+from contextvars import ContextVar
+from typing import Optional
 
 LOGGER_NAME = "rag_app" #name of the logger like a tag
 
 _logger = None #ensures only one logger is created
 
+# Set per HTTP request by core.tracing.TracingMiddleware; log lines written while
+# serving a request (including tasks it started) are prefixed with its id
+request_id_var: ContextVar[Optional[str]] = ContextVar("rag_request_id", default=None)
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        request_id = request_id_var.get()
+        record.request_tag = f"[{request_id}] " if request_id else ""
+        return True
+
 def get_logger():
     global _logger
     if _logger is None:
@@ -18,8 +31,9 @@ def get_logger():
         _logger.setLevel(logging.INFO)
         if not _logger.handlers:
             h = logging.StreamHandler()
-            fmt = logging.Formatter('[%(levelname)s] %(message)s')
+            fmt = logging.Formatter('[%(levelname)s] %(request_tag)s%(message)s')
             h.setFormatter(fmt)
+            h.addFilter(RequestIdFilter())
             _logger.addHandler(h) #this will format all log messages like "[INFO] Some message"
     return _logger
 
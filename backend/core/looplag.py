@@ -0,0 +1,81 @@
+# event-loop lag monitor
+#
+# A background task sleeps for a fixed interval and records how late it wakes
+# up. Anything that blocks the event loop (sync I/O, CPU-heavy parsing, a sync
+# client call in an async route) shows up as lag, and every stream served by
+# this worker stalls for that long.
+#
+# from core.looplag import get_loop_lag_monitor
+# get_loop_lag_monitor().start()      # at startup
+# get_loop_lag_monitor().stats()      # {"p50_ms": ..., "p99_ms": ..., "max_ms": ...}
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from core.config import get_config
+
+
+class LoopLagMonitor:
+    """Samples event-loop scheduling delay; keeps a window of recent samples"""
+
+    def __init__(self, interval_s: float = 0.1, window: int = 600):
+        self.interval_s = interval_s
+        self.samples: Deque[float] = deque(maxlen=window)  # lag in ms
+        self.max_ms = 0.0
+        self.total = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval_s)
+            lag_ms = max(0.0, (time.perf_counter() - start - self.interval_s) * 1000)
+            self.samples.append(lag_ms)
+            self.max_ms = max(self.max_ms, lag_ms)
+            self.total += 1
+
+    def stats(self) -> Dict:
+        """Percentiles over the recent window (window_s seconds) plus the all-time max"""
+        ordered = sorted(self.samples)
+
+        def pct(p: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 2)
+
+        return {
+            "pid": os.getpid(),
+            "interval_ms": self.interval_s * 1000,
+            "window_s": round(len(ordered) * self.interval_s, 1),
+            "p50_ms": pct(50),
+            "p99_ms": pct(99),
+            "window_max_ms": round(ordered[-1], 2) if ordered else None,
+            "max_ms": round(self.max_ms, 2),
+            "samples": self.total,
+        }
+
+
+_monitor: Optional[LoopLagMonitor] = None  # one per process (per worker)
+
+
+def get_loop_lag_monitor() -> LoopLagMonitor:
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopLagMonitor(interval_s=get_config().loop_lag_interval_ms / 1000)
+    return _monitor
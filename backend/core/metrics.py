@@ -0,0 +1,279 @@
+# in-process metrics with Prometheus text exposition
+#
+# Counters, gauges and histograms cost a dict lookup and an add per update (a
+# bisect for histograms), so they can sit on the hot path. Values that other
+# components already track (client registry, admission gates, single-flight,
+# loop lag) are read by collectors at scrape time instead of being counted twice.
+#
+# Metrics are per process: with several uvicorn workers each worker serves its
+# own /metrics, and Prometheus should scrape every worker (or sum per instance).
+#
+# from core.metrics import stage
+# with stage("search"):      # also a tracing span (core.tracing) named "search"
+#     ...
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from core.tracing import span
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[Dict[str, str], float]  # (labels, value)
+
+# Seconds; covers sub-millisecond FAISS searches up to long generations
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()  # observations also come from executor threads
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _labels(self, key: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, self._labels(key), value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, self._labels(key), value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket (+Inf last)..., sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[i] += 1
+            row[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        for key, row in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), row[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_count", labels, cumulative
+            yield f"{self.name}_sum", labels, row[-1]
+
+
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]  # -> (name, kind, help, samples)
+
+
+class MetricsRegistry:
+    """Named metrics plus scrape-time collectors, rendered in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing  # re-registration (e.g. module reload) reuses the metric
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def register_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help: str, samples):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            family(metric.name, metric.kind, metric.help, metric.samples())
+        for collector in self._collectors:
+            try:
+                for name, kind, help, samples in collector():
+                    family(name, kind, help, ((name, labels, value) for labels, value in samples))
+            except Exception as e:  # a broken collector must not break the scrape
+                lines.append(f"# collector error: {_escape(str(e))}")
+        return "\n".join(lines) + "\n"
+
+
+_registry: Optional[MetricsRegistry] = None  # one per process
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    global _registry
+    if _registry is None:
+        _registry = MetricsRegistry()
+    return _registry
+
+
+# ---------------------------------------------
+# RAG pipeline metrics
+# ---------------------------------------------
+STAGE_SECONDS = get_metrics_registry().histogram(
+    "rag_stage_seconds",
+    "Time spent per pipeline stage (embed, search, mmr, format_context, ttft, generation)",
+    labels=("stage",),
+)
+TOKENS_GENERATED = get_metrics_registry().counter(
+    "rag_tokens_generated_total", "Answer tokens streamed from the model", labels=("model", "route")
+)
+INDEX_VECTORS = get_metrics_registry().gauge("rag_index_vectors", "Vectors in the last loaded FAISS index")
+HTTP_IN_FLIGHT = get_metrics_registry().gauge("rag_http_requests_in_flight", "HTTP requests being served")
+HTTP_SECONDS = get_metrics_registry().histogram(
+    "rag_http_request_seconds",
+    "HTTP request duration including the streamed body",
+    labels=("method", "route", "status"),
+)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage into rag_stage_seconds{stage=name} and the request trace"""
+    start = time.perf_counter()
+    try:
+        with span(name) as s:
+            yield s
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=name)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: in-flight gauge and a duration histogram per route template
+
+    Labels use the matched route's path ("/api/documents/{doc_id}"), not the raw path, so
+    label cardinality stays bounded. Streaming responses count until the body ends.
+    """
+
+    def __init__(self, app, exclude: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.exclude = set(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_SECONDS.observe(
+                time.perf_counter() - start, method=scope.get("method", ""), route=route, status=str(status["code"])
+            )
@@ -0,0 +1,307 @@
+# on-demand profiling of single requests
+#
+# Send `X-Profile: 1` (or `?profile=1`) to one of PROFILED_PATHS and that request
+# runs under a profiler: pyinstrument (sampling, low overhead, async-aware) when it
+# is installed, cProfile (deterministic, roughly 1.5-3x slower for call-heavy code)
+# otherwise; `X-Profile: cprofile` forces cProfile. The profile is stored under
+# PROFILES_DIR and the response carries X-Profile-Id; fetch it from
+# /api/debug/profiles/{id}.
+#
+# Off unless PROFILING_ENABLED=true; when DEBUG_TOKEN is set the request must also
+# send it in X-Debug-Token. One request is profiled at a time per worker, and
+# profilers hook the event-loop thread, so work of other requests served
+# concurrently on this worker shows up in the profile as well (executor threads -
+# FAISS search, the Ollama sync client - do not).
+
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import secrets
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from core.config import AppConfig, get_config
+from core.logging import get_logger, request_id_var
+
+PROFILED_PATHS = ("/api/chat/", "/api/documents/index", "/api/documents/highlight")
+TOP_FUNCTIONS = 30
+TREE_MIN_FRACTION = 0.01  # call-tree nodes below 1% of the request's time are pruned
+TREE_MAX_DEPTH = 40
+
+logger = get_logger()
+
+try:
+    import pyinstrument
+except ImportError:  # optional dependency
+    pyinstrument = None
+
+
+def _func_label(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name  # built-in
+    return f"{name} ({_short_path(filename)}:{line})"
+
+
+def _short_path(filename: str) -> str:
+    parts = Path(filename).parts
+    for marker in ("site-packages", "backend"):
+        if marker in parts:
+            return "/".join(parts[parts.index(marker) + 1:])
+    return "/".join(parts[-2:])
+
+
+def cprofile_report(profiler: cProfile.Profile) -> Dict:
+    """Top functions (self and cumulative time) and a pruned call tree from cProfile data"""
+    stats = pstats.Stats(profiler)
+    raw = stats.stats  # func -> (primitive calls, calls, tottime, cumtime, callers)
+
+    def row(func, data):
+        _, calls, tottime, cumtime, _ = data
+        return {"function": _func_label(func), "calls": calls,
+                "self_s": round(tottime, 6), "total_s": round(cumtime, 6)}
+
+    by_self = sorted(raw.items(), key=lambda kv: kv[1][2], reverse=True)[:TOP_FUNCTIONS]
+    by_total = sorted(raw.items(), key=lambda kv: kv[1][3], reverse=True)[:TOP_FUNCTIONS]
+
+    # Invert caller edges into callee edges; edge cumtime is the time under that call site
+    callees: Dict[tuple, List[Tuple[tuple, float, int]]] = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, (_, ncalls, _, cumtime) in callers.items():
+            callees.setdefault(caller, []).append((func, cumtime, ncalls))
+
+    roots = [f for f, data in raw.items() if not data[4]]
+    total = sum(raw[f][3] for f in roots) or max((d[3] for d in raw.values()), default=0.0)
+    min_s = total * TREE_MIN_FRACTION
+
+    def node(func, seconds, calls, path, depth):
+        children = []
+        if depth < TREE_MAX_DEPTH:
+            for child, child_s, child_calls in sorted(callees.get(func, ()), key=lambda c: c[1], reverse=True):
+                if child_s >= min_s and child not in path:  # skip recursion back-edges
+                    children.append(node(child, child_s, child_calls, path | {child}, depth + 1))
+        return {"function": _func_label(func), "calls": calls, "total_s": round(seconds, 6), "children": children}
+
+    tree = [node(f, raw[f][3], raw[f][1], {f}, 0) for f in sorted(roots, key=lambda f: raw[f][3], reverse=True)
+            if raw[f][3] >= min_s]
+
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    return {
+        "top_self": [row(f, d) for f, d in by_self],
+        "top_total": [row(f, d) for f, d in by_total],
+        "call_tree": tree,
+        "text": text.getvalue(),
+    }
+
+
+def pyinstrument_report(session) -> Dict:
+    """Top functions and the (already sampled) call tree from a pyinstrument session"""
+    root = session.root_frame()
+    min_s = root.time * TREE_MIN_FRACTION if root else 0.0
+    functions: Dict[str, Dict] = {}
+
+    def node(frame, depth):
+        label = f"{frame.function} ({frame.file_path_short}:{frame.line_no})"
+        entry = functions.setdefault(label, {"function": label, "self_s": 0.0, "total_s": 0.0})
+        entry["self_s"] += frame.total_self_time
+        entry["total_s"] += frame.time
+        children = []
+        if depth < TREE_MAX_DEPTH:
+            children = [node(c, depth + 1) for c in frame.children if c.time >= min_s]
+        return {"function": label, "total_s": round(frame.time, 6), "children": children}
+
+    tree = [node(root, 0)] if root else []
+    rows = [{**f, "self_s": round(f["self_s"], 6), "total_s": round(f["total_s"], 6)} for f in functions.values()]
+    return {
+        "top_self": sorted(rows, key=lambda r: r["self_s"], reverse=True)[:TOP_FUNCTIONS],
+        "top_total": sorted(rows, key=lambda r: r["total_s"], reverse=True)[:TOP_FUNCTIONS],
+        "call_tree": tree,
+        "text": pyinstrument.renderers.ConsoleRenderer(unicode=False, color=False).render(session),
+    }
+
+
+class ProfileStore:
+    """Profiles on disk: {id}.json (report) plus {id}.prof (pstats) or {id}.html (pyinstrument)"""
+
+    def __init__(self, directory: Path, max_profiles: int = 50):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    def save(self, report: Dict, artifact: Optional[Tuple[str, bytes]] = None) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{report['id']}.json"
+        path.write_text(json.dumps(report), encoding="utf-8")
+        if artifact is not None:
+            suffix, data = artifact
+            (self.directory / f"{report['id']}{suffix}").write_bytes(data)
+        self._prune()
+        return path
+
+    def _prune(self):
+        reports = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for old in reports[:max(0, len(reports) - self.max_profiles)]:
+            for p in self.directory.glob(f"{old.stem}.*"):
+                p.unlink(missing_ok=True)
+
+    def list(self) -> List[Dict]:
+        out = []
+        for p in sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True):
+            try:
+                report = json.loads(p.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            out.append({k: report.get(k) for k in
+                        ("id", "request_id", "method", "path", "status", "profiler", "wall_s", "cpu_s", "created_at")})
+        return out
+
+    def path(self, profile_id: str, suffix: str = ".json") -> Optional[Path]:
+        if not profile_id.isalnum():
+            return None
+        p = self.directory / f"{profile_id}{suffix}"
+        return p if p.exists() else None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware: profile one request on demand (see module comment)"""
+
+    def __init__(self, app, config: Optional[AppConfig] = None, paths: Tuple[str, ...] = PROFILED_PATHS):
+        config = config or get_config()
+        self.app = app
+        self.paths = set(paths)
+        self.enabled = config.profiling_enabled
+        self.debug_token = config.debug_token
+        self.store = get_profile_store(config)
+        self._busy = threading.Lock()
+
+    def _requested(self, scope) -> Optional[str]:
+        """Profiler asked for by this request ("auto" / "cprofile" / "pyinstrument"), or None"""
+        headers = dict(scope.get("headers") or ())
+        wanted = headers.get(b"x-profile", b"").decode("latin-1").strip().lower()
+        if not wanted:
+            for pair in (scope.get("query_string") or b"").decode("latin-1").split("&"):
+                name, _, value = pair.partition("=")
+                if name == "profile":
+                    wanted = value.lower() or "1"
+        if wanted in ("", "0", "false", "no"):
+            return None
+        if self.debug_token and not secrets.compare_digest(
+            headers.get(b"x-debug-token", b"").decode("latin-1"), self.debug_token
+        ):
+            return "forbidden"
+        return wanted if wanted in ("cprofile", "pyinstrument") else "auto"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        wanted = self._requested(scope)
+        if wanted is None:
+            await self.app(scope, receive, send)
+            return
+
+        status_note = None
+        if not self.enabled:
+            status_note = "disabled"
+        elif wanted == "forbidden":
+            status_note = "forbidden"
+        elif not self._busy.acquire(blocking=False):
+            status_note = "busy"  # another request on this worker is being profiled
+        if status_note is not None:
+            await self.app(scope, receive, self._with_headers(send, {"x-profile-status": status_note}))
+            return
+
+        try:
+            await self._profiled(scope, receive, send, wanted)
+        finally:
+            self._busy.release()
+
+    @staticmethod
+    def _with_headers(send, extra: Dict[str, str]):
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (k.encode(), v.encode()) for k, v in extra.items()
+                ]
+            await send(message)
+        return send_wrapper
+
+    async def _profiled(self, scope, receive, send, wanted: str):
+        use_pyinstrument = pyinstrument is not None and wanted != "cprofile"
+        profile_id = uuid.uuid4().hex[:12]
+        status = {"code": None}
+
+        headers = {"x-profile-id": profile_id, "x-profile-url": f"/api/debug/profiles/{profile_id}"}
+        inner_send = self._with_headers(send, headers)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await inner_send(message)
+
+        if use_pyinstrument:
+            profiler = pyinstrument.Profiler(async_mode="enabled")
+        else:
+            profiler = cProfile.Profile()
+        wall0, cpu0, loop_cpu0 = time.perf_counter(), time.process_time(), time.thread_time()
+        if use_pyinstrument:
+            profiler.start()
+        else:
+            profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if use_pyinstrument:
+                session = profiler.stop()
+            else:
+                profiler.disable()
+            wall_s = time.perf_counter() - wall0
+            cpu_s, loop_cpu_s = time.process_time() - cpu0, time.thread_time() - loop_cpu0
+
+            try:
+                if use_pyinstrument:
+                    body = pyinstrument_report(session)
+                    artifact = (".html", profiler.output_html().encode("utf-8"))
+                else:
+                    body = cprofile_report(profiler)
+                    # Same bytes as Stats.dump_stats(): loadable by pstats, snakeviz, gprof2dot
+                    artifact = (".prof", marshal.dumps(pstats.Stats(profiler).stats))
+                report = {
+                    "id": profile_id,
+                    "request_id": request_id_var.get(),
+                    "method": scope.get("method"),
+                    "path": scope.get("path"),
+                    "status": status["code"],
+                    "profiler": "pyinstrument" if use_pyinstrument else "cprofile",
+                    "created_at": time.time(),
+                    "pid": os.getpid(),
+                    "wall_s": round(wall_s, 6),
+                    "cpu_s": round(cpu_s, 6),  # whole process, all threads
+                    "event_loop_cpu_s": round(loop_cpu_s, 6),
+                    "waiting_s": round(max(0.0, wall_s - cpu_s), 6),  # I/O, model calls, queueing
+                    **body,
+                }
+                self.store.save(report, artifact)
+                logger.info(
+                    f"Profiled {scope.get('method')} {scope.get('path')}: wall {wall_s * 1000:.0f}ms, "
+                    f"cpu {cpu_s * 1000:.0f}ms -> profile {profile_id}"
+                )
+            except Exception as e:
+                logger.warning(f"Saving profile {profile_id} failed: {e}")
+
+
+_store: Optional[ProfileStore] = None  # one per process
+
+
+def get_profile_store(config: Optional[AppConfig] = None) -> ProfileStore:
+    global _store
+    if _store is None:
+        config = config or get_config()
+        _store = ProfileStore(config.profiles_dir, config.profiles_max)
+    return _store
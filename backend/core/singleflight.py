@@ -0,0 +1,270 @@
+# single-flight coalescing of identical in-flight work, with replay
+#
+# The first request for a key starts a producer task (the "flight"); requests
+# with the same key that arrive while it is running attach to it instead of
+# starting their own. Every event the producer publishes is kept in order, so
+# late joiners replay what they missed and then follow the live stream.
+#
+# Events are numbered, so a client that drops its connection can come back with
+# the last number it saw and resume - from the live flight, or from a finished
+# one kept for a short while. Replay memory is bounded per flight and overall.
+#
+# example:
+#   flight, leader = flights.join(key, produce)   # produce(flight) publishes events
+#   async for event in flight.subscribe():        # event["id"] == f"{flight.id}:{seq}"
+#       ...
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from core.logging import get_logger
+from utils.ids import new_id
+
+logger = get_logger()
+
+Event = Dict[str, Any]
+
+
+class ReplayUnavailableError(Exception):
+    """The requested events were trimmed from the replay buffer"""
+
+
+def _event_size(event: Event) -> int:
+    """Approximate memory held by an event (token events are the hot path)"""
+    data = event.get("data")
+    if event.get("event") == "token":
+        return len(data["token"]) + 64
+    return len(json.dumps(data)) + 64
+
+
+def parse_event_id(event_id: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Split "<flight id>:<seq>" (as sent in SSE `id:` fields) into (flight id, seq)"""
+    if not event_id:
+        return None
+    flight_id, sep, seq = event_id.strip().rpartition(":")
+    if not sep or not flight_id or not seq.isdigit():
+        return None
+    return flight_id, int(seq)
+
+
+class Flight:
+    """One in-flight unit of work: an append-only event log fanned out to subscribers"""
+
+    def __init__(self, key: Hashable, *, max_bytes: int = 1 << 20, grace_s: float = 0.0):
+        self.key = key
+        self.id = new_id("gen")
+        self.events: List[Event] = []  # retained events; events[0] has seq `base`
+        self.base = 0
+        self.nbytes = 0
+        self.max_bytes = max_bytes
+        self.grace_s = grace_s
+        self.done = False
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._cond = asyncio.Condition()
+        self._abandon_timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def end(self) -> int:
+        """Sequence number the next event will get"""
+        return self.base + len(self.events)
+
+    def can_replay_from(self, start: int) -> bool:
+        return self.base <= start <= self.end
+
+    async def publish(self, event: Event):
+        async with self._cond:
+            self.events.append(event)
+            self.nbytes += _event_size(event)
+            if self.nbytes > self.max_bytes:
+                self._trim()
+            self._cond.notify_all()
+
+    def _trim(self):
+        """Drop the oldest events until the log fits its budget again (keeps the newest one)"""
+        drop, freed = 0, 0
+        while drop < len(self.events) - 1 and self.nbytes - freed > self.max_bytes:
+            freed += _event_size(self.events[drop])
+            drop += 1
+        del self.events[:drop]
+        self.base += drop
+        self.nbytes -= freed
+
+    async def finish(self):
+        async with self._cond:
+            self.done = True
+            self._cond.notify_all()
+        self._clear_abandon_timer()
+
+    async def subscribe(self, start: int = 0) -> AsyncIterator[Event]:
+        """Yield every event from sequence `start` on, waiting for new ones until the flight is done.
+
+        Each yielded event carries "id" = "<flight id>:<seq>". Raises ReplayUnavailableError
+        when `start` has already been trimmed. When the last subscriber goes away before the
+        flight is done, the producer is cancelled after `grace_s` unless someone resubscribes.
+        """
+        if start < self.base:
+            raise ReplayUnavailableError(f"{self.id}: events before {self.base} were trimmed")
+        self.subscribers += 1
+        self._clear_abandon_timer()
+        try:
+            i = start
+            while True:
+                async with self._cond:
+                    await self._cond.wait_for(lambda: self.end > i or self.done)
+                    if i < self.base:
+                        raise ReplayUnavailableError(f"{self.id}: subscriber fell behind the replay buffer")
+                    batch = self.events[i - self.base:]
+                    done = self.done
+                for offset, event in enumerate(batch):
+                    yield {**event, "id": f"{self.id}:{i + offset}"}
+                i += len(batch)
+                if done and i >= self.end:
+                    return
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                self._on_abandoned()
+
+    # ---------------------------------------------
+    # Abandonment (no subscribers left)
+    # ---------------------------------------------
+    def _on_abandoned(self):
+        if self.grace_s <= 0:
+            self._cancel_producer()
+        elif self._abandon_timer is None:
+            loop = asyncio.get_running_loop()
+            self._abandon_timer = loop.call_later(self.grace_s, self._cancel_producer)
+
+    def _clear_abandon_timer(self):
+        if self._abandon_timer is not None:
+            self._abandon_timer.cancel()
+            self._abandon_timer = None
+
+    def _cancel_producer(self):
+        self._abandon_timer = None
+        if self.subscribers == 0 and not self.done and self.task is not None:
+            self.task.cancel()
+
+
+class SingleFlight:
+    """Registry of running flights keyed by request identity, plus recently finished ones for resume"""
+
+    def __init__(
+        self,
+        *,
+        flight_max_bytes: int = 1 << 20,
+        grace_s: float = 0.0,
+        retain_s: float = 0.0,
+        retain_max_bytes: int = 32 << 20,
+    ):
+        self.flight_max_bytes = flight_max_bytes
+        self.grace_s = grace_s
+        self.retain_s = retain_s
+        self.retain_max_bytes = retain_max_bytes
+        self._flights: Dict[Hashable, Flight] = {}
+        self._by_id: Dict[str, Flight] = {}
+        self._recent: "OrderedDict[str, Tuple[Flight, float]]" = OrderedDict()
+        self._recent_bytes = 0
+        self.started = 0
+        self.coalesced = 0
+        self.resumed = 0
+
+    def attach(self, key: Hashable) -> Optional[Flight]:
+        """The flight currently producing for `key`, if any (counted as a coalesced request)
+
+        Flights whose log has been trimmed are skipped - a new request needs the whole log.
+        """
+        flight = self._flights.get(key)
+        if flight is None or flight.done or flight.base > 0:
+            return None
+        self.coalesced += 1
+        return flight
+
+    def join(self, key: Hashable, producer: Callable[[Flight], Awaitable[None]]) -> Tuple[Flight, bool]:
+        """Attach to the running flight for `key`, or start `producer` as a new one.
+
+        Returns (flight, leader) where leader is True when this call started it.
+        Must be called from the event loop thread (lookup and insert happen without an await).
+        """
+        flight = self.attach(key)
+        if flight is not None:
+            return flight, False
+
+        flight = Flight(key, max_bytes=self.flight_max_bytes, grace_s=self.grace_s)
+        if key in self._flights:
+            # A trimmed flight for the same key keeps running for its own subscribers
+            self._flights.pop(key)
+        self._flights[key] = flight
+        self._by_id[flight.id] = flight
+        self.started += 1
+        flight.task = asyncio.create_task(self._run(flight, producer))
+        return flight, True
+
+    def resume(self, last_event_id: Optional[str], key: Hashable) -> Optional[Tuple[Flight, int]]:
+        """Find the flight named by a Last-Event-ID and the sequence to continue from
+
+        The flight must have been started for the same `key`, so an event id cannot be
+        used to read another request's output.
+        """
+        parsed = parse_event_id(last_event_id)
+        if parsed is None:
+            return None
+        flight_id, seq = parsed
+        self._purge_recent()
+        flight = self._by_id.get(flight_id)
+        if flight is None and flight_id in self._recent:
+            flight = self._recent[flight_id][0]
+            self._recent.move_to_end(flight_id)
+        if flight is None or flight.key != key or not flight.can_replay_from(seq + 1):
+            return None
+        self.resumed += 1
+        return flight, seq + 1
+
+    async def _run(self, flight: Flight, producer: Callable[[Flight], Awaitable[None]]):
+        try:
+            await producer(flight)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Flight {flight.id} failed: {e}")
+            await flight.publish({"event": "error", "data": {"error": str(e)}})
+        finally:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            self._by_id.pop(flight.id, None)
+            await flight.finish()
+            self._retain(flight)
+
+    # ---------------------------------------------
+    # Finished flights kept for resume
+    # ---------------------------------------------
+    def _retain(self, flight: Flight):
+        if self.retain_s <= 0:
+            return
+        self._recent[flight.id] = (flight, time.monotonic() + self.retain_s)
+        self._recent_bytes += flight.nbytes
+        self._purge_recent()
+
+    def _purge_recent(self):
+        """Drop expired flights, then least recently used ones while over the byte budget"""
+        now = time.monotonic()
+        for flight_id in [fid for fid, (_, exp) in self._recent.items() if exp <= now]:
+            flight, _ = self._recent.pop(flight_id)
+            self._recent_bytes -= flight.nbytes
+        while self._recent and self._recent_bytes > self.retain_max_bytes:
+            _, (flight, _) = self._recent.popitem(last=False)
+            self._recent_bytes -= flight.nbytes
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "resumed": self.resumed,
+            "retained": len(self._recent),
+            "retained_bytes": self._recent_bytes,
+        }
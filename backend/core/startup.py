@@ -0,0 +1,132 @@
+# API startup report + background warm-up imports
+#
+# main.py imports this module first and marks phases while it builds the app;
+# the startup event marks the process ready and logs time-to-ready (measured from
+# process start, so interpreter start-up and imports count) and RSS. The report is
+# part of /api/health.
+#
+# Heavy dependencies (LangChain, FAISS, numpy, PyMuPDF, Groq SDK) are imported
+# lazily by the modules that use them. warm_imports() loads them in a worker thread
+# right after startup, so the first chat/index request does not pay for them either;
+# its per-module timings are the import-time breakdown of what was deferred.
+# For a full breakdown: python -X importtime -c "import main", or bench.startup_bench.
+
+import asyncio
+import importlib
+import importlib.util
+import os
+import time
+from typing import Dict, List, Optional
+
+from core.logging import get_logger
+
+# Order matters: later modules reuse what earlier ones loaded, so each timing is
+# the extra cost of that module
+WARMUP_MODULES = (
+    "numpy",
+    "langchain_core.runnables",
+    "langchain_core.output_parsers",
+    "rag.prompts",
+    "langchain_community.vectorstores",
+    "langchain_community.vectorstores.utils",
+    "faiss",
+    "langchain_ollama",
+    "langchain_text_splitters",
+    "pymupdf",
+    "groq",
+)
+
+logger = get_logger()
+
+
+def _process_age_s() -> Optional[float]:
+    """Seconds since this process started (Linux /proc; None elsewhere)"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime_s = float(f.read().split()[0])
+        return max(0.0, uptime_s - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError):
+        return None
+
+
+class StartupReport:
+    """Phase timings from process start to ready, plus the warm-up import breakdown"""
+
+    def __init__(self):
+        self._t0 = time.perf_counter()
+        self._last = self._t0
+        self.process_age_at_import_s = _process_age_s()  # interpreter start-up before main.py ran
+        self.phases_ms: Dict[str, float] = {}
+        self.ready_ms: Optional[float] = None
+        self.rss_ready_mb: Optional[float] = None
+        self.warmup: Dict = {"state": "not started", "modules_ms": {}}
+        self._task: Optional[asyncio.Task] = None
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases_ms[phase] = round((now - self._last) * 1000, 1)
+        self._last = now
+
+    def ready(self):
+        self.mark("startup_event")
+        since_import = time.perf_counter() - self._t0
+        if self.process_age_at_import_s is not None:
+            self.phases_ms = {"interpreter": round(self.process_age_at_import_s * 1000, 1), **self.phases_ms}
+            self.ready_ms = round((self.process_age_at_import_s + since_import) * 1000, 1)
+        else:
+            self.ready_ms = round(since_import * 1000, 1)
+        self.rss_ready_mb = _rss_mb()
+        logger.info(f"Ready in {self.ready_ms:.0f}ms since process start ({self.phases_ms}), RSS {self.rss_ready_mb} MB")
+
+    def _import_all(self, modules: List[str]):
+        for name in modules:
+            if importlib.util.find_spec(name.split(".")[0]) is None:
+                self.warmup["modules_ms"][name] = None  # optional dependency not installed
+                continue
+            start = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except Exception as e:  # the request that needs it will surface the error
+                logger.warning(f"Warm-up import of {name} failed: {e}")
+            self.warmup["modules_ms"][name] = round((time.perf_counter() - start) * 1000, 1)
+
+    async def warm_imports(self, modules=WARMUP_MODULES):
+        """Import deferred heavy modules in a worker thread (the event loop keeps serving)"""
+        self.warmup["state"] = "running"
+        start = time.perf_counter()
+        await asyncio.to_thread(self._import_all, list(modules))
+        self.warmup.update(state="done", total_ms=round((time.perf_counter() - start) * 1000, 1), rss_mb=_rss_mb())
+        logger.info(f"Warm-up imports done in {self.warmup['total_ms']:.0f}ms, RSS {self.warmup['rss_mb']} MB")
+
+    def schedule_warm_imports(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.warm_imports())
+
+    def to_dict(self) -> Dict:
+        return {
+            "ready_ms": self.ready_ms,
+            "phases_ms": self.phases_ms,
+            "rss_ready_mb": self.rss_ready_mb,
+            "rss_mb": _rss_mb(),
+            "warmup_imports": self.warmup,
+        }
+
+
+_report: Optional[StartupReport] = None  # one per process
+
+
+def get_startup_report() -> StartupReport:
+    global _report
+    if _report is None:
+        _report = StartupReport()
+    return _report
@@ -0,0 +1,188 @@
+# SSE helpers shared by the streaming routes
+#
+# Routes produce events as {"event": <name>, "data": <json-serializable>} plus an
+# optional "id" (sent as the SSE `id:` field so clients can resume). Token
+# events can be coalesced - several deltas merged into one frame - before they
+# are serialized, which cuts per-frame json.dumps / write overhead at high token
+# rates without delaying the first token.
+#
+# Every stage closes its source when it is closed itself, so closing the outermost
+# stream (done by the routes once the client has gone) reaches the upstream model
+# stream right away instead of whenever the generators are garbage collected.
+
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+Event = Dict[str, Any]
+
+_END = object()
+
+
+async def aclose_quietly(stream) -> None:
+    """Close an async generator (no-op for plain iterators or already finished generators)"""
+    aclose = getattr(stream, "aclose", None)
+    if aclose is None:
+        return
+    try:
+        await aclose()
+    except RuntimeError:
+        pass  # still running in another task; it is closed when that task unwinds
+
+
+async def coalesce_tokens(
+    events: AsyncIterator[Event],
+    *,
+    window_ms: float = 20,
+    max_chars: int = 256,
+) -> AsyncIterator[Event]:
+    """Merge consecutive "token" events into one frame per `window_ms` or `max_chars`
+
+    The first token is sent immediately. After that, deltas are buffered and flushed
+    when the window since the first buffered delta elapses or the buffer reaches
+    `max_chars`, whichever comes first. Any other event flushes the buffer and is
+    passed through unchanged, so ordering is preserved. A merged frame carries the
+    id of its last delta. With window_ms <= 0 the events pass through as they are.
+    """
+    if window_ms <= 0:
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await aclose_quietly(events)
+        return
+
+    window_s = window_ms / 1000
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump():
+        try:
+            async for event in events:
+                await queue.put(event)
+        except Exception as e:  # surfaced to the consumer below
+            await queue.put(e)
+        finally:
+            await queue.put(_END)
+
+    pump_task = asyncio.create_task(pump())
+    buffer: List[str] = []
+    buffered = 0
+    last_id = None
+
+    def merged() -> Event:
+        frame: Event = {"event": "token", "data": {"token": "".join(buffer)}}
+        if last_id is not None:
+            frame["id"] = last_id
+        return frame
+
+    deadline = 0.0
+    first_sent = False
+    try:
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if buffer else None
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield merged()
+                buffer, buffered = [], 0
+                continue
+
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+
+            if item.get("event") == "token":
+                token = item["data"]["token"]
+                if not first_sent:
+                    first_sent = True
+                    yield item
+                    continue
+                if not buffer:
+                    deadline = time.monotonic() + window_s
+                buffer.append(token)
+                buffered += len(token)
+                last_id = item.get("id")
+                if buffered >= max_chars:
+                    yield merged()
+                    buffer, buffered = [], 0
+                continue
+
+            if buffer:
+                yield merged()
+                buffer, buffered = [], 0
+            yield item
+
+        if buffer:
+            yield merged()
+    finally:
+        pump_task.cancel()
+        try:
+            await pump_task
+        except asyncio.CancelledError:
+            pass
+        await aclose_quietly(events)
+
+
+async def sse_frames(events: AsyncIterator[Event]) -> AsyncIterator[Dict[str, str]]:
+    """Serialize events for EventSourceResponse"""
+    try:
+        async for event in events:
+            frame = {"event": event["event"], "data": json.dumps(event["data"])}
+            if "id" in event:
+                frame["id"] = event["id"]
+            yield frame
+    finally:
+        await aclose_quietly(events)
+
+
+class GenerationStats:
+    """Tokens spent on vs. saved by cancelling generations nobody is reading any more
+
+    The saving is an estimate: the model's average completed answer length
+    (an EWMA over finished generations, capped by the request's max_tokens) minus
+    what was generated before the cancel; 0 until a generation has completed.
+    """
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self._avg_tokens: Dict[str, float] = {}
+        self.completed = 0
+        self.cancelled = 0
+        self.tokens_before_cancel = 0
+        self.tokens_saved = 0
+
+    def record_completed(self, model: str, tokens: int):
+        self.completed += 1
+        avg = self._avg_tokens.get(model)
+        self._avg_tokens[model] = tokens if avg is None else avg + self.alpha * (tokens - avg)
+
+    def record_cancelled(self, model: str, tokens: int, max_tokens: Optional[int] = None) -> int:
+        """Count a cancelled generation; returns the estimated number of tokens saved"""
+        expected = self._avg_tokens.get(model, 0.0)
+        if max_tokens:
+            expected = min(expected, max_tokens)
+        saved = max(0, round(expected - tokens))
+        self.cancelled += 1
+        self.tokens_before_cancel += tokens
+        self.tokens_saved += saved
+        return saved
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "tokens_before_cancel": self.tokens_before_cancel,
+            "tokens_saved_estimate": self.tokens_saved,
+        }
+
+
+_generation_stats: Optional[GenerationStats] = None  # one per process
+
+
+def get_generation_stats() -> GenerationStats:
+    global _generation_stats
+    if _generation_stats is None:
+        _generation_stats = GenerationStats()
+    return _generation_stats
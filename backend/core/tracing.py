@@ -0,0 +1,393 @@
+# per-request tracing: contextvar spans, request ids, recent-traces ring buffer
+#
+# TracingMiddleware opens a root span per HTTP request and tags it with a
+# request id (the caller's X-Request-ID when it looks sane, otherwise a new one).
+# The id is echoed in the X-Request-ID response header and added to every log line
+# written while the request is being served. `span()` opens a child of the current
+# span; outside a traced request it does nothing, so library code (benchmarks,
+# CLI ingestion) can carry spans at no cost.
+#
+# Finished traces go into an in-memory ring buffer (see api/routes/debug.py) and,
+# when OTEL_EXPORTER_OTLP_TRACES_ENDPOINT is set, are pushed as OTLP/JSON.
+#
+# from core.tracing import span
+# with span("annotate_pdf", highlights=len(highlights)) as s:
+#     ...
+#     s.set(pages=3)
+#
+# Tasks inherit the context they were created in, so a chat generation started by
+# one request records its spans in that request's trace, even after that request's
+# response has ended (the trace then shows spans past the root's end).
+
+import asyncio
+import os
+import re
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+from core.config import AppConfig, get_config
+from core.logging import get_logger, request_id_var
+
+REQUEST_ID_HEADER = "x-request-id"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+logger = get_logger()
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("rag_current_span", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+class Span:
+    """One timed operation; spans of a request share a Trace"""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "start_ns", "_t0",
+                 "duration_ms", "status", "error")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self._t0 = time.perf_counter()
+        self.duration_ms: Optional[float] = None  # None while running
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error: BaseException):
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def finish(self):
+        if self.duration_ms is None:
+            self.duration_ms = (time.perf_counter() - self._t0) * 1000
+
+    def to_dict(self) -> Dict:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ms": round((self.start_ns - self.trace.root.start_ns) / 1e6, 3),
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Returned by span() outside a traced request"""
+
+    def set(self, **attributes):
+        pass
+
+    def fail(self, error: BaseException):
+        pass
+
+    def finish(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """Spans of one request; the first span is the root"""
+
+    def __init__(self, request_id: str, name: str, max_spans: int, attributes: Dict[str, Any]):
+        self.request_id = request_id
+        self.trace_id = _new_id(16)
+        self.max_spans = max_spans
+        self.dropped = 0
+        self.spans: List[Span] = []
+        self.root = Span(self, name, None, attributes)
+        self.spans.append(self.root)
+
+    def start_span(self, name: str, parent: Optional[Span], attributes: Dict[str, Any]):
+        if len(self.spans) >= self.max_spans:
+            self.dropped += 1
+            return NOOP_SPAN
+        s = Span(self, name, parent.span_id if parent else self.root.span_id, attributes)
+        self.spans.append(s)
+        return s
+
+    def summary(self) -> Dict:
+        root = self.root
+        return {
+            "request_id": self.request_id,
+            "trace_id": self.trace_id,
+            "name": root.name,
+            "started_at": root.start_ns / 1e9,
+            "duration_ms": round(root.duration_ms, 3) if root.duration_ms is not None else None,
+            "status": root.attributes.get("http.status_code"),
+            "spans": len(self.spans),
+            "dropped_spans": self.dropped,
+        }
+
+    def tree(self) -> Dict:
+        """Nested span tree (children in start order)"""
+        nodes = {s.span_id: {**s.to_dict(), "children": []} for s in self.spans}
+        for s in self.spans[1:]:
+            parent = nodes.get(s.parent_id) or nodes[self.root.span_id]
+            parent["children"].append(nodes[s.span_id])
+        return {**self.summary(), "root": nodes[self.root.span_id]}
+
+
+def annotate(**attributes):
+    """Add attributes to the current span (no-op outside a traced request)"""
+    s = _current_span.get()
+    if s is not None:
+        s.set(**attributes)
+
+
+def start_span(name: str, **attributes):
+    """Child of the current span, not made current (for generators and callbacks); call finish()"""
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return parent.trace.start_span(name, parent, attributes)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time a block as a child of the current span; records exceptions on the span"""
+    s = start_span(name, **attributes)
+    if s is NOOP_SPAN:
+        yield s
+        return
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        if not isinstance(e, (GeneratorExit, asyncio.CancelledError)):
+            s.fail(e)
+        else:
+            s.set(cancelled=True)
+        raise
+    finally:
+        s.finish()
+        _current_span.reset(token)
+
+
+# ---------------------------------------------
+# Recent traces + export
+# ---------------------------------------------
+class TraceBuffer:
+    """Ring buffer of the last `size` finished request traces"""
+
+    def __init__(self, size: int = 200):
+        self._traces: Deque[Trace] = deque(maxlen=size)
+
+    def add(self, trace: Trace):
+        self._traces.append(trace)
+
+    def recent(self, limit: int = 50, min_ms: float = 0.0, path: Optional[str] = None) -> List[Trace]:
+        """Newest first"""
+        out = []
+        for t in reversed(self._traces):
+            if (t.root.duration_ms or 0) < min_ms:
+                continue
+            if path and t.root.attributes.get("http.route") != path and t.root.attributes.get("http.target") != path:
+                continue
+            out.append(t)
+            if len(out) >= limit:
+                break
+        return out
+
+    def find(self, trace_or_request_id: str) -> Optional[Trace]:
+        for t in reversed(self._traces):
+            if trace_or_request_id in (t.request_id, t.trace_id):
+                return t
+        return None
+
+    def clear(self):
+        self._traces.clear()
+
+
+def _otlp_value(value: Any) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(traces: List[Trace], service_name: str = "rag-api") -> Dict:
+    """OTLP/JSON ExportTraceServiceRequest (accepted by the OpenTelemetry collector, Jaeger, Tempo)"""
+    spans = []
+    for t in traces:
+        for s in t.spans:
+            if s.duration_ms is None:
+                continue  # still running (e.g. a generation outliving its request)
+            attributes = {**s.attributes, "request.id": t.request_id} if s is t.root else s.attributes
+            spans.append({
+                "traceId": t.trace_id,
+                "spanId": s.span_id,
+                **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                "name": s.name,
+                "kind": 2 if s is t.root else 1,  # SERVER / INTERNAL
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.start_ns + int(s.duration_ms * 1e6)),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items()],
+                "status": {"code": 2, "message": s.error or ""} if s.status == "error" else {"code": 1},
+            })
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": service_name}},
+                {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+            ]},
+            "scopeSpans": [{"scope": {"name": "rag_app"}, "spans": spans}],
+        }]
+    }
+
+
+class OtlpExporter:
+    """Pushes finished traces to an OTLP/HTTP JSON endpoint in batches from a background task"""
+
+    def __init__(self, endpoint: str, interval_s: float = 5.0, max_pending: int = 1000):
+        self.endpoint = endpoint
+        self.interval_s = interval_s
+        self._pending: Deque[Trace] = deque(maxlen=max_pending)  # oldest dropped when the collector is down
+        self._task: Optional[asyncio.Task] = None
+        self.exported = 0
+        self.failures = 0
+
+    def enqueue(self, trace: Trace):
+        self._pending.append(trace)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_s)
+            await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch = list(self._pending)
+        self._pending.clear()
+        import httpx
+
+        try:
+            async with httpx.AsyncClient(timeout=5.0) as client:
+                r = await client.post(self.endpoint, json=to_otlp(batch))
+                r.raise_for_status()
+            self.exported += len(batch)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Trace export to {self.endpoint} failed ({len(batch)} trace(s) dropped): {e}")
+
+
+class Tracer:
+    """Process-wide tracing settings, buffer and optional exporter"""
+
+    def __init__(self, config: Optional[AppConfig] = None):
+        config = config or get_config()
+        self.enabled = config.tracing_enabled
+        self.max_spans = config.trace_max_spans
+        self.buffer = TraceBuffer(config.trace_buffer_size)
+        self.exporter = OtlpExporter(config.otlp_traces_endpoint) if config.otlp_traces_endpoint else None
+
+    def finish(self, trace: Trace):
+        self.buffer.add(trace)
+        if self.exporter is not None:
+            self.exporter.enqueue(trace)
+
+
+_tracer: Optional[Tracer] = None  # one per process
+
+
+def get_tracer() -> Tracer:
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+class TracingMiddleware:
+    """ASGI middleware: request id (header + logs) and a root span per HTTP request"""
+
+    def __init__(self, app, exclude: tuple = ("/metrics", "/api/debug/traces")):
+        self.app = app
+        self.exclude = exclude
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers") or ():
+            if name == b"x-request-id":
+                candidate = value.decode("latin-1")
+                request_id = candidate if _VALID_REQUEST_ID.match(candidate) else None
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        id_token = request_id_var.set(request_id)
+
+        tracer = get_tracer()
+        path = scope.get("path", "")
+        trace = None
+        if tracer.enabled and not path.startswith(self.exclude):
+            trace = Trace(request_id, f"{scope.get('method', '')} {path}", tracer.max_spans, {
+                "http.method": scope.get("method", ""),
+                "http.target": path,
+            })
+        span_token = _current_span.set(trace.root) if trace else None
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER.encode(), request_id.encode())
+                ]
+                if trace:
+                    trace.root.set(**{"http.status_code": message["status"]})
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            if trace:
+                trace.root.fail(e)
+            raise
+        finally:
+            if trace:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    trace.root.name = f"{scope.get('method', '')} {route}"
+                    trace.root.set(**{"http.route": route})
+                trace.root.finish()
+                tracer.finish(trace)
+                _current_span.reset(span_token)
+            request_id_var.reset(id_token)
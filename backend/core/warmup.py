@@ -0,0 +1,108 @@
+# model warm-up and keep-alive tracking
+#
+# Ollama loads a model on its first request and unloads it after keep_alive of
+# idleness, so the first query after a restart, an idle period or a model switch
+# pays the whole load. The warmer pre-loads models in the background (an empty
+# generate / a one-word embed with keep_alive) and tracks, per model, whether it
+# is expected to still be resident.
+#
+# from core.warmup import get_model_warmer
+# get_model_warmer().schedule_warm(llm_model="gemma2:2b")
+
+import asyncio
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from core.clients import DEFAULT_NUM_CTX, get_client_registry
+from core.config import AppConfig, get_config
+from core.logging import get_logger
+
+logger = get_logger()
+
+LLM = "llm"
+EMBEDDING = "embedding"
+
+
+class ModelWarmer:
+    """Pre-loads Ollama models and reports warm/cold state"""
+
+    def __init__(self, config: Optional[AppConfig] = None):
+        self.config = config or get_config()
+        self._states: Dict[Tuple[str, str], Dict] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _state(self, kind: str, model: str) -> Dict:
+        return self._states.setdefault((kind, model), {
+            "state": "cold",
+            "last_used": None,
+            "warm_ms": None,
+            "error": None,
+        })
+
+    def touch(self, kind: str, model: str):
+        """Record a successful use; Ollama restarts the keep-alive timer on every request"""
+        st = self._state(kind, model)
+        st["state"] = "warm"
+        st["last_used"] = time.time()
+        st["error"] = None
+
+    async def warm(self, kind: str, model: str):
+        """Load `model` into Ollama memory (no-op while it is already warming)"""
+        st = self._state(kind, model)
+        if st["state"] == "warming":
+            return
+        st["state"] = "warming"
+        admin = get_client_registry().ollama_admin()
+        keep_alive = self.config.ollama_keep_alive_s
+        start = time.perf_counter()
+        try:
+            if kind == LLM:
+                # An empty prompt loads the model without generating; num_ctx must match
+                # the chat client or Ollama reloads the model on the first real request
+                call = admin.generate(model=model, keep_alive=keep_alive, options={"num_ctx": DEFAULT_NUM_CTX})
+            else:
+                call = admin.embed(model=model, input="warm-up", keep_alive=keep_alive)
+            await asyncio.wait_for(call, timeout=self.config.warmup_timeout_s)
+        except Exception as e:
+            st["state"] = "error"
+            st["error"] = str(e) or type(e).__name__
+            logger.warning(f"Warm-up failed for {kind} model {model}: {st['error']}")
+            return
+        st["warm_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        self.touch(kind, model)
+        logger.info(f"Warmed {kind} model {model} in {st['warm_ms']:.0f}ms")
+
+    def schedule_warm(self, *, llm_model: Optional[str] = None, embedding_model: Optional[str] = None):
+        """Warm models in the background without blocking the caller"""
+        for kind, model in ((LLM, llm_model), (EMBEDDING, embedding_model)):
+            if not model:
+                continue
+            task = asyncio.create_task(self.warm(kind, model))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def status(self) -> Dict[str, Dict[str, Dict]]:
+        """Per-model state; warm models fall back to cold once keep_alive has lapsed"""
+        now = time.time()
+        out: Dict[str, Dict[str, Dict]] = {LLM: {}, EMBEDDING: {}}
+        for (kind, model), st in self._states.items():
+            state = st["state"]
+            if state == "warm" and st["last_used"] and now - st["last_used"] > self.config.ollama_keep_alive_s:
+                state = "cold"
+            out[kind][model] = {
+                "state": state,
+                "idle_s": round(now - st["last_used"], 1) if st["last_used"] else None,
+                "warm_ms": st["warm_ms"],
+                "error": st["error"],
+            }
+        return out
+
+
+_warmer: Optional[ModelWarmer] = None  # one warmer per process
+
+
+def get_model_warmer() -> ModelWarmer:
+    global _warmer
+    if _warmer is None:
+        _warmer = ModelWarmer()
+    return _warmer
@@ -1,30 +1,98 @@
  # span->bbox mapping + annotate PDF with highlights
 
-from typing import Dict, List, Tuple
-import json
+from typing import Dict, Iterable, List, Optional
 from pathlib import Path
-import fitz  # PyMuPDF
 
-Rect = Tuple[float, float, float, float]
-
-
-def _load_page_index(page_index_path: str) -> Dict:
-    with open(page_index_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+from core.tracing import span
+from highlight.page_index import PageWordIndex, Rect, get_page_index_cache  # noqa: F401 (re-exported)
+from utils.pdf import load_fitz
 
 
 def spans_to_bboxes(page_payload: Dict, span_start: int, span_end: int) -> List[Rect]:
     """Given page payload (with words including offsets), return bbox list covering the span.
     We select all words where [s,e] overlaps [span_start, span_end].
+    Builds the page's PageWordIndex; for many spans on a page, build it once and reuse it.
+    """
+    return PageWordIndex(page_payload.get('words', [])).rects(span_start, span_end)
+
+
+def merge_line_rects(rects: List[Rect]) -> List[Rect]:
+    """Merge consecutive word boxes (reading order) that sit on the same text line.
+
+    Two boxes share a line when their vertical centres are within half a line height and
+    the next box starts to the right, no further than ~2 line heights away (a column or
+    block change breaks the run).
+    """
+    merged: List[Rect] = []
+    for x0, y0, x1, y1 in rects:
+        if merged:
+            mx0, my0, mx1, my1 = merged[-1]
+            height = min(my1 - my0, y1 - y0)
+            same_line = abs((y0 + y1) - (my0 + my1)) / 2 <= height / 2
+            gap = x0 - mx1
+            if same_line and -height / 2 <= gap <= 2 * height:
+                merged[-1] = (min(mx0, x0), min(my0, y0), max(mx1, x1), max(my1, y1))
+                continue
+        merged.append((x0, y0, x1, y1))
+    return merged
+
+
+def span_line_rects(page_index_path: str, page: int, span_start: int, span_end: int) -> List[Rect]:
+    """Rectangles (one per text line) covering a span, from the cached page index"""
+    index = get_page_index_cache().get(page_index_path).get(int(page))
+    if index is None:
+        return []
+    return merge_line_rects(index.rects(int(span_start), int(span_end)))
+
+
+def add_citation_rects(citations: Iterable[Dict], artifacts_dir: Path) -> None:
+    """Set citation["rects"]: per-line rectangles of its span in PDF points (origin top-left,
+    PyMuPDF page coordinates), for clients that draw overlays on the unmodified PDF.
+    Left as None when the document's page index is not available. Blocking on a cache miss.
     """
-    rects: List[Rect] = []
-    for w in page_payload.get('words', []):
-        s, e = w['s'], w['e']
-        if e <= span_start or s >= span_end:
+    for c in citations:
+        c["rects"] = None
+        page_index_path = Path(artifacts_dir) / str(c.get("doc_id")) / "page_index.json"
+        if c.get("page") is None or c.get("span_start") is None or not page_index_path.exists():
             continue
-        x0, y0, x1, y1 = w['bbox']
-        rects.append((x0, y0, x1, y1))
-    return rects
+        rects = span_line_rects(str(page_index_path), c["page"], c["span_start"], c["span_end"])
+        c["rects"] = [[round(v, 2) for v in r] for r in rects]
+
+
+def _highlighted_doc(source_path: str, page_index_path: str, highlights: List[Dict]):
+    """Open the source PDF and add the highlight annotations (caller saves/renders and closes it)"""
+    fitz = load_fitz()
+
+    word_indexes = get_page_index_cache().get(page_index_path)
+    with span("open_pdf"):
+        doc = fitz.open(source_path)
+
+    with span("add_highlights") as s:
+        annotated = rects_total = 0
+        for h in highlights:
+            page_no = int(h['page'])
+            index = word_indexes.get(page_no)
+            if index is None:
+                continue
+            rects = merge_line_rects(index.rects(int(h['span_start']), int(h['span_end'])))
+            if not rects:
+                continue
+            # One annotation per highlight, one quad per line
+            page = doc[page_no - 1]  # keep a reference: the annot is bound to this page object
+            annot = page.add_highlight_annot(quads=[fitz.Rect(r) for r in rects])
+            if annot:
+                annot.set_colors(stroke=(1, 1, 0))  # yellow
+                annot.update()
+                annotated += 1
+                rects_total += len(rects)
+        s.set(annotations=annotated, rects=rects_total)
+    return doc
+
+
+def _check_pages(doc, pages: List[int]):
+    bad = [p for p in pages if not 1 <= p <= len(doc)]
+    if bad:
+        raise ValueError(f"Page(s) out of range 1-{len(doc)}: {bad}")
 
 
 def annotate_pdf(source_path: str, page_index_path: str, highlights: List[Dict], output_path: str) -> str:
@@ -32,24 +100,47 @@ def annotate_pdf(source_path: str, page_index_path: str, highlights: List[Dict],
     highlights: list of {page, span_start, span_end}
     Returns output_path
     """
-    page_index = _load_page_index(page_index_path)
-    doc = fitz.open(source_path)
+    with span("annotate_pdf", highlights=len(highlights)):
+        doc = _highlighted_doc(source_path, page_index_path, highlights)
+        with span("save_pdf"):
+            doc.save(output_path)
+            doc.close()
+        return output_path
+
+
+def annotate_pages_pdf(
+    source_path: str, page_index_path: str, highlights: List[Dict], output_path: str,
+    pages: Optional[List[int]] = None,
+) -> str:
+    """Like annotate_pdf, but the output keeps only `pages` (default: the highlighted pages).
+    Objects only the dropped pages used (fonts, images) are left out, so a cited page of a
+    large document is a small PDF. Returns output_path
+    """
+    pages = sorted(set(pages or (int(h['page']) for h in highlights)))
+    with span("annotate_pages_pdf", highlights=len(highlights), pages=len(pages)):
+        doc = _highlighted_doc(source_path, page_index_path, highlights)
+        try:
+            _check_pages(doc, pages)
+            with span("save_pdf"):
+                doc.select([p - 1 for p in pages])
+                doc.save(output_path, garbage=3, deflate=True)
+        finally:
+            doc.close()
+        return output_path
 
-    for h in highlights:
-        page_no = int(h['page'])
-        payload = page_index.get(str(page_no))
-        if not payload:
-            continue
-        rects = spans_to_bboxes(payload, int(h['span_start']), int(h['span_end']))
-        if not rects:
-            continue
-        page = doc[page_no - 1]
-        for r in rects:
-            annot = page.add_highlight_annot(r)
-            if annot:
-                annot.set_colors(stroke=(1, 1, 0))  # yellow
-                annot.update()
 
-    doc.save(output_path)
-    doc.close()
-    return output_path
+def render_page_png(
+    source_path: str, page_index_path: str, highlights: List[Dict], output_path: str,
+    page: int, dpi: int = 110,
+) -> str:
+    """Rasterize one page with its highlights drawn in, as PNG. Returns output_path"""
+    with span("render_page_png", page=page, dpi=dpi):
+        doc = _highlighted_doc(source_path, page_index_path, [h for h in highlights if int(h['page']) == page])
+        try:
+            _check_pages(doc, [page])
+            with span("rasterize"):
+                pix = doc[page - 1].get_pixmap(dpi=dpi, annots=True)
+                pix.save(output_path, output="png")
+        finally:
+            doc.close()
+        return output_path
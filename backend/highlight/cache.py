@@ -0,0 +1,215 @@
+# Content-addressed on-disk cache for highlight outputs (annotated PDFs, cited pages, page PNGs)
+#
+# An entry's key is a hash of the source PDF's content and the normalised highlight
+# set (plus output parameters), so the same citation is annotated once and served
+# from disk afterwards, and a changed or re-uploaded source PDF gets new keys. The
+# key doubles as the HTTP ETag. Entries are written to a temp file and renamed into
+# place, so concurrent requests never see (or overwrite) a half-written file.
+# Total size is bounded by HIGHLIGHT_CACHE_MAX_MB; least recently used entries go
+# first (a hit refreshes the file's mtime, which is also the order after a restart).
+#
+# from highlight.cache import get_highlight_cache
+# path, hit = get_highlight_cache().get_or_create(key, ".pdf", lambda tmp: annotate_pdf(..., str(tmp)))
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.config import AppConfig, get_config
+from core.logging import get_logger
+from core.tracing import span
+from highlight.annotator import annotate_pages_pdf, annotate_pdf, render_page_png
+from utils.hashing import file_hashes
+
+logger = get_logger()
+
+
+def normalize_highlights(highlights: Iterable[Dict]) -> list:
+    """Sorted, de-duplicated (page, span_start, span_end) triples: order and repeats don't change the output"""
+    return sorted({(int(h["page"]), int(h["span_start"]), int(h["span_end"])) for h in highlights})
+
+
+def highlight_key(content_sha256: str, highlights: Iterable[Dict], **params) -> str:
+    """Cache key / ETag of an output built from one source PDF, a highlight set and output parameters"""
+    payload = json.dumps(
+        {"doc": content_sha256, "highlights": normalize_highlights(highlights), "params": params},
+        sort_keys=True, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class HighlightCache:
+    """Size-bounded LRU of files named {key}{suffix} in one directory"""
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._building: Dict[str, threading.Lock] = {}  # key -> lock held while it is being built
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # file name -> size, least recent first
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load()
+
+    def _load(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        files = []
+        for p in self.directory.iterdir():
+            if p.name.startswith(".tmp-"):
+                p.unlink(missing_ok=True)  # left over from a build that died mid-write
+            elif p.is_file():
+                st = p.stat()
+                files.append((st.st_mtime, p.name, st.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self.bytes += size
+
+    def get(self, key: str, suffix: str) -> Optional[Path]:
+        name = f"{key}{suffix}"
+        path = self.directory / name
+        with self._lock:
+            if name not in self._entries:
+                return None
+            if not path.exists():  # removed behind our back (another worker evicted it)
+                self.bytes -= self._entries.pop(name)
+                return None
+            self._entries.move_to_end(name)
+        try:
+            os.utime(path)  # recency survives restarts and is shared with other workers
+        except OSError:
+            pass
+        return path
+
+    def get_or_create(self, key: str, suffix: str, build: Callable[[Path], None]) -> Tuple[Path, bool]:
+        """Path of the cached entry, building it with build(tmp_path) on a miss; returns (path, hit).
+
+        Blocking: call from a worker thread in async code. Concurrent calls for the same
+        key wait for one build instead of repeating it.
+        """
+        path = self.get(key, suffix)
+        if path is not None:
+            with self._lock:
+                self.hits += 1
+            return path, True
+
+        with self._lock:
+            build_lock = self._building.setdefault(key, threading.Lock())
+        with build_lock:
+            path = self.get(key, suffix)
+            if path is not None:
+                with self._lock:
+                    self.hits += 1
+                return path, True
+            try:
+                with span("highlight_cache.build", key=key):
+                    path = self._build(key, suffix, build)
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+        with self._lock:
+            self.misses += 1
+        return path, False
+
+    def _build(self, key: str, suffix: str, build: Callable[[Path], None]) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.directory / f".tmp-{uuid.uuid4().hex}{suffix}"
+        try:
+            build(tmp)
+            path = self.directory / f"{key}{suffix}"
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        size = path.stat().st_size
+        with self._lock:
+            self.bytes += size - self._entries.pop(path.name, 0)
+            self._entries[path.name] = size
+            self._evict(keep=path.name)
+        return path
+
+    def _evict(self, keep: str):
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = next(iter(self._entries.items()))
+            if name == keep:
+                break
+            del self._entries[name]
+            self.bytes -= size
+            self.evictions += 1
+            (self.directory / name).unlink(missing_ok=True)  # a response already streaming it keeps its handle
+
+    def clear(self):
+        with self._lock:
+            for name in self._entries:
+                (self.directory / name).unlink(missing_ok=True)
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_cache: Optional[HighlightCache] = None  # one per process
+_cache_lock = threading.Lock()
+
+
+def get_highlight_cache(config: Optional[AppConfig] = None) -> HighlightCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = config or get_config()
+            _cache = HighlightCache(config.highlight_cache_dir, config.highlight_cache_max_mb * 2**20)
+    return _cache
+
+
+def _cached(source_path: str, highlights: List[Dict], suffix: str, build: Callable[[List[Dict], Path], None],
+            **params) -> Tuple[Path, str, bool]:
+    highlights = [{"page": p, "span_start": s, "span_end": e} for p, s, e in normalize_highlights(highlights)]
+    key = highlight_key(file_hashes.sha256(source_path), highlights, **params)
+    path, hit = get_highlight_cache().get_or_create(key, suffix, lambda tmp: build(highlights, tmp))
+    return path, key, hit
+
+
+def highlighted_pdf(source_path: str, page_index_path: str, highlights: Iterable[Dict]) -> Tuple[Path, str, bool]:
+    """Annotated copy of source_path from the cache (built on a miss); returns (path, key, hit)"""
+    return _cached(
+        source_path, list(highlights), ".pdf",
+        lambda hs, tmp: annotate_pdf(source_path, page_index_path, hs, str(tmp)),
+        output="pdf",
+    )
+
+
+def cited_pages_pdf(source_path: str, page_index_path: str, highlights: Iterable[Dict],
+                    pages: Optional[List[int]] = None) -> Tuple[Path, str, bool]:
+    """Cached PDF of just the cited pages (or `pages`), highlights included; returns (path, key, hit)"""
+    highlights = list(highlights)
+    pages = sorted(set(pages or (int(h["page"]) for h in highlights)))
+    return _cached(
+        source_path, highlights, ".pdf",
+        lambda hs, tmp: annotate_pages_pdf(source_path, page_index_path, hs, str(tmp), pages=pages),
+        output="pages", pages=pages,
+    )
+
+
+def cited_page_png(source_path: str, page_index_path: str, highlights: Iterable[Dict],
+                   page: int, dpi: int) -> Tuple[Path, str, bool]:
+    """Cached PNG of one page at `dpi` with its highlights drawn in; returns (path, key, hit)"""
+    on_page = [h for h in highlights if int(h["page"]) == page]  # others don't change the image
+    return _cached(
+        source_path, on_page, ".png",
+        lambda hs, tmp: render_page_png(source_path, page_index_path, hs, str(tmp), page=page, dpi=dpi),
+        output="png", page=page, dpi=dpi,
+    )
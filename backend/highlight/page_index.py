@@ -0,0 +1,121 @@
+# Compact in-memory word indexes of page_index.json files, shared by highlighting paths
+#
+# page_index.json holds every word of a document (text, bbox, offsets) and takes
+# hundreds of ms to parse for a large PDF. PageIndexCache parses it once and keeps
+# only what span -> rectangle lookups need: per page, sorted offset arrays and a
+# flat bbox array (~48 bytes per word instead of a dict per word). Entries are keyed
+# by file path + mtime (re-ingesting a document invalidates them) and evicted least
+# recently used above PAGE_INDEX_CACHE_MB.
+
+import json
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from core.config import AppConfig, get_config
+from core.tracing import span
+
+Rect = Tuple[float, float, float, float]
+
+
+class PageWordIndex:
+    """Word offsets of one page as sorted arrays: a span's words are found by bisect.
+
+    Words do not overlap, so ordering by start offset also orders the end offsets.
+    """
+
+    __slots__ = ("starts", "ends", "bboxes")
+
+    def __init__(self, words: List[Dict]):
+        words = sorted(words, key=lambda w: w['s'])  # already in offset order for our page indexes
+        self.starts = array('q', (w['s'] for w in words))
+        self.ends = array('q', (w['e'] for w in words))
+        self.bboxes = array('d', (c for w in words for c in w['bbox']))  # x0, y0, x1, y1 per word
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in (self.starts, self.ends, self.bboxes))
+
+    def word_range(self, span_start: int, span_end: int) -> range:
+        """Indices of the words overlapping [span_start, span_end)"""
+        lo = bisect_right(self.ends, span_start)  # first word ending after span_start
+        hi = bisect_left(self.starts, span_end)   # first word starting at/after span_end
+        return range(lo, max(lo, hi))
+
+    def rects(self, span_start: int, span_end: int) -> List[Rect]:
+        b = self.bboxes
+        return [(b[4 * i], b[4 * i + 1], b[4 * i + 2], b[4 * i + 3]) for i in self.word_range(span_start, span_end)]
+
+
+DocWordIndex = Dict[int, PageWordIndex]  # page number -> index
+
+
+class PageIndexCache:
+    """LRU of parsed page indexes (path -> {page: PageWordIndex}), bounded by memory"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, int], DocWordIndex, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, page_index_path: str) -> DocWordIndex:
+        """Word indexes of every page of a document (parses the file on a miss; blocking)"""
+        path = os.path.abspath(page_index_path)
+        st = os.stat(path)
+        version = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+
+        with span("load_page_index", bytes=st.st_size):
+            with open(path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+            pages = {int(p): PageWordIndex(payload.get('words', [])) for p, payload in raw.items()}
+        size = sum(index.nbytes for index in pages.values())
+
+        with self._lock:
+            self.misses += 1
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self._entries[path] = (version, pages, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+        return pages
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"documents": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+
+_cache: Optional[PageIndexCache] = None  # one per process
+_cache_lock = threading.Lock()
+
+
+def get_page_index_cache(config: Optional[AppConfig] = None) -> PageIndexCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = config or get_config()
+            _cache = PageIndexCache(config.page_index_cache_mb * 2**20)
+    return _cache
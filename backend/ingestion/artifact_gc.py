@@ -0,0 +1,285 @@
+# Garbage collection of document artifacts no longer referenced by the live index
+#
+# Every indexing run ingests each PDF again under a new doc_id, so artifacts/ keeps
+# a full copy (manifest, page index, page images) per PDF per run; old builds also
+# left annotated PDFs in artifacts/ and the temp dir. A document is garbage when
+#
+#   - the saved FAISS index exists and none of its chunks has that doc_id, or
+#     (no index) a newer ingest of the same source PDF superseded it, and
+#   - it was ingested before the current index was built (an index build in progress
+#     has not saved its index yet), and it is older than GC_MIN_AGE_S.
+#
+# Deletion is safe while the API serves: a document's catalog row goes first (nothing
+# resolves the doc_id after that), then its directory is renamed out of the way and
+# removed; files already open keep working. One collector runs at a time per
+# artifacts dir (file lock where the OS has fcntl, plus a process lock).
+#
+#   python -m ingestion.artifact_gc              # report what would be reclaimed
+#   python -m ingestion.artifact_gc --delete     # and delete it
+#
+# The API exposes the same at /api/documents/gc (deleting needs DEBUG_TOKEN) and,
+# when GC_INTERVAL_S is set, runs it on that schedule.
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from core.config import AppConfig, get_config
+from core.logging import get_logger
+from ingestion.catalog import get_catalog
+from ingestion.embed_store import indexed_doc_ids
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+TRASH_PREFIX = ".trash-"
+LEGACY_HIGHLIGHT_DIR = "rag_highlights"  # where /highlight wrote its outputs before the highlight cache
+
+logger = get_logger()
+
+
+def _tree_bytes(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _timestamp(iso: Optional[str]) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(iso).timestamp() if iso else None
+    except ValueError:
+        return None
+
+
+class ArtifactGC:
+    """Finds and deletes unreferenced artifacts of one artifacts dir (see module comment)"""
+
+    def __init__(self, config: Optional[AppConfig] = None):
+        config = config or get_config()
+        self.artifacts_dir = Path(config.artifacts_dir)
+        self.db_dir = Path(config.db_dir)
+        self.min_age_s = config.gc_min_age_s
+        self.interval_s = config.gc_interval_s
+        self.temp_dir = Path(tempfile.gettempdir()) / LEGACY_HIGHLIGHT_DIR
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.reclaimed_bytes = 0
+        self.last_report: Optional[Dict] = None
+
+    # ---- what is garbage -----------------------------------------------------------
+    def plan(self) -> Dict:
+        """Report of what a collection would delete (deletes nothing)"""
+        now = time.time()
+        catalog = get_catalog(self.artifacts_dir)
+        rows = {r["doc_id"]: r for r in catalog.list()}
+        live = indexed_doc_ids(str(self.db_dir))
+        index_path = self.db_dir / "index.faiss"
+        index_built_at = index_path.stat().st_mtime if index_path.exists() else None
+
+        newest_by_source: Dict[str, str] = {}
+        for r in sorted(rows.values(), key=lambda r: r["indexed_at"]):
+            newest_by_source[r["source_path"]] = r["doc_id"]
+
+        documents, kept = [], 0
+        dirs = {p.name: p for p in self.artifacts_dir.iterdir() if p.is_dir() and p.name.startswith("doc_")} \
+            if self.artifacts_dir.exists() else {}
+        for doc_id in sorted(set(dirs) | set(rows)):
+            row, doc_dir = rows.get(doc_id), dirs.get(doc_id)
+            if doc_dir is None:
+                documents.append({"doc_id": doc_id, "name": row["name"], "reason": "missing artifacts", "bytes": 0})
+                continue
+            created = _timestamp(row["indexed_at"]) if row else None
+            if created is None:
+                created = doc_dir.stat().st_mtime
+            if live is not None:
+                reason = None if doc_id in live else "not in index"
+            else:
+                reason = None if row and newest_by_source.get(row["source_path"]) == doc_id else "superseded"
+            if reason and (now - created < self.min_age_s or (index_built_at and created >= index_built_at)):
+                reason = None  # too recent, or ingested for an index build that has not finished
+            if reason is None:
+                kept += 1
+                continue
+            if row is None:
+                reason += ", not in catalog"
+            documents.append({"doc_id": doc_id, "name": row["name"] if row else None, "reason": reason,
+                              "bytes": _tree_bytes(doc_dir)})
+
+        files = [{"path": str(p), "reason": reason, "bytes": _tree_bytes(p)} for p, reason in self._stray_files(now)]
+        return {
+            "artifacts_dir": str(self.artifacts_dir),
+            "live_index": live is not None,
+            "documents_kept": kept,
+            "documents": documents,
+            "files": files,
+            "reclaimable_bytes": sum(d["bytes"] for d in documents) + sum(f["bytes"] for f in files),
+        }
+
+    def _stray_files(self, now: float) -> Iterator:
+        old = lambda p: now - p.stat().st_mtime >= self.min_age_s  # noqa: E731
+        if self.artifacts_dir.exists():
+            for p in self.artifacts_dir.iterdir():
+                if p.name.startswith(TRASH_PREFIX):
+                    yield p, "interrupted deletion"
+                elif p.is_file() and p.suffix == ".pdf" and old(p):
+                    yield p, "annotated PDF"  # written here by earlier versions of the Streamlit app
+        if self.temp_dir.is_dir():
+            for p in self.temp_dir.iterdir():
+                if p.is_file() and old(p):
+                    yield p, "temporary highlight"
+
+    # ---- deletion ------------------------------------------------------------------
+    @contextmanager
+    def _exclusive(self) -> Iterator[bool]:
+        """True when this caller may collect (no other collection running)"""
+        if not self._lock.acquire(blocking=False):
+            yield False
+            return
+        lock_file = None
+        try:
+            if fcntl is not None:
+                self.artifacts_dir.mkdir(parents=True, exist_ok=True)
+                lock_file = open(self.artifacts_dir / ".gc.lock", "w")
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    yield False  # another process is collecting
+                    return
+            yield True
+        finally:
+            if lock_file is not None:
+                lock_file.close()
+            self._lock.release()
+
+    def collect(self, delete: bool = False) -> Dict:
+        """Plan, and with delete=True remove the garbage; returns the report"""
+        start = time.perf_counter()
+        with self._exclusive() as ok:
+            if not ok:
+                return {"skipped": "another collection is running"}
+            report = self.plan()
+            report["deleted"] = delete
+            if delete:
+                report["reclaimed_bytes"] = self._delete(report)
+                self.reclaimed_bytes += report["reclaimed_bytes"]
+            self.runs += 1
+        report["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        self.last_report = {k: v for k, v in report.items() if k not in ("documents", "files")}
+        if delete and (report["documents"] or report["files"]):
+            logger.info(f"Artifact GC removed {len(report['documents'])} document(s), {len(report['files'])} file(s), "
+                        f"{report['reclaimed_bytes'] / 2**20:.1f} MB")
+        return report
+
+    def _delete(self, report: Dict) -> int:
+        catalog = get_catalog(self.artifacts_dir)
+        reclaimed = 0
+        for doc in report["documents"]:
+            catalog.delete(doc["doc_id"])  # first: nothing resolves the doc_id any more
+            doc_dir = self.artifacts_dir / doc["doc_id"]
+            if doc_dir.exists():
+                reclaimed += self._remove(doc_dir)
+        for f in report["files"]:
+            reclaimed += self._remove(Path(f["path"]))
+        return reclaimed
+
+    def _remove(self, path: Path) -> int:
+        size = _tree_bytes(path)
+        try:
+            if path.is_dir():
+                if path.name.startswith(TRASH_PREFIX):
+                    trash = path
+                else:
+                    trash = path.with_name(f"{TRASH_PREFIX}{path.name}-{int(time.time())}")
+                    os.replace(path, trash)  # atomic: the doc dir is either complete or gone
+                shutil.rmtree(trash)
+            else:
+                path.unlink()
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
+            logger.warning(f"Artifact GC could not remove {path}: {e}")
+            return 0
+        return size
+
+    # ---- schedule ------------------------------------------------------------------
+    def start(self):
+        if self.interval_s > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_s)
+            try:
+                await asyncio.to_thread(self.collect, True)
+            except Exception as e:
+                logger.warning(f"Scheduled artifact GC failed: {e}")
+
+    def stats(self) -> Dict:
+        return {"runs": self.runs, "reclaimed_bytes": self.reclaimed_bytes, "last": self.last_report}
+
+
+_gc: Optional[ArtifactGC] = None  # one per process
+
+
+def get_artifact_gc() -> ArtifactGC:
+    global _gc
+    if _gc is None:
+        _gc = ArtifactGC()
+    return _gc
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report (and delete) artifacts not referenced by the live index")
+    parser.add_argument("--delete", action="store_true", help="delete the garbage (default: report only)")
+    parser.add_argument("--min-age-s", type=float, default=None, help="override GC_MIN_AGE_S")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args()
+
+    config = get_config()
+    if args.min_age_s is not None:
+        config.gc_min_age_s = args.min_age_s
+    report = ArtifactGC(config).collect(delete=args.delete)
+    if args.json or "skipped" in report:
+        print(json.dumps(report, indent=2))
+        return
+    for d in report["documents"]:
+        print(f"{d['doc_id']:<14} {d['bytes'] / 1024:>10.1f} KB  {d['name'] or '-'}  ({d['reason']})")
+    for f in report["files"]:
+        print(f"{'file':<14} {f['bytes'] / 1024:>10.1f} KB  {f['path']}  ({f['reason']})")
+    action = "Reclaimed" if args.delete else "Reclaimable"
+    amount = report["reclaimed_bytes"] if args.delete else report["reclaimable_bytes"]
+    print(f"{action}: {amount / 2**20:.2f} MB from {len(report['documents'])} document(s) and "
+          f"{len(report['files'])} file(s); {report['documents_kept']} document(s) kept"
+          f"{'' if report['live_index'] else ' (no index: only superseded copies count as garbage)'}")
+
+
+if __name__ == "__main__":
+    main()
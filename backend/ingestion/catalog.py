@@ -0,0 +1,192 @@
+# SQLite catalog of ingested documents, next to their artifacts
+#
+# One row per doc_id: name, source path, content hash, page/chunk counts, when it
+# was indexed, artifact paths and the FAISS index version it was embedded into.
+# Lookups by doc_id, name, source path and content hash are indexed, so listing
+# documents or resolving a citation's page index does not open every manifest.json.
+#
+# Maintained by ingestion (load_pdf_build_page_index adds the row, record_index sets
+# chunk counts once the FAISS index is built) and by document deletion. The
+# manifests stay the per-document source of truth: a catalog created next to
+# existing artifacts imports them, and a deleted catalog file is rebuilt the same way.
+#
+# Each operation opens its own short connection (WAL mode), so API workers, the
+# Streamlit app and CLI runs can share the file.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from core.logging import get_logger
+
+CATALOG_FILENAME = "catalog.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id          TEXT PRIMARY KEY,
+    name            TEXT NOT NULL,
+    source_path     TEXT NOT NULL,
+    content_sha256  TEXT,
+    num_pages       INTEGER NOT NULL,
+    chunk_count     INTEGER,
+    indexed_at      TEXT NOT NULL,
+    artifacts_dir   TEXT NOT NULL,
+    manifest_path   TEXT NOT NULL,
+    page_index_path TEXT NOT NULL,
+    index_version   TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_name ON documents(name);
+CREATE INDEX IF NOT EXISTS documents_source_path ON documents(source_path, indexed_at);
+CREATE INDEX IF NOT EXISTS documents_content_sha256 ON documents(content_sha256);
+"""
+
+COLUMNS = ("doc_id", "name", "source_path", "content_sha256", "num_pages", "chunk_count", "indexed_at",
+           "artifacts_dir", "manifest_path", "page_index_path", "index_version")
+
+logger = get_logger()
+
+
+def _now_iso(ts: Optional[float] = None) -> str:
+    return datetime.fromtimestamp(ts if ts is not None else time.time(), tz=timezone.utc).isoformat(timespec="seconds")
+
+
+class DocumentCatalog:
+    """Documents of one artifacts dir (see module comment)"""
+
+    def __init__(self, artifacts_dir: Path):
+        self.artifacts_dir = Path(artifacts_dir)
+        self.path = self.artifacts_dir / CATALOG_FILENAME
+        self._init_lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        if not self.path.exists():
+            self._create()
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:  # one transaction: committed on success, rolled back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _create(self):
+        with self._init_lock:
+            if self.path.exists():
+                return
+            self.artifacts_dir.mkdir(parents=True, exist_ok=True)
+            # Unique per process and thread: API workers may create the catalog at the same time
+            tmp = self.path.with_name(f".{CATALOG_FILENAME}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp")
+            try:
+                conn = sqlite3.connect(tmp)
+                try:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(SCHEMA)
+                    rows = self._manifest_rows()
+                    conn.executemany(self._upsert_sql(), rows)
+                    conn.commit()
+                finally:
+                    conn.close()
+                try:
+                    # Atomic create-if-absent: other processes see no catalog or a complete one,
+                    # and a catalog another worker already installed (and may be writing) is kept
+                    os.link(tmp, self.path)
+                except FileExistsError:
+                    return
+            finally:
+                tmp.unlink(missing_ok=True)
+            if rows:
+                logger.info(f"Document catalog created from {len(rows)} existing manifest(s)")
+
+    def _manifest_rows(self) -> List[Dict]:
+        rows = []
+        for manifest_path in sorted(self.artifacts_dir.glob("*/manifest.json")):
+            try:
+                manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+                rows.append(self._row(manifest, manifest_path, indexed_at=_now_iso(manifest_path.stat().st_mtime)))
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping unreadable manifest {manifest_path}: {e}")
+        return rows
+
+    def _row(self, manifest: Dict, manifest_path: Path, indexed_at: Optional[str] = None) -> Dict:
+        return {
+            "doc_id": manifest["doc_id"],
+            "name": manifest["name"],
+            "source_path": manifest["source_path"],
+            "content_sha256": manifest.get("content_sha256"),
+            "num_pages": manifest["num_pages"],
+            "chunk_count": manifest.get("chunk_count"),
+            "indexed_at": indexed_at or manifest.get("indexed_at") or _now_iso(),
+            "artifacts_dir": str(manifest_path.parent),
+            "manifest_path": str(manifest_path),
+            "page_index_path": manifest["page_index_path"],
+            "index_version": manifest.get("index_version"),
+        }
+
+    @staticmethod
+    def _upsert_sql() -> str:
+        return (f"INSERT OR REPLACE INTO documents ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join(':' + c for c in COLUMNS)})")
+
+    # ---- writes --------------------------------------------------------------------
+    def add(self, manifest: Dict):
+        """Add (or replace) a document from its manifest, as written by ingestion"""
+        row = self._row(manifest, self.artifacts_dir / manifest["doc_id"] / "manifest.json")
+        with self._connect() as conn:
+            conn.execute(self._upsert_sql(), row)
+
+    def record_index(self, chunk_counts: Dict[str, int], index_version: str):
+        """After a FAISS build: chunk count per document and the index version they are in"""
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE documents SET chunk_count = ?, index_version = ? WHERE doc_id = ?",
+                [(count, index_version, doc_id) for doc_id, count in chunk_counts.items()],
+            )
+
+    def delete(self, doc_id: str) -> bool:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,)).rowcount > 0
+
+    # ---- reads ---------------------------------------------------------------------
+    def get(self, doc_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        return dict(row) if row else None
+
+    def find_by_source(self, source_path: str) -> Optional[Dict]:
+        """Most recently indexed document ingested from source_path"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM documents WHERE source_path = ? ORDER BY indexed_at DESC LIMIT 1", (source_path,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def find_by_name(self, name: str) -> List[Dict]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM documents WHERE name = ? ORDER BY indexed_at DESC", (name,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def list(self) -> List[Dict]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM documents ORDER BY indexed_at DESC, name").fetchall()
+        return [dict(r) for r in rows]
+
+
+_catalogs: Dict[Path, DocumentCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(artifacts_dir: Path) -> DocumentCatalog:
+    """The catalog of an artifacts dir (one instance per dir and process)"""
+    key = Path(artifacts_dir).resolve()
+    with _catalogs_lock:
+        if key not in _catalogs:
+            _catalogs[key] = DocumentCatalog(key)
+        return _catalogs[key]
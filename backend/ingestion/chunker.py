@@ -1,9 +1,10 @@
 # page-wise chunking; preserves page/span metadata
 
-from typing import List, Dict
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
+from typing import TYPE_CHECKING, List, Dict
 import json
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
 # from pathlib import Path
 
 
@@ -13,12 +14,15 @@ def _load_page_index(page_index_path: str) -> Dict:
     #Parses JSON into a Python dictionary and returns it. The dictionary contains page text and word metadata.
 
 
-def make_page_chunks(manifest: Dict, *, chunk_size: int = 1000, chunk_overlap: int = 120) -> List[Document]:
+def make_page_chunks(manifest: Dict, *, chunk_size: int = 1000, chunk_overlap: int = 120) -> List["Document"]:
     """Create chunks per page, preserving span offsets and page metadata."""
+    from langchain_core.documents import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
     pi = _load_page_index(manifest["page_index_path"])
     splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
 
-    documents: List[Document] = []
+    documents: List["Document"] = []
 
     for page_str, payload in pi.items():
         page_no = int(page_str)
@@ -1,22 +1,52 @@
 # FAISS build/load with Ollama embeddings
 
 from pathlib import Path
-from typing import List
-from langchain_community.vectorstores import FAISS
-from langchain_ollama import OllamaEmbeddings
-from langchain_core.documents import Document
+from typing import TYPE_CHECKING, List, Optional, Set
+from core.clients import get_client_registry
+
+if TYPE_CHECKING:  # LangChain + FAISS load on first build/load (see core.startup warm-up)
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import Embeddings
 # import json
 
 
-def build_faiss(docs: List[Document], db_dir: str, *, embedding_model: str) -> FAISS:
-    embeddings = OllamaEmbeddings(model=embedding_model)
+def build_faiss(docs: List["Document"], db_dir: str, *, embedding_model: str, embeddings: Optional["Embeddings"] = None) -> "FAISS":
+    """`embeddings` overrides the shared Ollama client for `embedding_model` (benchmarks use a stand-in)"""
+    from langchain_community.vectorstores import FAISS
+
+    embeddings = embeddings or get_client_registry().ollama_embeddings(embedding_model)
     vs = FAISS.from_documents(docs, embeddings) # Embeds all documents. Stores vectors in a FAISS index. Keeps document metadata attached
     Path(db_dir).mkdir(parents=True, exist_ok=True)
     vs.save_local(db_dir) #Writes FAISS index + metadata files to db_dir
     return vs
 
 
-def load_faiss(db_dir: str, *, embedding_model: str) -> FAISS:
-    embeddings = OllamaEmbeddings(model=embedding_model)
+def load_faiss(db_dir: str, *, embedding_model: str, embeddings: Optional["Embeddings"] = None) -> "FAISS":
+    from langchain_community.vectorstores import FAISS
+
+    embeddings = embeddings or get_client_registry().ollama_embeddings(embedding_model)
     vs = FAISS.load_local(db_dir, embeddings, allow_dangerous_deserialization=True) #Allows Python pickle loading
     return vs
+
+
+def index_version(db_dir: str) -> str:
+    """Cheap identity of the saved index (changes whenever build_faiss rewrites it)"""
+    index_path = Path(db_dir) / "index.faiss"
+    try:
+        st = index_path.stat()
+    except FileNotFoundError:
+        return "none"
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def indexed_doc_ids(db_dir: str) -> Optional[Set[str]]:
+    """doc_ids of the chunks in the saved index (reads its docstore); None when there is no index"""
+    import pickle
+
+    pkl_path = Path(db_dir) / "index.pkl"
+    if not pkl_path.exists():
+        return None
+    with open(pkl_path, "rb") as f:
+        docstore, _ = pickle.load(f)  # what FAISS.save_local wrote: (docstore, index_to_docstore_id)
+    return {d.metadata.get("doc_id") for d in docstore._dict.values()}
@@ -0,0 +1,149 @@
+# Page thumbnails + medium-resolution page images, rendered at ingest in worker processes
+#
+# With PAGE_IMAGES_ENABLED=true the API ingests with
+# load_pdf_build_page_index(..., render_pages=True), which hands the document to a process
+# pool and returns without waiting: the rest of ingestion (chunking, embedding) runs
+# while the pages render. Each page is stored in the document's artifacts dir as
+#
+#   pages/p{n}_thumb.{png|jpg}    THUMB_WIDTH_PX wide
+#   pages/p{n}_medium.{png|jpg}   at MEDIUM_DPI
+#
+# as grayscale PNG when the page has no colour (text pages: about half the size of a
+# JPEG, and sharp), JPEG otherwise. The API serves them from
+# /api/documents/{doc_id}/pages/{page}/image; a page not rendered (yet) is rendered on
+# that request and stored like the others.
+#
+# PyMuPDF holds the GIL while rendering, hence processes rather than threads. Workers
+# are spawned (not forked from a multi-threaded server) and import only PyMuPDF.
+
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from core.config import AppConfig, get_config
+from core.logging import get_logger
+from utils.pdf import load_fitz
+
+THUMB_WIDTH_PX = 160
+MEDIUM_DPI = 100
+JPEG_QUALITY = 70
+PAGES_PER_TASK = 16
+
+logger = get_logger()
+
+
+def pages_dir(doc_dir: Path) -> Path:
+    return Path(doc_dir) / "pages"
+
+
+def find_page_image(doc_dir: Path, page: int, size: str) -> Optional[Path]:
+    """Stored image of a page, or None when it has not been rendered"""
+    for ext in (".png", ".jpg"):
+        p = pages_dir(doc_dir) / f"p{page}_{size}{ext}"
+        if p.exists():
+            return p
+    return None
+
+
+def _encode(fitz, pix):
+    """(bytes, extension): grayscale PNG when every pixel is gray, else JPEG"""
+    samples = pix.samples
+    if samples[0::3] == samples[1::3] and samples[1::3] == samples[2::3]:
+        return fitz.Pixmap(fitz.csGRAY, pix).tobytes("png"), ".png"
+    return pix.tobytes("jpeg", jpg_quality=JPEG_QUALITY), ".jpg"
+
+
+def render_pages(source_path: str, doc_dir: str, pages: List[int]) -> int:
+    """Render thumb + medium images of `pages` (1-based); returns bytes written.
+    Runs in pool workers, and in the API for a page that was not rendered at ingest.
+    """
+    fitz = load_fitz()
+    out_dir = pages_dir(Path(doc_dir))
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written = 0
+    with fitz.open(source_path) as doc:
+        for page_no in pages:
+            page = doc[page_no - 1]
+            zoom = THUMB_WIDTH_PX / page.rect.width
+            for size, kwargs in (("thumb", {"matrix": fitz.Matrix(zoom, zoom)}), ("medium", {"dpi": MEDIUM_DPI})):
+                data, ext = _encode(fitz, page.get_pixmap(alpha=False, **kwargs))
+                path = out_dir / f"p{page_no}_{size}{ext}"
+                tmp = path.with_name(f".tmp-{os.getpid()}-{threading.get_ident()}-{path.name}")
+                tmp.write_bytes(data)
+                os.replace(tmp, path)  # readers never see a partial image
+                written += len(data)
+    return written
+
+
+class PageImageRenderer:
+    """Process pool rendering page images in the background, a few pages per task"""
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending: Dict[str, List[Future]] = {}  # doc_id -> unfinished tasks
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context("spawn"))
+            return self._pool
+
+    def schedule(self, doc_id: str, source_path: str, doc_dir: Path, num_pages: int) -> List[Future]:
+        """Queue all pages of a document; returns at once"""
+        pool = self._executor()
+        futures = [
+            pool.submit(render_pages, source_path, str(doc_dir), list(range(first, min(first + PAGES_PER_TASK, num_pages + 1))))
+            for first in range(1, num_pages + 1, PAGES_PER_TASK)
+        ]
+        with self._lock:
+            self.pending[doc_id] = list(futures)
+        for f in futures:
+            f.add_done_callback(lambda f, doc_id=doc_id: self._task_done(doc_id, f))
+        return futures
+
+    def _task_done(self, doc_id: str, future: Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"Rendering page images of {doc_id} failed: {future.exception()}")
+        with self._lock:
+            remaining = [f for f in self.pending.get(doc_id, ()) if not f.done()]
+            if remaining:
+                self.pending[doc_id] = remaining
+                return
+            self.pending.pop(doc_id, None)
+        logger.info(f"Page images of {doc_id} rendered")
+
+    def wait(self, doc_id: Optional[str] = None, timeout: Optional[float] = None):
+        """Block until the rendering of one document (or all) has finished"""
+        with self._lock:
+            futures = [f for d, fs in self.pending.items() if doc_id in (None, d) for f in fs]
+        for f in futures:
+            f.exception(timeout=timeout)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"workers": self.workers, "documents_pending": len(self.pending),
+                    "tasks_pending": sum(len(fs) for fs in self.pending.values())}
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+_renderer: Optional[PageImageRenderer] = None  # one per process
+_renderer_lock = threading.Lock()
+
+
+def get_page_image_renderer(config: Optional[AppConfig] = None) -> PageImageRenderer:
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            config = config or get_config()
+            _renderer = PageImageRenderer(config.page_image_workers)
+    return _renderer
@@ -1,19 +1,16 @@
 # PyMuPDF parsing -> page text + word bboxes + offsets
 
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, List, Tuple
-# import fitz  # PyMuPDF library that reads and parses PDFs
 import json
 
-
-try:
-    import pymupdf as fitz   # PyMuPDF ≥ 1.24.3 preferred import name
-except ImportError:
-    import fitz 
-
-
 from core.logging import get_logger
+from ingestion import page_images
+from ingestion.catalog import get_catalog
+from utils.hashing import file_hashes
 from utils.paths import doc_artifacts_dir, safe_filename
+from utils.pdf import load_fitz
 from utils.ids import new_id
 
 
@@ -23,12 +20,14 @@ Word = Tuple[str, Tuple[float, float, float, float], int, int]  # (text, bbox, s
             #(text, bounding_box, start_offset, end_offset)
 
 
-def load_pdf_build_page_index(pdf_path: str, artifacts_dir: Path) -> Dict:
+def load_pdf_build_page_index(pdf_path: str, artifacts_dir: Path, *, render_pages: bool = False) -> Dict:
     """Parse PDF and build a page index containing full page text and word-level bbox mapping.
     Returns a manifest dict with doc_id, source_path, pages meta, and index file path.
+    render_pages: also render page thumbnails / medium images in the background worker
+    pool (see ingestion.page_images); this returns without waiting for them.
     """
     pdf_path = Path(pdf_path)
-    doc = fitz.open(pdf_path)
+    doc = load_fitz().open(pdf_path)
 
     # Assign a stable doc_id
     doc_id = new_id("doc")
@@ -88,11 +87,23 @@ def load_pdf_build_page_index(pdf_path: str, artifacts_dir: Path) -> Dict:
         "num_pages": len(doc),
         "page_index_path": str(index_path.resolve()), # path of page index JSON.
         "pages": pages,
+        "content_sha256": file_hashes.sha256(str(pdf_path)),
+        "indexed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
     }
+    if render_pages:
+        manifest["page_images"] = {
+            "thumb_width_px": page_images.THUMB_WIDTH_PX,
+            "medium_dpi": page_images.MEDIUM_DPI,
+        }
 
     # Save manifest
     with open(target_dir / 'manifest.json', 'w', encoding='utf-8') as f:
         json.dump(manifest, f)      # writes the manifest to the disk
 
+    get_catalog(artifacts_dir).add(manifest)
+
+    if render_pages:
+        page_images.get_page_image_renderer().schedule(doc_id, manifest["source_path"], target_dir, len(doc))
+
     logger.info(f"Indexed '{pdf_path.name}' as {doc_id} with {len(doc)} pages")
     return manifest
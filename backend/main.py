@@ -1,7 +1,11 @@
 #FastAPI app + CORS
 
 # main.py
+from core.startup import get_startup_report
+get_startup_report()  # first thing: startup phases are timed from here
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from pathlib import Path
 
 # Load environment variables from backend/.env when present (optional)
@@ -13,9 +17,23 @@ except Exception:
     pass
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from core.config import AppConfig
+from core.admission import get_admission_controller
+from core.clients import get_client_registry
+from core.config import get_config
 from core.logging import get_logger
-from api.routes import chat, documents, settings, llm
+from core.looplag import get_loop_lag_monitor
+from core.metrics import MetricsMiddleware, get_metrics_registry
+from core.profiling import ProfilingMiddleware
+from core.streaming import get_generation_stats
+from core.tracing import TracingMiddleware, get_tracer
+from core.warmup import get_model_warmer
+from highlight.cache import get_highlight_cache
+from highlight.page_index import get_page_index_cache
+from ingestion.artifact_gc import get_artifact_gc
+from ingestion.page_images import get_page_image_renderer
+from api.routes import chat, debug, documents, settings, llm
+
+get_startup_report().mark("imports")
 
 # Initialize
 app = FastAPI(
@@ -25,7 +43,7 @@ app = FastAPI(
 )
 
 logger = get_logger()
-config = AppConfig()
+config = get_config()
 config.ensure_dirs()
 
 # CORS middleware (allow Next.js frontend)
@@ -39,13 +57,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Request duration / in-flight metrics (served at /metrics)
+app.add_middleware(MetricsMiddleware)
+
+# Opt-in profile of a single request (PROFILING_ENABLED + X-Profile header)
+app.add_middleware(ProfilingMiddleware)
+
+# Request id + span tree per request (outermost, so the request id covers everything)
+app.add_middleware(TracingMiddleware)
+
 # Register routes
 app.include_router(chat.router)
 app.include_router(documents.router)
 app.include_router(settings.router)
 app.include_router(llm.router)
+app.include_router(debug.router)
+
+get_startup_report().mark("app")
 
 
 @app.get("/api/health")
@@ -57,16 +88,120 @@ async def health_check():
         "config": {
             "llm_model": config.llm_model,
             "embedding_model": config.embedding_model
-        }
+        },
+        "models": get_model_warmer().status(),
+        "clients": get_client_registry().stats(),
+        "admission": get_admission_controller().stats(),
+        "generations": get_generation_stats().stats(),
+        "event_loop": get_loop_lag_monitor().stats(),
+        "startup": get_startup_report().to_dict()
     }
 
 
+def _runtime_metrics():
+    """Scrape-time collector: state the other components already keep"""
+    registry = get_client_registry().stats()
+    yield "rag_client_registry_lookups_total", "counter", "Shared client lookups by result", [
+        ({"result": "hit"}, registry["hits"]),
+        ({"result": "miss"}, registry["misses"]),
+    ]
+    yield "rag_client_registry_evictions_total", "counter", "Shared clients evicted", [({}, registry["evictions"])]
+    yield "rag_client_pool_connections", "gauge", "Upstream HTTP connections per client", [
+        ({"provider": c["provider"], "model": c["model"], "state": state}, c["pool"][state])
+        for c in registry["clients"]
+        for state in ("active", "idle")
+    ]
+
+    gates = get_admission_controller().stats()
+    yield "rag_model_active", "gauge", "Generations holding a model slot", [({"model": m}, g["active"]) for m, g in gates.items()]
+    yield "rag_model_queued", "gauge", "Generations waiting for a model slot", [({"model": m}, g["queued"]) for m, g in gates.items()]
+    yield "rag_model_admissions_total", "counter", "Admission decisions per model", [
+        ({"model": m, "result": result}, g[result]) for m, g in gates.items() for result in ("admitted", "rejected")
+    ]
+
+    flights = chat.generations.stats()
+    yield "rag_generations_in_flight", "gauge", "Chat generations running", [({}, flights["in_flight"])]
+    yield "rag_generation_cache_total", "counter", "Chat requests by generation cache result", [
+        ({"result": "miss"}, flights["started"]),
+        ({"result": "coalesced"}, flights["coalesced"]),
+        ({"result": "resumed"}, flights["resumed"]),
+    ]
+    outcome = get_generation_stats().stats()
+    yield "rag_generations_total", "counter", "Finished generations by outcome", [
+        ({"outcome": "completed"}, outcome["completed"]),
+        ({"outcome": "cancelled"}, outcome["cancelled"]),
+    ]
+    yield "rag_tokens_saved_estimate_total", "counter", "Tokens not generated thanks to early cancellation", [
+        ({}, outcome["tokens_saved_estimate"])
+    ]
+
+    index_bytes = sum(p.stat().st_size for pattern in ("*.faiss", "*.pkl") for p in Path(config.db_dir).glob(pattern))
+    yield "rag_index_bytes", "gauge", "Size of the saved FAISS index files", [({}, index_bytes)]
+
+    highlights = get_highlight_cache().stats()
+    yield "rag_highlight_cache_requests_total", "counter", "Highlight outputs by cache result", [
+        ({"result": "hit"}, highlights["hits"]),
+        ({"result": "miss"}, highlights["misses"]),
+    ]
+    yield "rag_highlight_cache_evictions_total", "counter", "Highlight outputs evicted", [({}, highlights["evictions"])]
+    yield "rag_highlight_cache_bytes", "gauge", "Size of the cached highlight outputs", [({}, highlights["bytes"])]
+    page_indexes = get_page_index_cache().stats()
+    yield "rag_page_index_cache_requests_total", "counter", "Page index lookups by cache result", [
+        ({"result": "hit"}, page_indexes["hits"]),
+        ({"result": "miss"}, page_indexes["misses"]),
+    ]
+    yield "rag_page_index_cache_bytes", "gauge", "Memory held by parsed page indexes", [({}, page_indexes["bytes"])]
+
+    renders = get_page_image_renderer().stats()
+    yield "rag_page_image_tasks_pending", "gauge", "Page image render tasks queued or running", [
+        ({}, renders["tasks_pending"])
+    ]
+    yield "rag_artifact_gc_reclaimed_bytes_total", "counter", "Bytes of unreferenced artifacts deleted", [
+        ({}, get_artifact_gc().reclaimed_bytes)
+    ]
+
+    lag = get_loop_lag_monitor().stats()
+    yield "rag_event_loop_lag_ms", "gauge", "Event-loop lag over the recent window", [
+        ({"quantile": q}, lag[key]) for q, key in (("0.5", "p50_ms"), ("0.99", "p99_ms")) if lag[key] is not None
+    ]
+
+
+get_metrics_registry().register_collector(_runtime_metrics)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition for this worker process"""
+    return PlainTextResponse(get_metrics_registry().render(), media_type="text/plain; version=0.0.4")
+
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("🚀 RAG API Server Started")
     logger.info(f"📁 Data directory: {config.data_dir}")
     logger.info(f"🤖 Default LLM: {config.llm_model}")
     logger.info(f"🔢 Default Embeddings: {config.embedding_model}")
+    get_loop_lag_monitor().start()
+    get_artifact_gc().start()
+    if get_tracer().exporter is not None:
+        get_tracer().exporter.start()
+    if config.warmup_on_startup:
+        # Background task: the server accepts requests while models load
+        get_model_warmer().schedule_warm(llm_model=config.llm_model, embedding_model=config.embedding_model)
+    get_startup_report().ready()
+    if config.warmup_imports:
+        # Deferred heavy imports load in a worker thread while the server already accepts requests
+        get_startup_report().schedule_warm_imports()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await get_loop_lag_monitor().stop()
+    await get_artifact_gc().stop()
+    if get_tracer().exporter is not None:
+        await get_tracer().exporter.stop()
+    await get_client_registry().aclose()
+    get_page_image_renderer().shutdown()
 
 
 if __name__ == "__main__":
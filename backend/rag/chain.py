@@ -2,15 +2,23 @@
 from typing import Dict, List
 from operator import itemgetter
 
-from langchain_ollama import ChatOllama
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnableLambda
+from core.clients import DEFAULT_NUM_CTX, get_client_registry
+from core.metrics import stage
+from core.tracing import span
 
-from rag.prompts import ANSWER_PROMPT
+# LangChain (and rag.prompts, which builds a ChatPromptTemplate) is imported inside
+# the chain builders: API startup does not pay for it (see core.startup warm-up)
 
 
-def _format_docs(docs: List) -> str:
+def format_docs(docs: List) -> str:
     """Deduplicate and format documents for context"""
+    with stage("format_context") as s:
+        context = _format_docs(docs)
+        s.set(docs=len(docs), chars=len(context))
+        return context
+
+
+def _format_docs(docs: List) -> str:
     seen = set()
     lines = []
     
@@ -33,6 +41,33 @@ def _format_docs(docs: List) -> str:
     return "\n\n".join(lines)
 
 
+def build_answer_chain(*, llm_model: str = "gemma2:2b", temperature: float = 0.3):
+    """
+    Build the prompt -> LLM -> text part of the RAG chain
+    
+    Used by callers that retrieve documents themselves (the API routes), so
+    retrieval runs once per query and can be awaited separately.
+    
+    Args:
+        llm_model: Ollama model ID
+        temperature: Sampling temperature (0.0-2.0)
+    
+    Returns:
+        Streamable chain taking {"context": str, "question": str}
+    """
+    from langchain_core.output_parsers import StrOutputParser
+    from rag.prompts import ANSWER_PROMPT
+    
+    # Shared LLM client with temperature control (pooled connections, reused across requests)
+    llm = get_client_registry().chat_ollama(
+        llm_model,
+        temperature=temperature,
+        num_ctx=DEFAULT_NUM_CTX,  # Context window
+    )
+    
+    return ANSWER_PROMPT | llm | StrOutputParser()
+
+
 def build_rag_chain(retriever, *, llm_model: str = "gemma2:2b", temperature: float = 0.3):
     """
     Build RAG chain with streaming support
@@ -45,24 +80,15 @@ def build_rag_chain(retriever, *, llm_model: str = "gemma2:2b", temperature: flo
     Returns:
         Streamable RAG chain
     """
-    
-    # Initialize LLM with temperature control
-    llm = ChatOllama(
-        model=llm_model,
-        temperature=temperature,
-        num_ctx=4096,  # Context window
-    )
+    from langchain_core.runnables import RunnableLambda
     
     # Build chain with streaming support
     chain = (
         {
-            "context": RunnableLambda(lambda q: _format_docs(retriever.invoke(q["input"]))),
+            "context": RunnableLambda(lambda q: format_docs(retriever.invoke(q["input"]))),
             "question": itemgetter("input"),
-            "raw_docs": RunnableLambda(lambda q: retriever.invoke(q["input"])),
         }
-        | ANSWER_PROMPT
-        | llm
-        | StrOutputParser()
+        | build_answer_chain(llm_model=llm_model, temperature=temperature)
     )
     
     return chain
@@ -70,6 +96,11 @@ def build_rag_chain(retriever, *, llm_model: str = "gemma2:2b", temperature: flo
 
 def postprocess_citations(raw_docs: List) -> List[Dict]:
     """Extract citation metadata from retrieved documents"""
+    with span("postprocess_citations", docs=len(raw_docs)):
+        return _postprocess_citations(raw_docs)
+
+
+def _postprocess_citations(raw_docs: List) -> List[Dict]:
     citations = []
     
     for d in raw_docs:
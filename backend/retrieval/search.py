@@ -1,27 +1,83 @@
 ## retriever (MMR/similarity), basic search helpers
 
-from typing import List
-from langchain_community.vectorstores import FAISS
+import asyncio
+from typing import TYPE_CHECKING, List
+
+from core.metrics import stage
+
+if TYPE_CHECKING:  # LangChain, FAISS and numpy load with the first index (see core.startup warm-up)
+    import numpy as np
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
 
 #LangChain’s FAISS wrapper
-def similarity_search(vs: FAISS, query: str, k: int = 6) -> List:
+def similarity_search(vs: "FAISS", query: str, k: int = 6) -> List:
     return vs.similarity_search(query, k=k)
 # Converts query into an embedding. Finds the top k most similar vectors. Returns a list of Document objects
 
 
-def similarity_search_with_score(vs: FAISS, query: str, k: int = 10):
+def similarity_search_with_score(vs: "FAISS", query: str, k: int = 10):
     return vs.similarity_search_with_score(query, k=k)
 # Lower score = more similar (FAISS distance).
 
 
-def as_retriever(vs: FAISS, *, k: int = 6, fetch_k: int = 30, use_mmr: bool = True):
+def as_retriever(vs: "FAISS", *, k: int = 6, fetch_k: int = 30, use_mmr: bool = True, lambda_mult: float = 0.8):
     return vs.as_retriever(search_kwargs={
         "k": k, # Number of documents returned after ranking.
         "fetch_k": fetch_k, # Number of candidate documents fetched before reranking (used by MMR).
-        "lambda_mult": 0.8, #Controls MMR balance: 
+        "lambda_mult": lambda_mult, #Controls MMR balance: 
     }, search_type="mmr" if use_mmr else "similarity")
 
 
+def search_by_vector(vs: "FAISS", embedding: List[float], *, k: int = 6, fetch_k: int = 30,
+                     use_mmr: bool = True, lambda_mult: float = 0.8) -> List:
+    """Same search as as_retriever() for an already embedded query (no embedding call)"""
+    if use_mmr:
+        return vs.max_marginal_relevance_search_by_vector(embedding, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult)
+    return vs.similarity_search_by_vector(embedding, k=k)
+
+
+def _docs_at(vs: "FAISS", indices) -> List["Document"]:
+    return [vs.docstore.search(vs.index_to_docstore_id[int(i)]) for i in indices if i != -1]
+
+
+def _faiss_search(vs: "FAISS", vector: "np.ndarray", n: int, with_vectors: bool):
+    """index.search (+ reconstruct the hits for MMR); runs in the executor"""
+    _, indices = vs.index.search(vector, n)
+    hits = indices[0]
+    vectors = [vs.index.reconstruct(int(i)) for i in hits if i != -1] if with_vectors else None
+    return hits, vectors
+
+
+async def aretrieve(vs: "FAISS", query: str, *, k: int = 6, fetch_k: int = 30,
+                    use_mmr: bool = True, lambda_mult: float = 0.8) -> List["Document"]:
+    """Same documents as as_retriever(...).ainvoke(query), timed per stage (embed, search, mmr)"""
+    import numpy as np
+    from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+    with stage("embed"):
+        embedding = await vs.embedding_function.aembed_query(query)
+
+    vector = np.array([embedding], dtype=np.float32)
+    if vs._normalize_L2 and not use_mmr:
+        # LangChain normalizes the query for similarity search only
+        import faiss
+        faiss.normalize_L2(vector)
+
+    loop = asyncio.get_running_loop()
+    with stage("search"):
+        hits, candidates = await loop.run_in_executor(
+            None, _faiss_search, vs, vector, fetch_k if use_mmr else k, use_mmr
+        )
+    if not use_mmr:
+        return _docs_at(vs, hits)
+
+    with stage("mmr"):
+        hits = [i for i in hits if i != -1]
+        selected = maximal_marginal_relevance(vector, candidates, k=k, lambda_mult=lambda_mult)
+        return _docs_at(vs, [hits[i] for i in selected])
+
+
 #Maximal Marginal Relevance: return results that are relevant to the query and not redundant with each other
 #Plain similarity search often returns:5 chunks saying almost the same thing
 # and the MMR tries to return: 5 chunks that are all relevant but cover different aspects
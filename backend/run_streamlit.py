@@ -8,10 +8,11 @@ from core.config import AppConfig
 from core.logging import get_logger
 from ingestion.pdf_loader import load_pdf_build_page_index
 from ingestion.chunker import make_page_chunks
-from ingestion.embed_store import build_faiss, load_faiss
+from ingestion.catalog import get_catalog
+from ingestion.embed_store import build_faiss, index_version, load_faiss
 from retrieval.search import as_retriever
 from rag.chain import build_rag_chain, postprocess_citations
-from highlight.annotator import annotate_pdf
+from highlight.cache import cited_pages_pdf, highlighted_pdf
 
 
 import base64
@@ -67,6 +68,10 @@ with c1:
             all_docs.extend(make_page_chunks(m, chunk_size=chunk_size, chunk_overlap=chunk_overlap))
         logger.info("A step before building vector store")
         vs = build_faiss(all_docs, str(cfg.db_dir), embedding_model=emb_model)
+        chunk_counts = {m['doc_id']: 0 for m in manifests}
+        for d in all_docs:
+            chunk_counts[d.metadata['doc_id']] += 1
+        get_catalog(cfg.artifacts_dir).record_index(chunk_counts, index_version(str(cfg.db_dir)))
         st.session_state['vectorstore'] = vs
         st.success("Vector index built.")
 with c2:
@@ -286,29 +291,17 @@ if 'jump_request' in st.session_state:
     else:
         highs = [{"page": sc.get('page'), "span_start": sc.get('span_start'), "span_end": sc.get('span_end')}]
         source_path = sc.get('source_path')
-        sel_index = None
-        for mpath in Path(cfg.artifacts_dir).glob('*/manifest.json'):
-            try:
-                m = json.loads(Path(mpath).read_text())
-            except Exception:
-                m = {}
-            if m.get('source_path') == source_path:
-                sel_index = m.get('page_index_path')
-                break
+        entry = get_catalog(cfg.artifacts_dir).find_by_source(source_path)
+        sel_index = entry['page_index_path'] if entry else None
         if not sel_index:
             st.warning("Page index not found; cannot create highlight.")
         else:
-            out_name = f"annot_sentence_{idx}_{name}".replace(" ", "_")
-            out_path = Path(cfg.artifacts_dir) / out_name
-            out_path = out_path.with_suffix('.pdf')
             try:
-                annotate_pdf(source_path, sel_index, highs, str(out_path))
+                # Only the cited page is embedded (a few KB), not the whole annotated document
+                out_path, _, _ = cited_pages_pdf(source_path, sel_index, highs)
                 with open(out_path, "rb") as f:
                     pdf_bytes = f.read()
-                # Render the specific page that contains the highlight (fallback to 1)
-                page_num = sc.get('page') or 1
-                embed_pdf_bytes_in_browser(pdf_bytes, page_number=page_num, height=700)
-                st.session_state[f'annotated_pdf_{name}'] = str(out_path)
+                embed_pdf_bytes_in_browser(pdf_bytes, page_number=1, height=700)
             except Exception as e:
                 st.error(f"Annotation failed: {e}")
                 logger.error(f"Annotation failed: {e}")
@@ -326,21 +319,11 @@ if 'annot_request' in st.session_state:
             for it in items
         ]
         source_path = items[0]['source_path']
-        sel_index = None
-        for mpath in Path(cfg.artifacts_dir).glob('*/manifest.json'):
-            try:
-                m = json.loads(Path(mpath).read_text())
-            except Exception:
-                m = {}
-            if m.get('source_path') == source_path:
-                sel_index = m.get('page_index_path')
-                break
+        entry = get_catalog(cfg.artifacts_dir).find_by_source(source_path)
+        sel_index = entry['page_index_path'] if entry else None
         if sel_index:
-            out_name = f"annot_{req_name}".replace(" ", "_")
-            out_path = Path(cfg.artifacts_dir) / out_name
-            out_path = out_path.with_suffix('.pdf')
             try:
-                annotate_pdf(source_path, sel_index, highs, str(out_path))
+                out_path, _, _ = highlighted_pdf(source_path, sel_index, highs)
                 st.session_state[f'annotated_pdf_{req_name}'] = str(out_path)
                 st.success("✅ Annotated PDF created successfully!")
             except Exception as e:
@@ -0,0 +1,7 @@
+# make the backend packages (core, api, rag, ...) importable regardless of where pytest is started
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
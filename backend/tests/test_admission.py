@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from core.admission import ModelGate, QueueFullError
+
+
+def test_gate_admits_up_to_limit_then_queues_then_rejects():
+    async def scenario():
+        gate = ModelGate("m", limit=1, max_queue=1)
+        first = gate.enqueue()
+        second = gate.enqueue()
+        with pytest.raises(QueueFullError) as exc:
+            gate.enqueue()
+
+        positions = []
+
+        async def waiter():
+            async for position in second.wait():
+                positions.append(position)
+
+        task = asyncio.create_task(waiter())
+        await asyncio.sleep(0.01)
+        assert not task.done()
+        first.release()
+        await asyncio.wait_for(task, 1)
+        stats = gate.stats()
+        second.release()
+        return first.position, positions, exc.value, stats, gate.stats()
+
+    first_pos, positions, err, busy, idle = asyncio.run(scenario())
+    assert first_pos == 0
+    assert positions == [1]
+    assert err.headers()["Retry-After"].isdigit()
+    assert busy["active"] == 1 and busy["queued"] == 0 and busy["rejected"] == 1
+    assert idle["active"] == 0 and idle["admitted"] == 2
+
+
+def test_leaving_the_queue_frees_the_place():
+    async def scenario():
+        gate = ModelGate("m", limit=1, max_queue=2)
+        holder = gate.enqueue()
+        a = gate.enqueue()
+        b = gate.enqueue()
+        a.release()  # gave up while queued
+        pos_b = b.position
+        holder.release()
+        granted = b._granted.done()
+        b.release()
+        return pos_b, granted, gate.stats()
+
+    pos_b, granted, stats = asyncio.run(scenario())
+    assert pos_b == 1
+    assert granted
+    assert stats["active"] == 0 and stats["queued"] == 0
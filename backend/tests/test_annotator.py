@@ -0,0 +1,60 @@
+import json
+import random
+from pathlib import Path
+from unittest.mock import patch
+
+from bench.corpus import make_pdf
+from highlight import page_index
+from highlight.annotator import PageWordIndex, add_citation_rects, merge_line_rects
+from highlight.page_index import PageIndexCache
+from ingestion.pdf_loader import load_pdf_build_page_index
+
+
+def _page(lines=6, words_per_line=8):
+    """Synthetic page payload: words laid out left to right, line by line, joined by single spaces"""
+    words, pos = [], 0
+    for line in range(lines):
+        y0 = 100 + line * 14
+        for i in range(words_per_line):
+            t = f"w{line}x{i}"
+            x0 = 72 + i * 40
+            words.append({"t": t, "bbox": (x0, y0, x0 + 30, y0 + 11), "s": pos, "e": pos + len(t)})
+            pos += len(t) + 1
+    return words, pos
+
+
+def test_word_range_matches_full_scan():
+    words, length = _page()
+    index = PageWordIndex(list(reversed(words)))  # order of the payload must not matter
+    rng = random.Random(0)
+    for _ in range(300):
+        a = rng.randint(-5, length + 5)
+        b = a + rng.randint(0, 60)
+        expected = [tuple(w["bbox"]) for w in words if not (w["e"] <= a or w["s"] >= b)]
+        assert index.rects(a, b) == expected
+
+
+def test_merge_line_rects_one_rect_per_line():
+    words, _ = _page(lines=3, words_per_line=5)
+    index = PageWordIndex(words)
+    start, end = words[2]["s"], words[12]["e"]  # mid line 0 .. mid line 2
+    merged = merge_line_rects(index.rects(start, end))
+    assert merged == [(152, 100, 262, 111), (72, 114, 262, 125), (72, 128, 182, 139)]
+
+
+def test_citation_rects_from_cached_page_index(tmp_path):
+    make_pdf(str(tmp_path / "a.pdf"), pages=2, words_per_page=150, seed=1)
+    manifest = load_pdf_build_page_index(str(tmp_path / "a.pdf"), tmp_path / "artifacts")
+    cache = PageIndexCache(max_bytes=1 << 20)
+    citations = [
+        {"doc_id": manifest["doc_id"], "page": 2, "span_start": 10, "span_end": 300},
+        {"doc_id": "doc_gone", "page": 1, "span_start": 0, "span_end": 10},
+    ]
+    with patch.object(page_index, "_cache", cache):
+        add_citation_rects(citations, tmp_path / "artifacts")
+        add_citation_rects(citations[:1], tmp_path / "artifacts")
+    words = json.loads(Path(manifest["page_index_path"]).read_text())["2"]["words"]
+    expected = merge_line_rects([tuple(w["bbox"]) for w in words if w["e"] > 10 and w["s"] < 300])
+    assert citations[0]["rects"] == [[round(v, 2) for v in r] for r in expected]
+    assert 1 < len(expected) < 20 and citations[1]["rects"] is None
+    assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 1
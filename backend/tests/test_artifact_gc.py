@@ -0,0 +1,86 @@
+import os
+import time
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routes import documents
+from bench.corpus import make_pdf
+from ingestion import artifact_gc
+from ingestion.artifact_gc import ArtifactGC
+from ingestion.catalog import get_catalog
+from ingestion.pdf_loader import load_pdf_build_page_index
+
+
+def _gc(tmp_path, min_age_s=0):
+    config = SimpleNamespace(artifacts_dir=tmp_path / "artifacts", db_dir=tmp_path / "vectordb",
+                             gc_min_age_s=min_age_s, gc_interval_s=0)
+    gc = ArtifactGC(config)
+    gc.temp_dir = tmp_path / "tmp_highlights"
+    return gc
+
+
+def test_superseded_copies_and_stray_files_are_collected(tmp_path):
+    artifacts = tmp_path / "artifacts"
+    make_pdf(str(tmp_path / "a.pdf"), pages=1, words_per_page=50, seed=1)
+    old = load_pdf_build_page_index(str(tmp_path / "a.pdf"), artifacts)
+    time.sleep(1.1)  # indexed_at has second resolution
+    new = load_pdf_build_page_index(str(tmp_path / "a.pdf"), artifacts)
+    (artifacts / "annot_x.pdf").write_bytes(b"%PDF" + b"0" * 100)
+    (artifacts / ".trash-doc_dead-1").mkdir()
+    (tmp_path / "tmp_highlights").mkdir()
+    (tmp_path / "tmp_highlights" / "annot_y.pdf").write_bytes(b"1" * 50)
+
+    gc = _gc(tmp_path)
+    report = gc.collect(delete=False)  # dry run
+    assert [d["doc_id"] for d in report["documents"]] == [old["doc_id"]]
+    assert len(report["files"]) == 3 and report["reclaimable_bytes"] > 150
+    assert (artifacts / old["doc_id"]).exists()
+
+    report = gc.collect(delete=True)
+    assert report["reclaimed_bytes"] == report["reclaimable_bytes"] == gc.stats()["reclaimed_bytes"]
+    assert not (artifacts / old["doc_id"]).exists() and get_catalog(artifacts).get(old["doc_id"]) is None
+    assert (artifacts / new["doc_id"] / "manifest.json").exists()
+    assert sorted(p.name for p in artifacts.iterdir()) == sorted([new["doc_id"], "catalog.sqlite3", ".gc.lock"])
+    assert gc.plan()["reclaimable_bytes"] == 0
+
+
+def test_live_index_in_progress_builds_and_min_age_are_kept(monkeypatch, tmp_path):
+    artifacts, db = tmp_path / "artifacts", tmp_path / "vectordb"
+    make_pdf(str(tmp_path / "a.pdf"), pages=1, words_per_page=50, seed=1)
+    make_pdf(str(tmp_path / "b.pdf"), pages=1, words_per_page=50, seed=2)
+    live = load_pdf_build_page_index(str(tmp_path / "a.pdf"), artifacts)
+    dropped = load_pdf_build_page_index(str(tmp_path / "b.pdf"), artifacts)
+    orphan = artifacts / "doc_0rphan00"
+    orphan.mkdir()
+    db.mkdir()
+    (db / "index.faiss").write_bytes(b"")
+    os.utime(db / "index.faiss", (time.time() + 5, time.time() + 5))
+    monkeypatch.setattr(artifact_gc, "indexed_doc_ids", lambda db_dir: {live["doc_id"]})
+
+    report = _gc(tmp_path).plan()
+    assert report["live_index"] and report["documents_kept"] == 1
+    assert {d["doc_id"]: d["reason"] for d in report["documents"]} == {
+        dropped["doc_id"]: "not in index", "doc_0rphan00": "not in index, not in catalog"}
+
+    # Ingested after the saved index (a rebuild in progress), or too young: kept
+    os.utime(db / "index.faiss", (time.time() - 60, time.time() - 60))
+    assert [d["doc_id"] for d in _gc(tmp_path).plan()["documents"]] == []
+    assert _gc(tmp_path, min_age_s=3600).plan()["documents_kept"] == 3
+
+
+def test_api_deletion_needs_a_debug_token(monkeypatch, tmp_path):
+    monkeypatch.setattr(artifact_gc, "_gc", _gc(tmp_path))
+    app = FastAPI()
+    app.include_router(documents.router)
+    client = TestClient(app)
+
+    monkeypatch.setattr(documents.config, "debug_token", None)
+    assert client.get("/api/documents/gc").status_code == 403
+    assert client.post("/api/documents/gc").status_code == 403
+
+    monkeypatch.setattr(documents.config, "debug_token", "secret")
+    assert client.post("/api/documents/gc").status_code == 403
+    assert client.get("/api/documents/gc", headers={"X-Debug-Token": "secret"}).json()["reclaimable_bytes"] == 0
+    assert client.post("/api/documents/gc", headers={"X-Debug-Token": "secret"}).json()["deleted"] is True
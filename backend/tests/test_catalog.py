@@ -0,0 +1,67 @@
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routes import documents
+from bench.corpus import make_pdf
+from ingestion.catalog import CATALOG_FILENAME, DocumentCatalog
+from ingestion.pdf_loader import load_pdf_build_page_index
+
+
+def test_ingestion_maintains_catalog(tmp_path):
+    artifacts = tmp_path / "artifacts"
+    make_pdf(str(tmp_path / "a.pdf"), pages=2, words_per_page=50, seed=1)
+    first = load_pdf_build_page_index(str(tmp_path / "a.pdf"), artifacts)
+    second = load_pdf_build_page_index(str(tmp_path / "a.pdf"), artifacts)  # re-ingest: new doc_id
+
+    catalog = DocumentCatalog(artifacts)
+    row = catalog.get(first["doc_id"])
+    assert row["num_pages"] == 2 and row["content_sha256"] == first["content_sha256"]
+    assert row["page_index_path"] == first["page_index_path"] and row["chunk_count"] is None
+    assert catalog.find_by_source(first["source_path"])["doc_id"] in (first["doc_id"], second["doc_id"])
+    assert len(catalog.find_by_name("a.pdf")) == 2
+
+    catalog.record_index({first["doc_id"]: 7}, "v1")
+    assert catalog.get(first["doc_id"])["chunk_count"] == 7
+    assert catalog.delete(second["doc_id"]) and catalog.get(second["doc_id"]) is None
+
+    # A lost catalog is rebuilt from the manifests on disk
+    (artifacts / CATALOG_FILENAME).unlink()
+    assert {r["doc_id"] for r in DocumentCatalog(artifacts).list()} == {first["doc_id"], second["doc_id"]}
+
+
+def test_list_and_delete_use_catalog(monkeypatch, tmp_path):
+    artifacts = tmp_path / "artifacts"
+    make_pdf(str(tmp_path / "a.pdf"), pages=1, words_per_page=50, seed=1)
+    manifest = load_pdf_build_page_index(str(tmp_path / "a.pdf"), artifacts)
+    monkeypatch.setattr(documents.config, "artifacts_dir", artifacts)
+    app = FastAPI()
+    app.include_router(documents.router)
+    client = TestClient(app)
+
+    # Listing does not read manifests
+    (artifacts / manifest["doc_id"] / "manifest.json").write_text(json.dumps({"broken": True}))
+    listed = client.get("/api/documents/").json()
+    assert [d["doc_id"] for d in listed] == [manifest["doc_id"]] and listed[0]["indexed_at"]
+
+    assert client.delete(f"/api/documents/{manifest['doc_id']}").status_code == 200
+    assert client.get("/api/documents/").json() == []
+    assert not (artifacts / manifest["doc_id"]).exists()
+    assert client.delete("/api/documents/..").status_code == 404
+
+
+def test_concurrent_creation_keeps_the_installed_catalog(tmp_path):
+    artifacts = tmp_path / "artifacts"
+    other = DocumentCatalog(artifacts)
+    late = DocumentCatalog(artifacts)  # stands in for another worker process
+    build_rows = late._manifest_rows
+
+    def racing_rows():
+        other.add({"doc_id": "doc_first", "name": "a.pdf", "source_path": "a.pdf", "num_pages": 1,
+                   "page_index_path": "p.json"})  # the other worker installs its catalog meanwhile
+        return build_rows()
+
+    late._manifest_rows = racing_rows
+    assert [r["doc_id"] for r in late.list()] == ["doc_first"]
+    assert sorted(p.name for p in artifacts.iterdir() if p.name.endswith(".tmp")) == []
@@ -0,0 +1,18 @@
+from types import SimpleNamespace
+
+import httpx
+
+from core.clients import _http_clients, _pool_stats
+
+
+def test_pool_stats_tolerate_unknown_client_layouts():
+    # Mock transports have no connection pool; SDK objects without ._client are skipped
+    http = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+    assert _pool_stats(http) == {}
+    assert _pool_stats(SimpleNamespace(_transport=SimpleNamespace(_pool=SimpleNamespace(_connections=None)))) == {}
+    assert _http_clients(SimpleNamespace(_client=http), SimpleNamespace(), None, SimpleNamespace(_client="x")) == [http]
+
+    pooled = httpx.Client()
+    assert _pool_stats(pooled)["connections"] == 0
+    pooled.close()
+    http.close()
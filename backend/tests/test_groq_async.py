@@ -0,0 +1,132 @@
+import asyncio
+import json
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from api.llm.clients.groq_clients import AsyncGroqLLMClient, GroqAPIError, _parse_duration, rate_limit_delay
+
+
+def _client(handler, **kwargs):
+    calls = []
+
+    def record(request):
+        calls.append(request)
+        return handler(request, len(calls))
+
+    http = httpx.AsyncClient(transport=httpx.MockTransport(record))
+    stats = []
+    client = AsyncGroqLLMClient(
+        api_key="test",
+        base_url="http://mock/openai/v1",
+        http_client=http,
+        backoff_base=0.001,
+        on_call=stats.append,
+        **kwargs,
+    )
+    return client, calls, stats
+
+
+def _sse(*chunks):
+    body = "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + "data: [DONE]\n\n"
+    return httpx.Response(200, text=body, headers={"content-type": "text/event-stream"})
+
+
+def test_parse_duration():
+    assert _parse_duration("2") == 2.0
+    assert _parse_duration("120ms") == pytest.approx(0.12)
+    assert _parse_duration("2m59.5s") == pytest.approx(179.5)
+    assert _parse_duration("soon") is None
+
+
+def test_chat_retries_429_and_reports_usage():
+    def handler(request, n):
+        if n == 1:
+            return httpx.Response(429, headers={"retry-after": "0"}, json={"error": {"message": "slow down"}})
+        return httpx.Response(200, json={
+            "choices": [{"message": {"content": "hi"}}],
+            "usage": {"prompt_tokens": 5, "completion_tokens": 1},
+        })
+
+    client, calls, stats = _client(handler)
+    assert asyncio.run(client.chat("hello")) == "hi"
+    assert len(calls) == 2
+    assert stats[0].attempts == 2 and stats[0].retry_waits_s == [0.0]
+    assert (stats[0].prompt_tokens, stats[0].completion_tokens) == (5, 1)
+
+
+def test_chat_does_not_retry_client_errors():
+    client, calls, stats = _client(lambda r, n: httpx.Response(400, json={"error": {"message": "bad"}}))
+    with pytest.raises(GroqAPIError) as exc:
+        asyncio.run(client.chat("hello"))
+    assert exc.value.status_code == 400 and len(calls) == 1
+    assert stats[0].error
+
+
+def test_rate_limit_beyond_budget_fails_fast():
+    client, calls, _ = _client(
+        lambda r, n: httpx.Response(429, headers={"x-ratelimit-reset-requests": "5m"}),
+        backoff_max=1,
+    )
+    with pytest.raises(GroqAPIError):
+        asyncio.run(client.chat("hello"))
+    assert len(calls) == 1
+
+
+GROQ_429_HEADERS = {  # as sent by Groq when the per-minute token limit is hit
+    "retry-after": "2",
+    "x-ratelimit-limit-requests": "14400",
+    "x-ratelimit-limit-tokens": "6000",
+    "x-ratelimit-remaining-requests": "14370",
+    "x-ratelimit-remaining-tokens": "0",
+    "x-ratelimit-reset-requests": "2m59.56s",
+    "x-ratelimit-reset-tokens": "7.66s",
+}
+
+
+def test_real_groq_429_waits_retry_after(monkeypatch):
+    waits = []
+
+    async def sleep(delay):
+        waits.append(delay)
+
+    monkeypatch.setattr(asyncio, "sleep", sleep)
+
+    def handler(request, n):
+        if n == 1:
+            return httpx.Response(429, headers=GROQ_429_HEADERS, json={"error": {"message": "rate limit"}})
+        return httpx.Response(200, json={"choices": [{"message": {"content": "hi"}}]})
+
+    client, calls, stats = _client(handler)
+    assert asyncio.run(client.chat("hello")) == "hi"
+    assert len(calls) == 2 and waits == [2.0] and stats[0].retry_waits_s == [2.0]
+
+
+def test_rate_limit_delay_without_retry_after():
+    headers = {k: v for k, v in GROQ_429_HEADERS.items() if k != "retry-after"}
+    assert rate_limit_delay(httpx.Headers(headers)) == pytest.approx(7.66)  # the exhausted token limit
+    headers.pop("x-ratelimit-remaining-tokens")
+    assert rate_limit_delay(httpx.Headers(headers)) == pytest.approx(7.66)  # unknown: the sooner reset
+    assert rate_limit_delay(httpx.Headers({})) is None
+
+
+def test_stream_yields_deltas_and_retries_before_first_token():
+    def handler(request, n):
+        if n == 1:
+            raise httpx.ConnectError("refused")
+        return _sse(
+            {"choices": [{"delta": {"content": "Hel"}}]},
+            {"choices": [{"delta": {"content": "lo"}}]},
+            {"choices": [], "x_groq": {"usage": {"prompt_tokens": 3, "completion_tokens": 2}}},
+        )
+
+    client, calls, stats = _client(handler)
+
+    async def collect():
+        return [d async for d in client.stream("hello")]
+
+    assert asyncio.run(collect()) == ["Hel", "lo"]
+    assert json.loads(calls[-1].content)["stream"] is True
+    assert stats[0].attempts == 2 and stats[0].chunks == 2 and stats[0].completion_tokens == 2
+    assert stats[0].ttft_ms is not None
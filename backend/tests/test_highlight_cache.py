@@ -0,0 +1,133 @@
+import io
+import zipfile
+
+import pymupdf as fitz
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import highlight.cache as cache_mod
+from api.routes import documents
+from bench.corpus import make_pdf
+from highlight.cache import HighlightCache, highlight_key
+from ingestion.pdf_loader import load_pdf_build_page_index
+
+
+def test_lru_eviction_and_hits(tmp_path):
+    cache = HighlightCache(tmp_path, max_bytes=250)
+    builds = []
+
+    def build(data):
+        def write(tmp):
+            builds.append(data)
+            tmp.write_bytes(data)
+        return write
+
+    a, hit = cache.get_or_create("a", ".pdf", build(b"a" * 100))
+    assert not hit and a.read_bytes() == b"a" * 100
+    assert cache.get_or_create("a", ".pdf", build(b"x"))[1]  # hit: not rebuilt
+    cache.get_or_create("b", ".pdf", build(b"b" * 100))
+    cache.get("a", ".pdf")  # a is now the most recently used
+    cache.get_or_create("c", ".pdf", build(b"c" * 100))  # over budget: b goes
+    assert cache.get("b", ".pdf") is None and cache.get("a", ".pdf") is not None
+    assert len(builds) == 3 and cache.stats()["evictions"] == 1 and cache.bytes == 200
+    assert not list(tmp_path.glob(".tmp-*"))
+
+    reopened = HighlightCache(tmp_path, max_bytes=250)  # survives a restart
+    assert reopened.get("c", ".pdf") is not None and reopened.bytes == 200
+
+
+def test_key_ignores_highlight_order():
+    h1 = [{"page": 1, "span_start": 0, "span_end": 5}, {"page": 2, "span_start": 3, "span_end": 9}]
+    assert highlight_key("abc", h1, output="pdf") == highlight_key("abc", h1[::-1] + h1[:1], output="pdf")
+    assert highlight_key("abc", h1, output="pdf") != highlight_key("abd", h1, output="pdf")
+
+
+def test_highlight_route_etag_and_range(monkeypatch, tmp_path):
+    make_pdf(str(tmp_path / "a.pdf"), pages=2, words_per_page=120, seed=1)
+    manifest = load_pdf_build_page_index(str(tmp_path / "a.pdf"), tmp_path / "artifacts")
+    monkeypatch.setattr(documents.config, "artifacts_dir", tmp_path / "artifacts")
+    monkeypatch.setattr(cache_mod, "_cache", HighlightCache(tmp_path / "cache", 1 << 20))
+
+    app = FastAPI()
+    app.include_router(documents.router)
+    client = TestClient(app)
+    form = {"doc_id": manifest["doc_id"], "page": 1, "span_start": 0, "span_end": 40}
+
+    first = client.post("/api/documents/highlight", data=form)
+    assert first.status_code == 200 and first.headers["x-cache"] == "miss"
+    assert first.content.startswith(b"%PDF")
+    etag = first.headers["etag"]
+
+    again = client.post("/api/documents/highlight", data=form)
+    assert again.headers["x-cache"] == "hit" and again.headers["etag"] == etag
+    assert client.post("/api/documents/highlight", data=form, headers={"If-None-Match": etag}).status_code == 304
+
+    part = client.post("/api/documents/highlight", data=form, headers={"Range": "bytes=0-99"})
+    assert part.status_code == 206 and part.content == first.content[:100]
+
+    other = client.post("/api/documents/highlight", data={**form, "span_end": 80})
+    assert other.headers["etag"] != etag
+    assert client.post("/api/documents/highlight", data={**form, "doc_id": "doc_missing"}).status_code == 404
+
+
+def test_citation_route_pages_and_png(monkeypatch, tmp_path):
+    make_pdf(str(tmp_path / "a.pdf"), pages=5, words_per_page=120, seed=1)
+    manifest = load_pdf_build_page_index(str(tmp_path / "a.pdf"), tmp_path / "artifacts")
+    monkeypatch.setattr(documents.config, "artifacts_dir", tmp_path / "artifacts")
+    monkeypatch.setattr(cache_mod, "_cache", HighlightCache(tmp_path / "cache", 1 << 20))
+
+    app = FastAPI()
+    app.include_router(documents.router)
+    client = TestClient(app)
+    url = f"/api/documents/{manifest['doc_id']}/citation"
+
+    pdf = client.get(url, params={"hl": ["4:0:40", "2:10:30"]})
+    assert pdf.status_code == 200 and pdf.headers["content-type"] == "application/pdf"
+    doc = fitz.open(stream=pdf.content, filetype="pdf")
+    assert len(doc) == 2 and sum(len(list(p.annots())) for p in doc) == 2
+
+    png = client.get(url, params={"hl": "4:0:40", "format": "png", "dpi": 50})
+    assert png.status_code == 200 and png.content.startswith(b"\x89PNG")
+    again = client.get(url, params={"hl": "4:0:40", "format": "png", "dpi": 50})
+    assert again.headers["x-cache"] == "hit" and again.headers["etag"] == png.headers["etag"]
+    assert client.get(url, params={"hl": "4:0:40", "format": "png", "dpi": 72}).headers["etag"] != png.headers["etag"]
+
+    assert client.get(url, params={"hl": "9:0:40"}).status_code == 400
+    assert client.get(url, params={"hl": "4-0-40"}).status_code == 400
+
+
+def test_batch_highlights_one_pass_per_document(monkeypatch, tmp_path):
+    docs = []
+    for name in ("a", "b"):
+        make_pdf(str(tmp_path / f"{name}.pdf"), pages=3, words_per_page=120, seed=1)
+        docs.append(load_pdf_build_page_index(str(tmp_path / f"{name}.pdf"), tmp_path / "artifacts")["doc_id"])
+    monkeypatch.setattr(documents.config, "artifacts_dir", tmp_path / "artifacts")
+    monkeypatch.setattr(cache_mod, "_cache", HighlightCache(tmp_path / "cache", 1 << 20))
+    calls = []
+    annotate = cache_mod.annotate_pdf
+    monkeypatch.setattr(cache_mod, "annotate_pdf", lambda *a: calls.append(a[2]) or annotate(*a))
+
+    app = FastAPI()
+    app.include_router(documents.router)
+    client = TestClient(app)
+    a, b = docs
+    citations = [
+        {"doc_id": a, "page": 1, "span_start": 0, "span_end": 30},
+        {"doc_id": a, "page": 3, "span_start": 5, "span_end": 50},
+        {"doc_id": b, "page": 2, "span_start": 0, "span_end": 20},
+    ]
+
+    r = client.post("/api/documents/highlight/batch", json={"citations": citations})
+    assert r.status_code == 200 and r.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(r.content)) as zf:
+        members = {n: fitz.open(stream=zf.read(n), filetype="pdf") for n in zf.namelist()}
+    assert sorted(len(calls_) for calls_ in calls) == [1, 2]  # one annotate pass per document
+    assert sorted(sum(len(list(p.annots())) for p in d) for d in members.values()) == [1, 2]
+    assert client.post("/api/documents/highlight/batch", json={"citations": citations},
+                       headers={"If-None-Match": r.headers["etag"]}).status_code == 304
+
+    single = client.post("/api/documents/highlight/batch", json={"citations": citations[:2], "pages_only": True})
+    assert single.headers["content-type"] == "application/pdf"
+    assert len(fitz.open(stream=single.content, filetype="pdf")) == 2
+    missing = client.post("/api/documents/highlight/batch", json={"citations": [{**citations[0], "doc_id": "doc_x"}]})
+    assert missing.status_code == 404
@@ -0,0 +1,24 @@
+from bench.corpus import fitz, make_pdf
+from bench.ingest_bench import run_case
+
+
+def test_synthetic_pdf_has_requested_layout(tmp_path):
+    info = make_pdf(str(tmp_path / "a.pdf"), pages=3, words_per_page=250, paragraphs_per_page=3, columns=2)
+    with fitz.open(info["path"]) as doc:
+        assert len(doc) == 3
+        assert [len(page.get_text("words")) for page in doc] == [250, 250, 250]
+    again = make_pdf(str(tmp_path / "b.pdf"), pages=3, words_per_page=250, paragraphs_per_page=3, columns=2)
+    with fitz.open(info["path"]) as a, fitz.open(again["path"]) as b:
+        assert a[0].get_text() == b[0].get_text()
+
+
+def test_ingest_benchmark_case_runs_end_to_end():
+    case = {
+        "pages": 2, "words_per_page": 200, "paragraphs_per_page": 2, "columns": 1, "docs": 1,
+        "chunk_size": 400, "chunk_overlap": 50, "embedding_model": "all-minilm", "embed_url": None,
+        "repeat": 1, "seed": 0,
+    }
+    result = run_case(case)
+    assert result["pages"] == 2 and result["chunks"] > 0
+    assert result["pages_per_s"] > 0 and result["embed_chunks_per_s"] > 0
+    assert result["artifacts_bytes"]["faiss_index"] > 0 and result["artifacts_bytes"]["page_index"] > 0
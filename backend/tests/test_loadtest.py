@@ -0,0 +1,30 @@
+import asyncio
+import time
+
+from bench.loadtest import RequestResult, summarize
+from core.looplag import LoopLagMonitor
+
+
+def test_summary_percentiles_and_error_rate():
+    results = [
+        RequestResult("stream", True, 200, 0.0, latency_ms=1000 + i, ttft_ms=100, tokens=45) for i in range(9)
+    ] + [RequestResult("stream", False, 429, 0.0, latency_ms=5)]
+    summary = summarize(results, wall_s=2.0)
+    assert summary["error_rate"] == 0.1 and summary["errors"] == {"HTTP 429": 1}
+    assert summary["rps"] == 4.5
+    assert summary["ttft_p50_ms"] == 100
+    assert 49 < summary["tok_s_p50"] < 51  # 45 tokens over ~0.9s after the first one
+
+
+def test_loop_lag_monitor_sees_a_blocked_loop():
+    async def scenario():
+        monitor = LoopLagMonitor(interval_s=0.01)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.1)  # blocks the event loop
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+        return monitor.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["max_ms"] >= 80
@@ -0,0 +1,37 @@
+import asyncio
+
+from langchain_community.vectorstores import FAISS
+
+from bench.standin import HashEmbeddings
+from core.metrics import MetricsRegistry
+from retrieval.search import aretrieve, as_retriever
+
+
+def test_render_prometheus_text():
+    registry = MetricsRegistry()
+    hist = registry.histogram("t_seconds", "test histogram", labels=("stage",), buckets=(0.1, 1))
+    hist.observe(0.05, stage="embed")
+    hist.observe(0.5, stage="embed")
+    hist.observe(5, stage="embed")
+    registry.counter("t_total", "test counter", labels=("model",)).inc(3, model='a"b')
+    registry.register_collector(lambda: [("t_gauge", "gauge", "collected", [({}, 2)])])
+
+    lines = registry.render().splitlines()
+    assert "# TYPE t_seconds histogram" in lines
+    assert 't_seconds_bucket{stage="embed",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="embed",le="1"} 2' in lines
+    assert 't_seconds_bucket{stage="embed",le="+Inf"} 3' in lines
+    assert 't_seconds_count{stage="embed"} 3' in lines
+    assert 't_seconds_sum{stage="embed"} 5.55' in lines
+    assert 't_total{model="a\\"b"} 3' in lines
+    assert "t_gauge 2" in lines
+
+
+def test_staged_retrieval_matches_retriever():
+    texts = [f"chunk {i} about topic{i % 7} marker{i}" for i in range(100)]
+    vs = FAISS.from_texts(texts, HashEmbeddings(dim=64))
+    for use_mmr in (True, False):
+        kwargs = dict(k=5, fetch_k=20, use_mmr=use_mmr, lambda_mult=0.6)
+        expected = asyncio.run(as_retriever(vs, **kwargs).ainvoke("topic3 marker5"))
+        got = asyncio.run(aretrieve(vs, "topic3 marker5", **kwargs))
+        assert [d.page_content for d in got] == [d.page_content for d in expected]
@@ -0,0 +1,45 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routes import documents
+from bench.corpus import make_pdf
+from ingestion import page_images
+from ingestion.page_images import PageImageRenderer, find_page_image
+from ingestion.pdf_loader import load_pdf_build_page_index
+
+
+def test_ingest_renders_page_images_in_background(monkeypatch, tmp_path):
+    renderer = PageImageRenderer(workers=1)
+    monkeypatch.setattr(page_images, "_renderer", renderer)
+    make_pdf(str(tmp_path / "a.pdf"), pages=3, words_per_page=100, seed=1)
+    try:
+        manifest = load_pdf_build_page_index(str(tmp_path / "a.pdf"), tmp_path / "artifacts", render_pages=True)
+        renderer.wait(manifest["doc_id"], timeout=60)
+    finally:
+        renderer.shutdown()
+    doc_dir = tmp_path / "artifacts" / manifest["doc_id"]
+    assert manifest["page_images"]["medium_dpi"] == page_images.MEDIUM_DPI
+    for page in (1, 2, 3):
+        thumb = find_page_image(doc_dir, page, "thumb")
+        assert thumb is not None and thumb.read_bytes().startswith(b"\x89PNG")  # text only: grayscale PNG
+        assert find_page_image(doc_dir, page, "medium").stat().st_size > thumb.stat().st_size
+    assert renderer.stats()["tasks_pending"] == 0
+
+
+def test_page_image_route(monkeypatch, tmp_path):
+    make_pdf(str(tmp_path / "a.pdf"), pages=2, words_per_page=100, seed=1)
+    manifest = load_pdf_build_page_index(str(tmp_path / "a.pdf"), tmp_path / "artifacts")  # nothing pre-rendered
+    monkeypatch.setattr(documents.config, "artifacts_dir", tmp_path / "artifacts")
+    app = FastAPI()
+    app.include_router(documents.router)
+    client = TestClient(app)
+    url = f"/api/documents/{manifest['doc_id']}/pages/2/image"
+
+    first = client.get(url, params={"size": "medium"})
+    assert first.status_code == 200 and first.headers["x-cache"] == "miss"  # rendered on demand, then stored
+    assert first.headers["content-type"] == "image/png"
+    again = client.get(url, params={"size": "medium"})
+    assert again.headers["x-cache"] == "hit" and again.content == first.content
+    assert client.get(url, params={"size": "medium"}, headers={"If-None-Match": again.headers["etag"]}).status_code == 304
+    assert client.get(url).headers["x-cache"] == "hit"  # the thumbnail was rendered alongside
+    assert client.get(f"/api/documents/{manifest['doc_id']}/pages/3/image").status_code == 404
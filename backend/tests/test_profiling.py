@@ -0,0 +1,68 @@
+import json
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import core.profiling as profiling
+from core.config import AppConfig
+from core.profiling import ProfilingMiddleware
+
+
+def _busy_work(n):
+    return sum(i * i for i in range(n))
+
+
+def _client(monkeypatch, tmp_path, **settings):
+    config = AppConfig()
+    config.profiling_enabled = True
+    config.profiles_dir = tmp_path
+    config.debug_token = None
+    for k, v in settings.items():
+        setattr(config, k, v)
+    monkeypatch.setattr(profiling, "_store", None)
+
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, config=config)
+
+    @app.post("/api/documents/index")
+    async def index():
+        _busy_work(200_000)
+        time.sleep(0.02)
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_profiled_request_stores_report(monkeypatch, tmp_path):
+    client = _client(monkeypatch, tmp_path)
+    assert "x-profile-id" not in client.post("/api/documents/index").headers
+
+    r = client.post("/api/documents/index", headers={"X-Profile": "cprofile"})
+    assert r.status_code == 200
+    report = json.loads((tmp_path / f"{r.headers['x-profile-id']}.json").read_text())
+    assert report["profiler"] == "cprofile" and report["status"] == 200
+    assert report["wall_s"] >= 0.02 and report["cpu_s"] > 0
+    assert any("_busy_work" in f["function"] for f in report["top_total"])
+
+    def names(nodes):
+        for n in nodes:
+            yield n["function"]
+            yield from names(n["children"])
+    assert any("_busy_work" in name for name in names(report["call_tree"]))
+    assert (tmp_path / f"{r.headers['x-profile-id']}.prof").exists()
+
+    assert client.post("/api/documents/index?profile=1").headers.get("x-profile-id")
+
+
+def test_profiling_guards(monkeypatch, tmp_path):
+    r = _client(monkeypatch, tmp_path, profiling_enabled=False).post(
+        "/api/documents/index", headers={"X-Profile": "1"}
+    )
+    assert r.headers["x-profile-status"] == "disabled" and "x-profile-id" not in r.headers
+
+    client = _client(monkeypatch, tmp_path, debug_token="s3cret")
+    assert client.post("/api/documents/index", headers={"X-Profile": "1"}).headers["x-profile-status"] == "forbidden"
+    r = client.post("/api/documents/index", headers={"X-Profile": "1", "X-Debug-Token": "s3cret"})
+    assert r.headers.get("x-profile-id")
+    assert len(list(tmp_path.glob("*.json"))) == 1  # only the authorized request was profiled
@@ -0,0 +1,23 @@
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from bench.retrieval_bench import ground_truth, run_config, sample_queries, with_index
+from bench.standin import HashEmbeddings
+
+
+def test_exact_index_has_full_recall_and_mmr_does_not_exceed_it():
+    texts = [f"chunk {i} about topic{i % 7} with marker{i} and shared words" for i in range(60)]
+    vs = FAISS.from_texts(texts, HashEmbeddings(dim=64))
+    queries = sample_queries(vs, 20, seed=1, words=4)
+    vectors = vs.index.reconstruct_n(0, vs.index.ntotal)
+    query_vectors = np.asarray(vs.embedding_function.embed_documents(queries), dtype=np.float32)
+    truth = ground_truth(vectors, query_vectors, 4)
+    positions = {doc_id: pos for pos, doc_id in vs.index_to_docstore_id.items()}
+
+    flat, _ = with_index(vs, "Flat", vectors)
+    kwargs = dict(top_k=4, fetch_k=20, include_embed=False)
+    exact = run_config(flat, queries, query_vectors, truth, positions, use_mmr=False, lambda_mult=1.0, **kwargs)
+    mmr = run_config(flat, queries, query_vectors, truth, positions, use_mmr=True, lambda_mult=0.3, **kwargs)
+    assert exact["recall"] == 1.0
+    assert mmr["recall"] <= exact["recall"]
+    assert exact["p50_ms"] is not None and exact["qps"] > 0
@@ -0,0 +1,134 @@
+import asyncio
+
+from core.singleflight import SingleFlight
+
+
+async def _collect(flight):
+    return [e async for e in flight.subscribe()]
+
+
+def test_identical_requests_share_one_producer():
+    async def scenario():
+        flights = SingleFlight()
+        runs = []
+
+        async def produce(flight):
+            runs.append(flight.id)
+            for i in range(3):
+                await flight.publish({"event": "token", "data": {"token": str(i)}})
+                await asyncio.sleep(0.01)
+            await flight.publish({"event": "done", "data": {}})
+
+        first, leader = flights.join("q", produce)
+        consumer = asyncio.create_task(_collect(first))
+        await asyncio.sleep(0.015)  # join mid-generation
+        second, follower_leads = flights.join("q", produce)
+        results = await asyncio.gather(consumer, _collect(second))
+        return runs, leader, follower_leads, first is second, results
+
+    runs, leader, follower_leads, same, (a, b) = asyncio.run(scenario())
+    assert len(runs) == 1
+    assert leader and not follower_leads and same
+    assert a == b  # the late joiner replays what it missed
+    assert [e["event"] for e in a] == ["token", "token", "token", "done"]
+
+
+def test_finished_flight_is_not_reused():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def produce(flight):
+            await flight.publish({"event": "done", "data": {}})
+
+        first, _ = flights.join("q", produce)
+        await _collect(first)
+        second, leader = flights.join("q", produce)
+        await _collect(second)
+        return first is second, leader
+
+    same, leader = asyncio.run(scenario())
+    assert not same and leader
+
+
+def test_producer_error_is_published():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def produce(flight):
+            raise ValueError("boom")
+
+        flight, _ = flights.join("q", produce)
+        return await _collect(flight)
+
+    events = asyncio.run(scenario())
+    assert [(e["event"], e["data"]) for e in events] == [("error", {"error": "boom"})]
+
+
+def test_last_subscriber_leaving_cancels_producer():
+    async def scenario():
+        flights = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def produce(flight):
+            try:
+                while True:
+                    await flight.publish({"event": "token", "data": {"token": "x"}})
+                    await asyncio.sleep(0.01)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        flight, _ = flights.join("q", produce)
+        stream = flight.subscribe()
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        return flight.done, flights.stats()["in_flight"]
+
+    done, in_flight = asyncio.run(scenario())
+    assert done and in_flight == 0
+
+
+def test_resume_after_disconnect_and_after_finish():
+    async def scenario():
+        flights = SingleFlight(grace_s=1, retain_s=60)
+
+        async def produce(flight):
+            for i in range(4):
+                await flight.publish({"event": "token", "data": {"token": str(i)}})
+                await asyncio.sleep(0.01)
+
+        flight, _ = flights.join("q", produce)
+        stream = flight.subscribe()
+        first = [await stream.__anext__(), await stream.__anext__()]
+        await stream.aclose()  # client dropped; grace keeps the producer alive
+
+        resumed, start = flights.resume(first[-1]["id"], "q")
+        rest = [e async for e in resumed.subscribe(start)]
+        after_finish = flights.resume(first[0]["id"], "q")
+        wrong_key = flights.resume(first[0]["id"], "other")
+        return first, rest, after_finish, wrong_key
+
+    first, rest, after_finish, wrong_key = asyncio.run(scenario())
+    tokens = [e["data"]["token"] for e in first + rest]
+    assert tokens == ["0", "1", "2", "3"]
+    assert after_finish is not None and after_finish[1] == 1
+    assert wrong_key is None
+
+
+def test_replay_buffer_is_bounded():
+    async def scenario():
+        flights = SingleFlight(flight_max_bytes=200, retain_s=60)
+
+        async def produce(flight):
+            for _ in range(10):
+                await flight.publish({"event": "token", "data": {"token": "x" * 10}})
+
+        flight, _ = flights.join("q", produce)
+        await flight.task
+        return flight, flights.resume(f"{flight.id}:0", "q")
+
+    flight, resumed = asyncio.run(scenario())
+    assert flight.nbytes <= 200 and flight.base > 0
+    assert resumed is None  # the start of the stream is gone
@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+
+from bench.standin import StandinSettings, create_app, embedding_dim, hash_embedding
+
+
+def _client(**settings):
+    return TestClient(create_app(StandinSettings(first_token_ms=0, tokens_per_s=0, embed_ms=0, **settings)))
+
+
+def test_hash_embedding_is_deterministic_and_normalized():
+    a = hash_embedding("Quarterly revenue grew", 384)
+    assert a == hash_embedding("quarterly  REVENUE grew", 384)
+    assert len(a) == 384 and sum(x * x for x in a) == pytest.approx(1.0, rel=1e-5)
+    assert embedding_dim("mxbai-embed-large:latest") == 1024
+
+
+def test_ollama_embed_and_streamed_chat():
+    client = _client(answer_tokens=5)
+    r = client.post("/api/embed", json={"model": "all-minilm", "input": ["a b", "c"]})
+    assert [len(v) for v in r.json()["embeddings"]] == [384, 384]
+
+    body = {"model": "gemma2:2b", "messages": [{"role": "user", "content": "hi"}]}
+    lines = [json.loads(l) for l in client.post("/api/chat", json=body).text.splitlines()]
+    assert len(lines) == 6 and lines[-1]["done"] and lines[-1]["eval_count"] == 5
+    again = [json.loads(l) for l in client.post("/api/chat", json=body).text.splitlines()]
+    assert [l["message"]["content"] for l in again] == [l["message"]["content"] for l in lines]
+
+
+def test_groq_stream_and_error_injection():
+    client = _client(answer_tokens=3)
+    body = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "stream": True, "max_tokens": 2}
+    events = [l[6:] for l in client.post("/openai/v1/chat/completions", json=body).text.splitlines() if l]
+    assert events[-1] == "[DONE]"
+    assert json.loads(events[-2])["x_groq"]["usage"]["completion_tokens"] == 2
+
+    client.patch("/standin/settings", json={"error_rate": 1, "error_status": 429})
+    r = client.post("/openai/v1/chat/completions", json=body)
+    assert r.status_code == 429 and r.headers["retry-after"] == "0"
+    assert "injected" in r.json()["error"]["message"]
@@ -0,0 +1,31 @@
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from core.startup import StartupReport
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFERRED = ("langchain_core", "langchain_community", "langsmith", "faiss", "numpy", "pymupdf", "fitz", "groq")
+
+
+def test_app_import_defers_heavy_dependencies(tmp_path):
+    env = {**os.environ, "DATA_DIR": str(tmp_path / "data"), "ARTIFACTS_DIR": str(tmp_path / "artifacts"),
+           "VECTORDB_DIR": str(tmp_path / "vectordb"), "PROFILES_DIR": str(tmp_path / "profiles")}
+    code = f"import sys, main; print(sorted(m for m in {DEFERRED!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_warm_imports_report():
+    report = StartupReport()
+    report.mark("imports")
+    report.ready()
+    asyncio.run(report.warm_imports(["json", "not_a_real_module_xyz"]))
+    data = report.to_dict()
+    assert data["ready_ms"] > 0 and "imports" in data["phases_ms"]
+    assert data["warmup_imports"]["state"] == "done"
+    assert data["warmup_imports"]["modules_ms"]["not_a_real_module_xyz"] is None
+    assert data["warmup_imports"]["modules_ms"]["json"] >= 0
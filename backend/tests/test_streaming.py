@@ -0,0 +1,88 @@
+import asyncio
+
+from core.streaming import GenerationStats, coalesce_tokens, sse_frames
+
+
+def _tok(t):
+    return {"event": "token", "data": {"token": t}}
+
+
+async def _source(items, delay=0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+def _run(events, **kwargs):
+    async def collect():
+        return [e async for e in coalesce_tokens(events, **kwargs)]
+    return asyncio.run(collect())
+
+
+def test_first_token_alone_then_batched_frames():
+    items = [{"event": "citations", "data": []}] + [_tok(c) for c in "abcdef"] + [{"event": "done", "data": {}}]
+    out = _run(_source(items), window_ms=50, max_chars=1000)
+    assert [e["event"] for e in out] == ["citations", "token", "token", "done"]
+    assert out[1]["data"]["token"] == "a"
+    assert out[2]["data"]["token"] == "bcdef"
+
+
+def test_flush_on_max_chars():
+    out = _run(_source([_tok("ab") for _ in range(5)]), window_ms=10_000, max_chars=4)
+    assert [e["data"]["token"] for e in out] == ["ab", "abab", "abab"]
+
+
+def test_flush_on_window_without_new_tokens():
+    async def slow():
+        yield _tok("a")
+        yield _tok("b")
+        await asyncio.sleep(0.1)  # longer than the window: "b" must not wait for "c"
+        yield _tok("c")
+
+    async def collect():
+        stamps = []
+        start = asyncio.get_running_loop().time()
+        async for e in coalesce_tokens(slow(), window_ms=10, max_chars=100):
+            stamps.append((e["data"]["token"], asyncio.get_running_loop().time() - start))
+        return stamps
+
+    stamps = asyncio.run(collect())
+    assert [t for t, _ in stamps] == ["a", "b", "c"]
+    assert stamps[1][1] < 0.08
+
+
+def test_disabled_passes_through():
+    items = [_tok(c) for c in "abc"]
+    assert _run(_source(items), window_ms=0, max_chars=100) == items
+
+
+def test_closing_frames_closes_the_source():
+    async def scenario(window_ms):
+        closed = asyncio.Event()
+
+        async def source():
+            try:
+                while True:
+                    await asyncio.sleep(0.001)
+                    yield _tok("x")
+            finally:
+                closed.set()
+
+        frames = sse_frames(coalesce_tokens(source(), window_ms=window_ms))
+        await frames.__anext__()
+        await frames.aclose()  # what the routes do once the client has gone
+        return closed.is_set()
+
+    assert asyncio.run(scenario(0))
+    assert asyncio.run(scenario(20))
+
+
+def test_cancelled_generation_saving_estimate():
+    stats = GenerationStats(alpha=0.5)
+    assert stats.record_cancelled("m", 5) == 0  # nothing to compare against yet
+    stats.record_completed("m", 100)
+    stats.record_completed("m", 200)
+    assert stats.record_cancelled("m", 50) == 100
+    assert stats.record_cancelled("m", 10, max_tokens=40) == 30
+    assert stats.stats()["tokens_saved_estimate"] == 130
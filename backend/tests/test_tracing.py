@@ -0,0 +1,88 @@
+import asyncio
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.routes import debug
+from core.logging import get_logger
+from core.tracing import Tracer, TracingMiddleware, span, to_otlp
+import core.tracing as tracing
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        with span("outer", item=item_id):
+            with span("inner") as s:
+                s.set(hits=2)
+            async def task():
+                with span("in_task"):
+                    await asyncio.sleep(0)
+            await asyncio.create_task(task())
+        get_logger().info("served item")
+        return {"ok": True}
+
+    return app
+
+
+def test_request_trace_tree_header_and_logs(monkeypatch, caplog):
+    tracer = Tracer()
+    monkeypatch.setattr(tracing, "_tracer", tracer)
+    client = TestClient(_app())
+
+    r = client.get("/items/7", headers={"X-Request-ID": "abc-123"})
+    assert r.headers["x-request-id"] == "abc-123"
+    assert client.get("/items/8", headers={"X-Request-ID": "bad id\n"}).headers["x-request-id"] != "bad id\n"
+
+    trace = tracer.buffer.find("abc-123")
+    tree = trace.tree()
+    assert tree["name"] == "GET /items/{item_id}" and tree["status"] == 200
+    outer = tree["root"]["children"][0]
+    assert outer["name"] == "outer" and outer["attributes"] == {"item": "7"}
+    assert [c["name"] for c in outer["children"]] == ["inner", "in_task"]
+    assert outer["children"][0]["attributes"] == {"hits": 2}
+
+    otlp = to_otlp([trace])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert len(otlp) == 4 and {s["traceId"] for s in otlp} == {trace.trace_id}
+    assert sum("parentSpanId" not in s for s in otlp) == 1
+
+
+def test_log_lines_carry_request_id(monkeypatch):
+    monkeypatch.setattr(tracing, "_tracer", Tracer())
+    records = []
+    logger = get_logger()
+    handler = logger.handlers[0]
+    monkeypatch.setattr(handler, "emit", lambda record: records.append(handler.format(record)))
+    level = logger.level
+    logger.setLevel(logging.INFO)  # benchmarks in the same session lower it
+    try:
+        TestClient(_app()).get("/items/1", headers={"X-Request-ID": "req-42"})
+        logger.info("outside")
+    finally:
+        logger.setLevel(level)
+    assert "[INFO] [req-42] served item" in records
+    assert records[-1] == "[INFO] outside"
+
+
+def test_span_outside_request_is_noop():
+    with span("nothing") as s:
+        s.set(x=1)
+    assert tracing._current_span.get() is None
+
+
+def test_debug_routes_need_a_configured_token(monkeypatch):
+    app = FastAPI()
+    app.include_router(debug.router)
+    client = TestClient(app)
+
+    monkeypatch.setattr(debug.config, "debug_token", None)
+    assert client.get("/api/debug/traces").status_code == 403
+    assert client.get("/api/debug/traces", headers={"X-Debug-Token": ""}).status_code == 403
+
+    monkeypatch.setattr(debug.config, "debug_token", "s3cret")
+    assert client.get("/api/debug/traces", headers={"X-Debug-Token": "nope"}).status_code == 403
+    assert client.get("/api/debug/traces", headers={"X-Debug-Token": "s3cret"}).status_code == 200
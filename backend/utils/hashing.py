@@ -0,0 +1,38 @@
+# content hashes of files (documents are identified by their bytes, not their path)
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
+_HASH_CHUNK = 1 << 20
+
+
+class FileHashes:
+    """sha256 of files, remembered per (path, size, mtime) so unchanged PDFs are hashed once"""
+
+    def __init__(self, max_entries: int = 1024):
+        self._hashes: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def sha256(self, path: str) -> str:
+        st = os.stat(path)
+        memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            digest = self._hashes.get(memo_key)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(_HASH_CHUNK), b""):
+                    h.update(block)
+            digest = h.hexdigest()
+            with self._lock:
+                self._hashes[memo_key] = digest
+                while len(self._hashes) > self._max_entries:
+                    self._hashes.popitem(last=False)
+        return digest
+
+
+file_hashes = FileHashes()  # process-wide
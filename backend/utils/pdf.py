@@ -0,0 +1,9 @@
+# lazy PyMuPDF import shared by ingestion and highlighting
+
+def load_fitz():
+    """PyMuPDF, imported on first use (it is ~70ms of API startup otherwise)"""
+    try:
+        import pymupdf as fitz   # PyMuPDF ≥ 1.24.3 preferred import name
+    except ImportError:
+        import fitz
+    return fitz
@@ -93,6 +93,8 @@ export interface StreamCallbacks {
   onError: (error: string) => void
 }
 
+const MAX_STREAM_RECONNECTS = 3
+
 export function streamChat(request: ChatRequest, callbacks: StreamCallbacks): () => void {
   const params = new URLSearchParams({
     query: request.query,
@@ -135,6 +137,7 @@ export function streamChat(request: ChatRequest, callbacks: StreamCallbacks): ()
   })
 
   eventSource.addEventListener('error', (event: any) => {
+    if (event.data === undefined) return // connection error, handled by onerror
     try {
       const data = JSON.parse(event.data)
       callbacks.onError(data.error)
@@ -144,10 +147,18 @@ export function streamChat(request: ChatRequest, callbacks: StreamCallbacks): ()
     eventSource.close()
   })
 
+  // The browser reconnects on its own and sends Last-Event-ID, so the server
+  // resumes the answer where it stopped instead of generating it again
+  let reconnects = 0
   eventSource.onerror = () => {
+    if (eventSource.readyState === EventSource.CONNECTING && reconnects < MAX_STREAM_RECONNECTS) {
+      reconnects += 1
+      return
+    }
     callbacks.onError('Connection lost')
     eventSource.close()
   }
+  eventSource.addEventListener('token', () => { reconnects = 0 })
 
   // Return cleanup function
   return () => eventSource.close()